@@ -0,0 +1,115 @@
+import time
+import numpy as np
+from parallel_transcriber import SAMPLE_RATE, offset_segment
+
+# Umbrales de confianza por segmento (los mismos criterios que usa Whisper)
+LOGPROB_THRESHOLD = -0.8
+COMPRESSION_RATIO_THRESHOLD = 2.4
+NO_SPEECH_THRESHOLD = 0.6
+
+# Margen alrededor de cada zona débil y separación máxima para unir zonas contiguas
+PADDING_SECONDS = 0.5
+MERGE_GAP_SECONDS = 1.0
+MAX_WINDOW_SECONDS = 30.0
+
+# Coste relativo de decodificación (millones de parámetros de cada modelo)
+MODEL_COST = {
+    'tiny': 39,
+    'base': 74,
+    'small': 244,
+    'medium': 769,
+    'large': 1550,
+    'large-v2': 1550,
+    'large-v3': 1550,
+    'turbo': 809,
+}
+
+def is_weak(seg, logprob_threshold=LOGPROB_THRESHOLD, compression_threshold=COMPRESSION_RATIO_THRESHOLD,
+            no_speech_threshold=NO_SPEECH_THRESHOLD):
+    """
+    Indica si un segmento tiene baja confianza y merece decodificarse con un modelo mayor.
+    Los segmentos de silencio (no_speech_prob alto) no se repiten.
+    """
+    avg_logprob = seg.get('avg_logprob')
+    compression_ratio = seg.get('compression_ratio')
+    no_speech_prob = seg.get('no_speech_prob')
+    if no_speech_prob is not None and no_speech_prob > no_speech_threshold:
+        return False
+    if avg_logprob is not None and avg_logprob < logprob_threshold:
+        return True
+    return compression_ratio is not None and compression_ratio > compression_threshold
+
+def weak_windows(segments, duration, **thresholds):
+    """
+    Agrupa los segmentos débiles contiguos en ventanas (inicio, fin) en segundos
+    """
+    windows = []
+    for seg in segments:
+        if not is_weak(seg, **thresholds):
+            continue
+        start = max(0.0, seg['start'] - PADDING_SECONDS)
+        end = min(duration, seg['end'] + PADDING_SECONDS)
+        if windows and start - windows[-1][1] <= MERGE_GAP_SECONDS and end - windows[-1][0] <= MAX_WINDOW_SECONDS:
+            windows[-1] = (windows[-1][0], end)
+        else:
+            windows.append((start, end))
+    return windows
+
+def refine_segments(audio, segments, fast_model, refine_model, language='es', device=None, backend=None,
+                    **thresholds):
+    """
+    Segunda pasada: vuelve a decodificar con refine_model solo las zonas de baja confianza
+    de la primera pasada. Devuelve (segmentos, estadísticas); cada segmento indica en
+    'model' qué modelo lo produjo.
+    """
+    from backends import get_backend
+    engine = get_backend(backend)
+
+    duration = len(audio) / SAMPLE_RATE
+    windows = weak_windows(segments, duration, **thresholds)
+    refined = [dict(seg, model=seg.get('model', fast_model)) for seg in segments]
+
+    redecoded = 0.0
+    start_time = time.perf_counter()
+    for win_start, win_end in windows:
+        # Segmentos de la primera pasada que quedan sustituidos por esta ventana
+        inside = [seg for seg in refined
+                  if seg['start'] >= win_start - 1e-3 and seg['end'] <= win_end + 1e-3]
+        if not inside:
+            continue
+        win_start = min(win_start, inside[0]['start'])
+        win_end = max(win_end, inside[-1]['end'])
+        previous = [seg for seg in refined if seg['end'] <= win_start]
+        prompt = ''.join(seg['text'] for seg in previous[-3:])[-200:] or None
+
+        redecoded += win_end - win_start
+        window = np.asarray(audio[int(win_start * SAMPLE_RATE):int(win_end * SAMPLE_RATE)])
+        result = engine.transcribe(window, model_size=refine_model, language=language, initial_prompt=prompt,
+                                   device=device)
+        replacement = [dict(offset_segment(seg, win_start), model=refine_model) for seg in result]
+
+        inside_ids = {id(seg) for seg in inside}
+        first = next(i for i, seg in enumerate(refined) if id(seg) in inside_ids)
+        refined = [seg for seg in refined if id(seg) not in inside_ids]
+        refined[first:first] = replacement
+    refine_time = time.perf_counter() - start_time
+
+    fast_cost = MODEL_COST.get(fast_model, 1)
+    refine_cost = MODEL_COST.get(refine_model, 1)
+    used = fast_cost * duration + refine_cost * redecoded
+    full = refine_cost * duration
+    stats = {
+        'fast_model': fast_model,
+        'refine_model': refine_model,
+        'segments': len(refined),
+        'weak_windows': len(windows),
+        'refined_segments': sum(1 for seg in refined if seg['model'] == refine_model),
+        'audio_seconds': round(duration, 1),
+        'redecoded_seconds': round(redecoded, 1),
+        'refine_time': round(refine_time, 2),
+        # Cómputo estimado frente a usar el modelo grande en todo el audio
+        'compute_saved': round(1 - used / full, 3) if full else 0.0,
+    }
+    print(f"Refinadas {len(windows)} zonas ({redecoded:.0f}s de {duration:.0f}s) con {refine_model}; "
+          f"cómputo ahorrado estimado: {stats['compute_saved'] * 100:.0f}%")
+    return refined, stats
@@ -0,0 +1,246 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import cached_property
+
+# Palabras comunes (stop words en español) que no aportan a la puntuación
+STOP_WORDS = {
+    'el', 'la', 'de', 'que', 'y', 'a', 'en', 'un', 'es', 'se', 'no', 'por',
+    'con', 'su', 'para', 'una', 'o', 'del', 'al', 'lo', 'como', 'más',
+    'pero', 'sus', 'le', 'ya', 'este', 'sí', 'porque', 'esta', 'son',
+    'entre', 'está', 'cuando', 'muy', 'sin', 'sobre', 'ser', 'tiene',
+    'también', 'me', 'hasta', 'hay', 'donde', 'han', 'quien', 'están',
+    'estado', 'desde', 'todo', 'nos', 'durante', 'estados', 'todos',
+    'uno', 'les', 'ni', 'contra', 'otros', 'fueron', 'ese', 'eso', 'había',
+    'ante', 'ellos', 'era', 'éramos', 'eran', 'eras', 'eres', 'esa', 'esas',
+    'este', 'estemos', 'esto', 'estos', 'estoy', 'estuvo', 'estuve',
+    'estuviera', 'estuviese', 'estuviesen', 'estuviesemos', 'esté',
+    'estéis', 'estén', 'estés', 'estábamos', 'estabais', 'estaban',
+    'estabas', 'estaba', 'estada', 'estadas', 'estado', 'estados',
+    'estatua'
+}
+
+# Stop words más reducidas usadas para extraer palabras clave
+KEYWORD_STOP_WORDS = {
+    'el', 'la', 'de', 'que', 'y', 'a', 'en', 'un', 'es', 'se', 'no', 'por',
+    'con', 'su', 'para', 'una', 'o', 'del', 'al', 'lo', 'como', 'más',
+    'pero', 'sus', 'le', 'ya', 'este', 'sí', 'porque', 'esta', 'son',
+    'entre', 'está', 'cuando', 'muy', 'sin', 'sobre', 'ser', 'tiene',
+    'también', 'me', 'hasta', 'hay', 'donde', 'han', 'quien', 'están'
+}
+
+# Oraciones y tokens: los delimitadores de oración se reconocen en la misma pasada que las palabras
+SENTENCE_SPLIT = re.compile(r'[.!?]+')
+TOKEN_PATTERN = re.compile(r'\w+|[.!?]+')
+PARAGRAPH_SEPARATOR = '\n\n'
+
+# Vocabulario base compartido: las stop words tienen ids fijos al principio, primero las de
+# palabras clave (que son un subconjunto de STOP_WORDS). Así filtrarlas es comparar ids.
+BASE_VOCABULARY = {word: i for i, word in enumerate(
+    sorted(KEYWORD_STOP_WORDS) + sorted(STOP_WORDS - KEYWORD_STOP_WORDS))}
+NUM_KEYWORD_STOP_WORDS = len(KEYWORD_STOP_WORDS)
+NUM_STOP_WORDS = len(BASE_VOCABULARY)
+
+# Documentos analizados que se conservan en memoria
+DEFAULT_CACHE_ENTRIES = int(os.environ.get('ANALYSIS_CACHE_ENTRIES', 32))
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+class AnalyzedDocument:
+    """
+    Análisis de un texto calculado una sola vez y compartido por el resumen, las palabras
+    clave y el esquema: oraciones, id de término de cada palabra y oración a
+    la que pertenece, frecuencias y párrafos. Cada parte se calcula al pedirla por primera vez
+    y los resultados derivados se guardan con memo().
+    """
+
+    def __init__(self, text, key=None):
+        self.text = text
+        self.key = key or text_hash(text)
+        self._results = {}
+        self._lock = threading.Lock()
+
+    @cached_property
+    def _tokens(self):
+        import numpy as np
+        sentences = []
+        raw_to_kept = []
+        for piece in SENTENCE_SPLIT.split(self.text):
+            piece = piece.strip()
+            raw_to_kept.append(len(sentences) if piece else -1)
+            if piece:
+                sentences.append(piece)
+
+        tokens = TOKEN_PATTERN.findall(self.text.lower())
+        # Términos nuevos en orden de primera aparición (dict.fromkeys recorre en C)
+        vocabulary = dict(BASE_VOCABULARY)
+        unique = list(dict.fromkeys(tokens))
+        for token in unique:
+            if token not in vocabulary:
+                vocabulary[token] = len(vocabulary)
+        terms = list(vocabulary)
+        ids = np.fromiter(map(vocabulary.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+
+        # Los delimitadores ([.!?]+) marcan el paso a la siguiente oración
+        is_delimiter = np.fromiter((term[0] in '.!?' for term in terms), dtype=bool, count=len(terms))
+        delimiters = is_delimiter[ids]
+        raw_sentence = np.cumsum(delimiters)
+        words = ~delimiters
+        term_ids = ids[words]
+        sentence_ids = np.asarray(raw_to_kept, dtype=np.int64)[raw_sentence[words]]
+        # Orden de primera aparición de cada término (para desempatar como Counter.most_common)
+        first_seen = np.full(len(terms), len(terms), dtype=np.int64)
+        first_seen[[vocabulary[token] for token in unique]] = np.arange(len(unique))
+        return {
+            'sentences': sentences,
+            'terms': terms,
+            'vocabulary': vocabulary,
+            'term_ids': term_ids,
+            'sentence_ids': sentence_ids,
+            'counts': np.bincount(term_ids, minlength=len(terms)),
+            'first_seen': first_seen,
+        }
+
+    @property
+    def sentences(self):
+        return self._tokens['sentences']
+
+    @cached_property
+    def period_sentences(self):
+        """
+        Oraciones separadas solo por '.', como el resumen que se escribe con cada transcripción
+        (sentences también corta en '!' y '?')
+        """
+        return [piece.strip() for piece in self.text.split('.') if piece.strip()]
+
+    @property
+    def terms(self):
+        return self._tokens['terms']
+
+    @property
+    def vocabulary(self):
+        return self._tokens['vocabulary']
+
+    @property
+    def term_ids(self):
+        return self._tokens['term_ids']
+
+    @property
+    def sentence_ids(self):
+        return self._tokens['sentence_ids']
+
+    @property
+    def counts(self):
+        return self._tokens['counts']
+
+    @property
+    def first_seen(self):
+        return self._tokens['first_seen']
+
+    @cached_property
+    def paragraph_spans(self):
+        """
+        (inicio, fin) de cada párrafo en el texto, separados por una línea en blanco
+        """
+        spans = []
+        start = 0
+        while True:
+            end = self.text.find(PARAGRAPH_SEPARATOR, start)
+            if end < 0:
+                spans.append((start, len(self.text)))
+                return spans
+            spans.append((start, end))
+            start = end + len(PARAGRAPH_SEPARATOR)
+
+    @cached_property
+    def paragraphs(self):
+        return [self.text[start:end] for start, end in self.paragraph_spans]
+
+    @cached_property
+    def lowered_paragraphs(self):
+        return [paragraph.lower() for paragraph in self.paragraphs]
+
+    def memo(self, key, compute):
+        """
+        Resultado derivado del documento (resumen, palabras clave...), calculado una vez
+        """
+        with self._lock:
+            if key in self._results:
+                return self._results[key]
+        value = compute()
+        with self._lock:
+            return self._results.setdefault(key, value)
+
+class AnalysisCache:
+    """
+    Documentos analizados recientes, indexados por el hash del texto (menos usado recientemente)
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, text):
+        key = text_hash(text)
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+                self.hits += 1
+                return document
+            self.misses += 1
+            document = AnalyzedDocument(text, key)
+            if self.max_entries > 0:
+                self._documents[key] = document
+                while len(self._documents) > self.max_entries:
+                    self._documents.popitem(last=False)
+                    self.evictions += 1
+            return document
+
+    def find(self, key):
+        """
+        Documento ya analizado por su clave (el hash del texto), o None si no está en la caché
+        """
+        with self._lock:
+            document = self._documents.get(key)
+            if document is None:
+                self.misses += 1
+                return None
+            self._documents.move_to_end(key)
+            self.hits += 1
+            return document
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._documents),
+                'max_entries': self.max_entries,
+            }
+
+# Caché global del proceso
+cache = AnalysisCache()
+
+def analyze(text):
+    """
+    Documento analizado del texto (de la caché si ya se analizó). Acepta también un
+    AnalyzedDocument, que se devuelve tal cual.
+    """
+    if isinstance(text, AnalyzedDocument):
+        return text
+    return cache.get(text)
@@ -1,27 +1,173 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, g
 import os
-from werkzeug.utils import secure_filename
+import time
+from urllib.parse import quote
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename, send_file as werkzeug_send_file
 import json
 
-# Configurar FFmpeg antes de importar transcriber
-import imageio_ffmpeg
-os.environ['PATH'] = os.path.dirname(imageio_ffmpeg.get_ffmpeg_exe()) + os.pathsep + os.environ['PATH']
-
-from transcriber import process_video
+# PyTorch, Whisper, MoviePy, NumPy y Pillow se importan al usarlos por primera vez
+# (ver startup_report.py), para que el servidor arranque sin cargarlos
 from humanizer import humanize_text, improve_readability
-from summarizer import summarize_text, extract_keywords
+from summarizer import summarize_text, extract_keywords, SUMMARY_METHODS
+from analysis import analyze, cache as analysis_cache
 from media_compressor import compress_image, convert_image_format, compress_video, convert_video_format, get_media_info
+from model_registry import registry as model_registry, get_process_rss_mb, set_default_replicas
+from jobs import JobManager, QueueFullError
+from search_index import index as search_index
+from transcription_cache import cache as transcription_cache, save_upload_hashed, read_upload_hash
+from chunked_uploads import ChunkedUploadManager, UploadError, CHUNK_MAX_MB
+from streaming_pipeline import UploadPipeline, is_streamable, process_upload_stream, remove_orphaned_streams
+from cpu_engine import plan_threads
+import metrics
+import profiling
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['OUTPUT_FOLDER'] = 'outputs'
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024
+# Las subidas por fragmentos no tienen ese límite: cada fragmento puede ocupar hasta
+# UPLOAD_CHUNK_MAX_MB y el archivo completo hasta UPLOAD_MAX_MB
+app.config['UPLOAD_CHUNK_MAX_LENGTH'] = CHUNK_MAX_MB * 1024 * 1024
+# Tamaño de fragmento que se sugiere al cliente
+app.config['UPLOAD_CHUNK_SIZE'] = min(8 * 1024 * 1024, app.config['UPLOAD_CHUNK_MAX_LENGTH'])
+# Modelos Whisper a precargar al iniciar, separados por comas (p. ej. "base,small")
+app.config['WHISPER_WARMUP_MODELS'] = os.environ.get('WHISPER_WARMUP_MODELS', '')
+# Trabajos de transcripción simultáneos y máximo de trabajos pendientes
+app.config['PROCESS_WORKERS'] = int(os.environ.get('PROCESS_WORKERS', 2))
+app.config['PROCESS_MAX_PENDING'] = int(os.environ.get('PROCESS_MAX_PENDING', 20))
+# Copias de cada modelo cargadas como máximo (por defecto una por trabajo simultáneo)
+app.config['WHISPER_MODEL_REPLICAS'] = int(os.environ.get('WHISPER_MODEL_REPLICAS', app.config['PROCESS_WORKERS']))
+# Descargas de outputs/: '' (las envía Flask), 'x-sendfile' (Apache/lighttpd) o 'x-accel-redirect'
+# (nginx). Con un proxy delante los bytes los envía el servidor web con sendfile, no un worker de Python
+app.config['DOWNLOAD_OFFLOAD'] = os.environ.get('DOWNLOAD_OFFLOAD', '').lower()
+# Location interna de nginx que apunta a outputs/ (solo para x-accel-redirect)
+app.config['DOWNLOAD_ACCEL_PREFIX'] = os.environ.get('DOWNLOAD_ACCEL_PREFIX', '/protected-outputs/')
+# max-age de Cache-Control de las descargas (0 = el navegador revalida con ETag/Last-Modified)
+app.config['DOWNLOAD_MAX_AGE'] = int(os.environ.get('DOWNLOAD_MAX_AGE', 0))
+# Fracción de peticiones que se perfilan aunque no lo pidan (0 = solo con X-Profile o ?profile=1)
+app.config['PROFILE_SAMPLE_RATE'] = profiling.DEFAULT_SAMPLE_RATE
+# Cada cuántos segundos se compara el índice de búsqueda con outputs/ (0 = solo al arrancar)
+app.config['SEARCH_SYNC_SECONDS'] = float(os.environ.get('SEARCH_SYNC_SECONDS', 60))
 
 ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv'}
 
+# Los trabajos simultáneos se reparten los núcleos en lugar de competir por todos; cada
+# uno decodifica con su propia copia del modelo para que el reparto se ejecute en paralelo
+plan_threads(app.config['PROCESS_WORKERS'])
+set_default_replicas(app.config['WHISPER_MODEL_REPLICAS'])
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def warm_up_models():
+    """
+    Precarga en segundo plano los modelos configurados para que la primera
+    petición a /process no pague el tiempo de carga
+    """
+    sizes = [s for s in app.config['WHISPER_WARMUP_MODELS'].split(',') if s.strip()]
+    if not sizes:
+        return
+    import threading
+    threading.Thread(target=model_registry.warm_up, args=(sizes,), daemon=True).start()
+
+warm_up_models()
+
+def sync_search_index():
+    """
+    Indexa en segundo plano las transcripciones que aún no estén en el índice y, cada
+    SEARCH_SYNC_SECONDS, recoge las que se añadan o borren a mano en outputs/. Las que
+    escribe process_video se indexan al momento.
+    """
+    import threading
+    def run():
+        while True:
+            try:
+                added, removed = search_index.sync()
+                if added or removed:
+                    print(f"Índice de búsqueda actualizado: {added} añadidas, {removed} eliminadas")
+            except Exception as e:
+                print(f"Error al sincronizar el índice de búsqueda: {e}")
+            if app.config['SEARCH_SYNC_SECONDS'] <= 0:
+                return
+            time.sleep(app.config['SEARCH_SYNC_SECONDS'])
+    threading.Thread(target=run, daemon=True).start()
+
+sync_search_index()
+
+chunked_uploads = ChunkedUploadManager(upload_dir=app.config['UPLOAD_FOLDER'])
+
+# Checkpoints y PCM de tuberías que no llegaron a limpiarse (p. ej. el proceso cayó)
+if remove_orphaned_streams():
+    print("Eliminados los restos de transcripciones en tubería interrumpidas")
+
+job_manager = JobManager(max_workers=app.config['PROCESS_WORKERS'],
+                         max_pending=app.config['PROCESS_MAX_PENDING'])
+
+metrics.registry.gauge('classtranscriber_jobs_queued', 'Trabajos en cola esperando un hilo libre',
+                       callback=job_manager.queue_depth)
+metrics.registry.gauge('classtranscriber_process_resident_bytes', 'Memoria residente del proceso',
+                       callback=lambda: int(get_process_rss_mb() * 1024 * 1024))
+metrics.registry.gauge('classtranscriber_models_resident_bytes', 'Memoria estimada de los modelos cargados',
+                       callback=lambda: int(model_registry.stats()['resident_models_mb'] * 1024 * 1024))
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+# Rutas cuyo trabajo se hace en segundo plano: se perfila el trabajo, no la petición
+PROFILE_JOB_ENDPOINTS = {'process'}
+PROFILE_EXCLUDED_ENDPOINTS = {'static', 'metrics_endpoint', 'list_profiles', 'profile_detail', 'download_profile'}
+
+@app.before_request
+def start_profiling():
+    if request.endpoint in PROFILE_EXCLUDED_ENDPOINTS:
+        return
+    if not profiling.wants_profile(request, app.config['PROFILE_SAMPLE_RATE']):
+        return
+    if request.endpoint in PROFILE_JOB_ENDPOINTS:
+        g.profile_job = True
+        return
+    profiler = profiling.Profiler('request', f"{request.method} {request.path}")
+    if profiler.start():
+        g.profiler = profiler
+
+@app.after_request
+def stop_profiling(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        summary = profiler.stop(route=request.url_rule.rule if request.url_rule else request.path,
+                                method=request.method, status=response.status_code)
+        response.headers['X-Profile-Id'] = summary['id']
+    return response
+
+@app.teardown_request
+def release_profiler(exc):
+    # Si la respuesta no llegó a generarse, el perfil se cierra igualmente
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop(status='error', error=str(exc) if exc else None)
+
+@app.after_request
+def record_request_metrics(response):
+    """
+    Latencia, bytes de entrada y salida y errores por ruta (la plantilla de la ruta,
+    no la URL, para no crear una serie por archivo)
+    """
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    status = str(response.status_code)
+    metrics.HTTP_REQUESTS.inc(route=route, method=request.method, status=status)
+    if response.status_code >= 400:
+        metrics.HTTP_ERRORS.inc(route=route, status=status)
+    if request.content_length:
+        metrics.HTTP_BYTES_IN.inc(request.content_length, route=route)
+    if response.content_length:
+        metrics.HTTP_BYTES_OUT.inc(response.content_length, route=route)
+    start = g.get('request_start')
+    if start is not None:
+        metrics.HTTP_SECONDS.observe(time.perf_counter() - start, route=route)
+    return response
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -39,58 +185,413 @@ def upload_file():
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        # El hash del contenido se calcula mientras se escribe el archivo
+        with metrics.time_stage('upload_save'):
+            content_hash = save_upload_hashed(file, filepath)
         
         return jsonify({
             'success': True,
             'filename': filename,
+            'content_hash': content_hash,
             'message': 'Archivo subido exitosamente'
         })
     
     return jsonify({'error': 'Formato de archivo no permitido'}), 400
 
+def upload_error(e):
+    response = {'error': str(e)}
+    if e.offset is not None:
+        response['offset'] = e.offset
+    return jsonify(response), e.status
+
+# Opciones de /process que se pueden pedir al iniciar una subida
+UPLOAD_PROCESS_OPTIONS = ('generate_summary', 'refine_model', 'backend')
+
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    """
+    Inicia una subida por fragmentos: {"filename": ..., "size": bytes (opcional)}.
+    Con "process": true (o un objeto con las opciones de /process) la transcripción empieza
+    mientras llegan los bytes si el contenedor lo permite, o al finalizar la subida si no.
+    """
+    data = request.json or {}
+    filename = secure_filename(data.get('filename') or '')
+    size = data.get('size')
+    process = data.get('process')
+    
+    if not filename:
+        return jsonify({'error': 'No filename provided'}), 400
+    if not allowed_file(filename):
+        return jsonify({'error': 'Formato de archivo no permitido'}), 400
+    if size is not None and not isinstance(size, int):
+        return jsonify({'error': 'Invalid size'}), 400
+    
+    if process is True:
+        process = {}
+    elif isinstance(process, dict):
+        process = {key: process[key] for key in UPLOAD_PROCESS_OPTIONS if key in process}
+        from backends import available_backends
+        if process.get('backend') and process['backend'] not in available_backends():
+            return jsonify({'error': f"Backend not available: {process['backend']}"}), 400
+    else:
+        process = None
+    
+    try:
+        upload = chunked_uploads.create(filename, size, process)
+    except UploadError as e:
+        return upload_error(e)
+    
+    response = upload.to_dict()
+    response.update({
+        'success': True,
+        'upload_url': f"/uploads/{upload.id}",
+        'chunk_size': app.config['UPLOAD_CHUNK_SIZE'],
+        'max_chunk_size': app.config['UPLOAD_CHUNK_MAX_LENGTH']
+    })
+    return jsonify(response), 201
+
+@app.route('/uploads/<upload_id>', methods=['GET', 'HEAD'])
+def upload_status(upload_id):
+    # Offset desde el que hay que continuar tras un corte
+    upload = chunked_uploads.get(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    response = jsonify(upload.to_dict())
+    response.headers['Upload-Offset'] = str(upload.offset)
+    return response
+
+@app.route('/uploads/<upload_id>', methods=['PUT', 'PATCH'])
+def append_upload(upload_id):
+    """
+    Añade un fragmento. El cuerpo son los bytes en crudo (no multipart) y el offset va
+    en la cabecera Upload-Offset o en ?offset=
+    """
+    upload = chunked_uploads.get(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    offset = request.headers.get('Upload-Offset', request.args.get('offset'))
+    if offset is None or not offset.isdigit():
+        return jsonify({'error': 'Missing or invalid offset'}), 400
+    
+    # El cuerpo se escribe en disco a medida que llega, sin pasar por el parser de formularios
+    request.max_content_length = app.config['UPLOAD_CHUNK_MAX_LENGTH']
+    try:
+        with metrics.time_stage('upload_chunk'):
+            offset = chunked_uploads.append(upload, int(offset), request.stream, request.content_length,
+                                            on_written=start_pipeline)
+    except UploadError as e:
+        return upload_error(e)
+    
+    data = upload.to_dict()
+    data['success'] = True
+    response = jsonify(data)
+    response.headers['Upload-Offset'] = str(offset)
+    return response
+
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+def abort_upload(upload_id):
+    upload = chunked_uploads.get(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    chunked_uploads.abort(upload)
+    return jsonify({'success': True})
+
+@app.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    """
+    Termina la subida; con "content_hash" se comprueba el SHA-256 calculado por el cliente
+    """
+    upload = chunked_uploads.get(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        with metrics.time_stage('upload_finalize'):
+            filepath, content_hash = chunked_uploads.finalize(upload, data.get('content_hash'))
+    except UploadError as e:
+        return upload_error(e)
+    
+    response = {
+        'success': True,
+        'filename': upload.filename,
+        'content_hash': content_hash,
+        'message': 'Archivo subido exitosamente'
+    }
+    if upload.pipeline is not None and upload.pipeline.aborted:
+        # La tubería se canceló por inactividad: se transcribe el archivo completo
+        upload.pipeline = None
+        upload.job_id = None
+    if upload.process is not None and upload.job_id is None:
+        # El contenedor no admitía la tubería: se transcribe ahora el archivo completo
+        from transcriber import process_video
+        try:
+            job = job_manager.submit(process_video, filepath, upload.process.get('generate_summary', True),
+                                     description=upload.filename, stream=True, content_hash=content_hash,
+                                     refine_model=upload.process.get('refine_model'),
+                                     backend=upload.process.get('backend'))
+            upload.job_id = job.id
+        except QueueFullError as e:
+            response['process_error'] = str(e)
+    if upload.job_id:
+        response.update({
+            'job_id': upload.job_id,
+            'pipelined': upload.pipeline is not None,
+            'status_url': f"/jobs/{upload.job_id}",
+            'events_url': f"/jobs/{upload.job_id}/events"
+        })
+    return jsonify(response)
+
+def start_pipeline(upload, offset):
+    """
+    Si la subida pidió transcripción y el contenedor se puede leer secuencialmente, lanza
+    FFmpeg sobre lo ya recibido y encola la transcripción en tubería. Se llama tras cada
+    fragmento hasta que se puede decidir (en un MP4 hace falta ver si moov va antes que mdat).
+    """
+    if upload.process is None or upload.pipeline_decided:
+        return
+    streamable = is_streamable(upload.filename, upload.data_path, offset)
+    if streamable is None and (upload.size is None or offset < upload.size):
+        return
+    upload.pipeline_decided = True
+    if not streamable:
+        return
+    
+    pipeline = UploadPipeline(upload, os.path.join(app.config['UPLOAD_FOLDER'], upload.filename))
+    try:
+        job = job_manager.submit(process_upload_stream, pipeline, upload.process.get('generate_summary', True),
+                                 description=upload.filename, stream=True,
+                                 refine_model=upload.process.get('refine_model'),
+                                 backend=upload.process.get('backend'))
+    except QueueFullError:
+        # Se volverá a intentar como trabajo normal al finalizar la subida
+        return
+    pipeline.start(offset)
+    upload.pipeline = pipeline
+    upload.job_id = job.id
+
 @app.route('/process', methods=['POST'])
 def process():
     data = request.json
     filename = data.get('filename')
     generate_summary = data.get('generate_summary', True)
+    stream = data.get('stream', True)
+    refine_model = data.get('refine_model')
+    backend = data.get('backend')
     
     if not filename:
         return jsonify({'error': 'No filename provided'}), 400
     
+    from backends import available_backends
+    if backend and backend not in available_backends():
+        return jsonify({'error': f'Backend not available: {backend}'}), 400
+    
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
     
     if not os.path.exists(filepath):
         return jsonify({'error': 'File not found'}), 404
     
+    from transcriber import process_video
+    func = process_video
+    profile_id = None
+    if g.get('profile_job'):
+        # El perfil cubre la ejecución del trabajo en su hilo
+        profile_id = profiling.new_profile_id('process')
+        func = profiling.profile_call(process_video, 'process', filename, profile_id)
     try:
-        result = process_video(filepath, generate_summary)
-        return jsonify({
-            'success': True,
-            'transcription': result['transcription'],
-            'summary': result.get('summary', ''),
-            'output_file': result['output_file']
-        })
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return jsonify({'error': str(e)}), 500
+        job = job_manager.submit(func, filepath, generate_summary, description=filename,
+                                 stream=stream, content_hash=read_upload_hash(filepath), refine_model=refine_model,
+                                 backend=backend)
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    
+    response = {
+        'success': True,
+        'job_id': job.id,
+        'status_url': f"/jobs/{job.id}",
+        'events_url': f"/jobs/{job.id}/events"
+    }
+    if profile_id:
+        response['profile_url'] = f"/profiles/{profile_id}"
+    return jsonify(response), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """
+    Envía el avance y los segmentos transcritos como Server-Sent Events
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    def event(name, data):
+        return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
+    def generate():
+        version = -1
+        sent = 0
+        while True:
+            current = job.wait_for_change(version)
+            if current == version:
+                # Comentario para mantener viva la conexión a través de proxies
+                yield ": keepalive\n\n"
+                continue
+            version = current
+            
+            segments = job.segments_since(sent)
+            sent += len(segments)
+            for segment in segments:
+                yield event('segment', segment)
+            yield event('progress', {'status': job.status, 'stage': job.stage, 'progress': job.progress})
+            
+            if job.status == 'done':
+                yield event('done', {'result_url': f"/jobs/{job.id}/result"})
+                return
+            if job.status == 'error':
+                yield event('failed', {'error': job.error})
+                return
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status == 'error':
+        return jsonify({'error': job.error}), 500
+    if job.status != 'done':
+        return jsonify(job.to_dict()), 202
+    
+    result = job.result
+    return jsonify({
+        'success': True,
+        'transcription': result['transcription'],
+        'summary': result.get('summary', ''),
+        'output_file': result['output_file'],
+        'segments_file': result.get('segments_file'),
+        'cached': result.get('cached', False),
+        'adaptive': result.get('adaptive'),
+        'timings': result.get('timings', {})
+    })
+
+@app.route('/model-stats')
+def model_stats():
+    return jsonify(model_registry.stats())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/profiles')
+def list_profiles():
+    return jsonify({'profiles': profiling.list_profiles()})
+
+@app.route('/profiles/<profile_id>')
+def profile_detail(profile_id):
+    path = profiling.profile_path(profile_id, 'json')
+    if path is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    with open(path, encoding='utf-8') as f:
+        return jsonify(json.load(f))
+
+@app.route('/profiles/<profile_id>/download')
+def download_profile(profile_id):
+    # prof: binario de pstats (snakeviz, pstats.Stats); txt: informe ordenado por tiempo acumulado
+    fmt = request.args.get('format', 'prof')
+    if fmt == 'txt':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in ('cumulative', 'tottime', 'calls'):
+            return jsonify({'error': f"Unsupported sort: {sort}"}), 400
+        report = profiling.render_text(profile_id, sort=sort)
+        if report is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        return Response(report, mimetype='text/plain; charset=utf-8')
+    if fmt != 'prof':
+        return jsonify({'error': f"Unsupported format: {fmt}"}), 400
+    path = profiling.profile_path(profile_id, 'prof')
+    if path is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=f"{profile_id}.prof")
+
+@app.route('/backends')
+def backends():
+    from backends import list_backends
+    return jsonify({'backends': list_backends()})
+
+@app.route('/cache-stats')
+def cache_stats():
+    stats = transcription_cache.stats()
+    stats['analysis'] = analysis_cache.stats()
+    return jsonify(stats)
+
+def send_output(path, download_name=None):
+    """
+    Envía un archivo de outputs/ como descarga con ETag y Last-Modified (304 si el cliente
+    ya lo tiene) y peticiones Range (206), para reanudar descargas interrumpidas.
+    Con DOWNLOAD_OFFLOAD la respuesta va sin cuerpo y el proxy envía el archivo (y
+    resuelve el Range) a partir de la cabecera X-Sendfile o X-Accel-Redirect.
+    """
+    path = os.path.abspath(path)
+    offload = app.config['DOWNLOAD_OFFLOAD']
+    if offload not in ('x-sendfile', 'x-accel-redirect'):
+        return send_file(path, as_attachment=True, download_name=download_name, conditional=True, etag=True,
+                         max_age=app.config['DOWNLOAD_MAX_AGE'] or None)
+    
+    response = werkzeug_send_file(path, request.environ, as_attachment=True, download_name=download_name,
+                                  conditional=False, etag=True, max_age=app.config['DOWNLOAD_MAX_AGE'] or None,
+                                  use_x_sendfile=True, response_class=app.response_class)
+    if offload == 'x-accel-redirect':
+        relative = os.path.relpath(path, os.path.abspath(app.config['OUTPUT_FOLDER'])).replace(os.sep, '/')
+        del response.headers['X-Sendfile']
+        response.headers['X-Accel-Redirect'] = app.config['DOWNLOAD_ACCEL_PREFIX'].rstrip('/') + '/' + quote(relative)
+    # Los 304 se resuelven aquí; los rangos los resuelve el proxy con la petición original
+    return response.make_conditional(request)
 
 @app.route('/download/<filename>')
 def download_file(filename):
-    filepath = os.path.join(app.config['OUTPUT_FOLDER'], filename)
-    if os.path.exists(filepath):
-        return send_file(filepath, as_attachment=True)
+    fmt = request.args.get('format')
+    if fmt:
+        from segment_store import RENDER_FORMATS, render_file, segments_path_for
+        # Subtítulos y JSON se generan a partir del registro de segmentos
+        if fmt not in RENDER_FORMATS:
+            return jsonify({'error': f"Unsupported format: {fmt}"}), 400
+        segments_path = segments_path_for(secure_filename(filename), app.config['OUTPUT_FOLDER'])
+        if not os.path.exists(segments_path):
+            return jsonify({'error': 'No segments available for this file'}), 404
+        rendered_path = render_file(segments_path, fmt)
+        download_name = os.path.basename(segments_path).replace('_segments.npz', f".{fmt}")
+        return send_output(rendered_path, download_name)
+    
+    filepath = safe_join(app.config['OUTPUT_FOLDER'], filename)
+    if filepath and os.path.isfile(filepath):
+        return send_output(filepath)
     return jsonify({'error': 'File not found'}), 404
 
 @app.route('/list-outputs')
 def list_outputs():
-    files = []
-    if os.path.exists(app.config['OUTPUT_FOLDER']):
-        for f in os.listdir(app.config['OUTPUT_FOLDER']):
-            if f.endswith('.txt'):
-                files.append(f)
-    return jsonify({'files': files})
+    # Se sirve desde los metadatos del índice, sin recorrer outputs/
+    documents = search_index.list_documents()
+    return jsonify({'files': [doc['filename'] for doc in documents], 'documents': documents})
+
+@app.route('/search')
+def search():
+    query = request.args.get('q', '').strip()
+    limit = request.args.get('limit', 10, type=int)
+    
+    if not query:
+        return jsonify({'error': 'No query provided'}), 400
+    
+    return jsonify(search_index.search(query, limit=limit))
 
 @app.route('/humanize', methods=['POST'])
 def humanize():
@@ -118,16 +619,22 @@ def summarize():
     data = request.json
     text = data.get('text', '')
     percentage = data.get('percentage', 30)
+    method = data.get('method', 'frequency')
     
     if not text:
         return jsonify({'error': 'No text provided'}), 400
+    if method not in SUMMARY_METHODS:
+        return jsonify({'error': f"Unsupported method: {method}"}), 400
     
     try:
-        summary = summarize_text(text, percentage=percentage)
-        keywords = extract_keywords(text, num_keywords=10)
+        # El documento queda en memoria: otros porcentajes se piden con GET /summarize/<doc_id>
+        document = analyze(text)
+        summary = summarize_text(document, percentage=percentage, method=method)
+        keywords = extract_keywords(document, num_keywords=10)
         
         return jsonify({
             'success': True,
+            'doc_id': document.key,
             'summary': summary,
             'keywords': keywords,
             'original_length': len(text),
@@ -138,6 +645,39 @@ def summarize():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/summarize/<doc_id>')
+def summarize_document(doc_id):
+    """
+    Resumen de un texto ya enviado a /summarize con otro porcentaje o método, sin volver a
+    enviarlo. La clasificación de las oraciones se calcula una vez por documento y método;
+    cada porcentaje solo toma las primeras k oraciones.
+    """
+    percentage = request.args.get('percentage', 30, type=int)
+    method = request.args.get('method', 'frequency')
+    
+    if method not in SUMMARY_METHODS:
+        return jsonify({'error': f"Unsupported method: {method}"}), 400
+    if not 0 < percentage <= 100:
+        return jsonify({'error': 'Invalid percentage'}), 400
+    document = analysis_cache.find(doc_id)
+    if document is None:
+        # Expulsado de la caché (o nunca enviado): el cliente debe volver a enviar el texto
+        return jsonify({'error': 'Unknown document'}), 404
+    
+    try:
+        summary = summarize_text(document, percentage=percentage, method=method)
+        return jsonify({
+            'success': True,
+            'doc_id': document.key,
+            'summary': summary,
+            'original_length': len(document.text),
+            'summary_length': len(summary)
+        })
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/compress-image', methods=['POST'])
 def compress_image_route():
     if 'file' not in request.files:
@@ -0,0 +1,349 @@
+import importlib.util
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+import numpy as np
+from ffmpeg_utils import ensure_ffmpeg_on_path, get_ffmpeg_exe
+from model_registry import ModelRegistry, registry as whisper_registry, load_whisper_model
+from parallel_transcriber import SAMPLE_RATE, offset_segment
+
+# Motor de transcripción por defecto (se puede elegir otro en cada petición)
+DEFAULT_BACKEND = os.environ.get('TRANSCRIPTION_BACKEND', 'whisper')
+
+def _has_module(name):
+    if name in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ModuleNotFoundError:
+        return False
+
+class TranscriptionBackend:
+    """
+    Interfaz común de los motores de transcripción: cargar un modelo, transcribir
+    audio a segmentos y declarar qué admite. Cada motor tiene su propio registro
+    de modelos, así que el modelo se carga una vez por proceso.
+    Los segmentos usan los mismos campos que el resto del pipeline
+    (start, end, text, avg_logprob, no_speech_prob, compression_ratio, words).
+    """
+    name = None
+    # Paquete opcional del que depende el motor
+    module = None
+    capabilities = {
+        'word_timestamps': False,   # tiempos por palabra (para unir fragmentos solapados)
+        'confidence': False,        # avg_logprob / no_speech_prob (modo adaptativo)
+        'initial_prompt': False,    # contexto de la ventana anterior
+        'gpu': False,
+    }
+
+    def __init__(self):
+        self.registry = ModelRegistry(loader=self.load)
+
+    @classmethod
+    def is_available(cls):
+        return _has_module(cls.module)
+
+    def default_device(self):
+        return 'cpu'
+
+    def load(self, model_size, device, precision):
+        raise NotImplementedError
+
+    def _transcribe(self, model, audio, language, initial_prompt, word_timestamps, verbose):
+        raise NotImplementedError
+
+    def transcribe(self, audio, model_size='base', language='es', initial_prompt=None, word_timestamps=False,
+                   device=None, verbose=None):
+        """
+        Transcribe audio (array float32 mono a 16 kHz o ruta a un archivo) y devuelve
+        la lista de segmentos con tiempos relativos al inicio del audio
+        """
+        device = device or self.default_device()
+        if isinstance(audio, str):
+            # Los motores decodifican los archivos llamando a "ffmpeg" por nombre
+            ensure_ffmpeg_on_path()
+        if not self.capabilities['initial_prompt']:
+            initial_prompt = None
+        with self.registry.use_model(model_size, device=device) as model:
+            return self._transcribe(model, audio, language, initial_prompt,
+                                    word_timestamps and self.capabilities['word_timestamps'], verbose)
+
+class WhisperBackend(TranscriptionBackend):
+    """
+    openai-whisper sobre PyTorch (el motor original)
+    """
+    name = 'whisper'
+    module = 'whisper'
+    capabilities = {'word_timestamps': True, 'confidence': True, 'initial_prompt': True, 'gpu': True}
+
+    def __init__(self):
+        # Comparte el registro global con el resto de la aplicación
+        self.registry = whisper_registry
+
+    def default_device(self):
+        from model_registry import default_device
+        return default_device()
+
+    def load(self, model_size, device, precision):
+        return load_whisper_model(model_size, device, precision)
+
+    def _transcribe(self, model, audio, language, initial_prompt, word_timestamps, verbose):
+        result = model.transcribe(audio, language=language, fp16=False, verbose=verbose,
+                                  initial_prompt=initial_prompt, word_timestamps=word_timestamps)
+        return [offset_segment(seg, 0.0) for seg in result['segments']]
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """
+    faster-whisper (CTranslate2): mismos modelos con inferencia optimizada e int8 en CPU
+    """
+    name = 'faster-whisper'
+    module = 'faster_whisper'
+    capabilities = {'word_timestamps': True, 'confidence': True, 'initial_prompt': True, 'gpu': True}
+
+    def default_device(self):
+        from model_registry import default_device
+        return default_device() if _has_module('torch') else 'cpu'
+
+    def load(self, model_size, device, precision):
+        from faster_whisper import WhisperModel
+        from cpu_engine import threads_per_job
+        if device == 'cpu':
+            compute_type = 'int8' if precision == 'int8' else 'float32'
+        else:
+            compute_type = 'float16'
+        return WhisperModel(model_size, device=device, compute_type=compute_type, cpu_threads=threads_per_job())
+
+    def _transcribe(self, model, audio, language, initial_prompt, word_timestamps, verbose):
+        segments, _ = model.transcribe(audio, language=language, initial_prompt=initial_prompt,
+                                       word_timestamps=word_timestamps)
+        result = []
+        for seg in segments:
+            if verbose:
+                print(f"[{seg.start:.2f} --> {seg.end:.2f}] {seg.text}")
+            result.append({
+                'start': seg.start,
+                'end': seg.end,
+                'text': seg.text,
+                'avg_logprob': seg.avg_logprob,
+                'no_speech_prob': seg.no_speech_prob,
+                'compression_ratio': seg.compression_ratio,
+                'words': [{'word': w.word, 'start': w.start, 'end': w.end} for w in seg.words or []],
+            })
+        return result
+
+class WhisperCppBackend(TranscriptionBackend):
+    """
+    whisper.cpp mediante pywhispercpp (solo CPU, modelos ggml)
+    """
+    name = 'whisper.cpp'
+    module = 'pywhispercpp'
+    capabilities = {'word_timestamps': False, 'confidence': False, 'initial_prompt': True, 'gpu': False}
+
+    def load(self, model_size, device, precision):
+        from pywhispercpp.model import Model
+        from cpu_engine import threads_per_job
+        return Model(model_size, n_threads=threads_per_job(), print_progress=False, print_realtime=False)
+
+    def _transcribe(self, model, audio, language, initial_prompt, word_timestamps, verbose):
+        if not isinstance(audio, str):
+            audio = np.ascontiguousarray(audio, dtype=np.float32)
+        options = {'language': language}
+        if initial_prompt:
+            options['initial_prompt'] = initial_prompt
+        result = []
+        for seg in model.transcribe(audio, **options):
+            # whisper.cpp da los tiempos en centésimas de segundo
+            start, end = seg.t0 / 100, seg.t1 / 100
+            if verbose:
+                print(f"[{start:.2f} --> {end:.2f}] {seg.text}")
+            result.append({'start': start, 'end': end, 'text': ' ' + seg.text.strip(), 'avg_logprob': None,
+                           'no_speech_prob': None, 'compression_ratio': None, 'words': []})
+        return result
+
+class OnnxBackend(TranscriptionBackend):
+    """
+    Whisper exportado a ONNX Runtime (optimum + transformers)
+    """
+    name = 'onnx'
+    module = 'optimum.onnxruntime'
+    capabilities = {'word_timestamps': False, 'confidence': False, 'initial_prompt': False, 'gpu': False}
+
+    def load(self, model_size, device, precision):
+        from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+        from transformers import AutoProcessor, pipeline
+        model_id = f"openai/whisper-{model_size}"
+        processor = AutoProcessor.from_pretrained(model_id)
+        model = ORTModelForSpeechSeq2Seq.from_pretrained(model_id, export=True)
+        return pipeline('automatic-speech-recognition', model=model, tokenizer=processor.tokenizer,
+                        feature_extractor=processor.feature_extractor, chunk_length_s=30)
+
+    def _transcribe(self, model, audio, language, initial_prompt, word_timestamps, verbose):
+        if isinstance(audio, str):
+            audio = load_audio(audio)
+        duration = len(audio) / SAMPLE_RATE
+        output = model({'raw': np.asarray(audio, dtype=np.float32), 'sampling_rate': SAMPLE_RATE},
+                       return_timestamps=True, generate_kwargs={'language': language, 'task': 'transcribe'})
+        result = []
+        for chunk in output.get('chunks', []):
+            start, end = chunk['timestamp']
+            start = start or 0.0
+            end = end if end is not None else duration
+            if verbose:
+                print(f"[{start:.2f} --> {end:.2f}] {chunk['text']}")
+            result.append({'start': start, 'end': end, 'text': chunk['text'], 'avg_logprob': None,
+                           'no_speech_prob': None, 'compression_ratio': None, 'words': []})
+        return result
+
+BACKEND_CLASSES = {cls.name: cls for cls in (WhisperBackend, FasterWhisperBackend, WhisperCppBackend, OnnxBackend)}
+
+_instances = {}
+
+def get_backend(name=None):
+    """
+    Devuelve el motor indicado (o el configurado por defecto), creado una vez por proceso
+    """
+    name = name or DEFAULT_BACKEND
+    cls = BACKEND_CLASSES.get(name)
+    if cls is None:
+        raise ValueError(f"Motor de transcripción desconocido: {name}")
+    if not cls.is_available():
+        raise ValueError(f"El motor {name} no está instalado (falta el paquete {cls.module})")
+    if name not in _instances:
+        _instances[name] = cls()
+    return _instances[name]
+
+def available_backends():
+    return [name for name, cls in BACKEND_CLASSES.items() if cls.is_available()]
+
+def list_backends():
+    return [
+        {'name': name, 'available': cls.is_available(), 'capabilities': dict(cls.capabilities),
+         'default': name == DEFAULT_BACKEND}
+        for name, cls in BACKEND_CLASSES.items()
+    ]
+
+def load_audio(path, sample_rate=SAMPLE_RATE):
+    """
+    Decodifica un archivo de audio o video a float32 mono sin cargar PyTorch ni MoviePy
+    (para que la memoria medida en el benchmark sea la del motor)
+    """
+    result = subprocess.run([get_ffmpeg_exe(), '-nostdin', '-v', 'error', '-i', path, '-f', 's16le', '-ac', '1',
+                             '-ar', str(sample_rate), '-'], capture_output=True, check=True)
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+def word_overlap(reference, hypothesis):
+    """
+    Palabras compartidas entre dos transcripciones (sin orden) respecto a la más larga
+    """
+    ref = Counter(re.findall(r'\w+', reference.lower()))
+    hyp = Counter(re.findall(r'\w+', hypothesis.lower()))
+    longest = max(sum(ref.values()), sum(hyp.values()))
+    return sum((ref & hyp).values()) / longest if longest else 1.0
+
+def _peak_rss_mb():
+    import resource
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _run_single(name, audio_path, model_size, seconds):
+    """
+    Ejecuta un motor sobre la muestra (en un proceso aparte) e imprime el resultado en JSON
+    """
+    audio = load_audio(audio_path)
+    if seconds:
+        audio = audio[:int(seconds * SAMPLE_RATE)]
+    duration = len(audio) / SAMPLE_RATE
+    backend = get_backend(name)
+
+    start = time.perf_counter()
+    backend.registry.get_model(model_size, device=backend.default_device())
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    segments = backend.transcribe(audio, model_size=model_size)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        'backend': name,
+        'audio_seconds': round(duration, 1),
+        'load_time': round(load_time, 2),
+        'transcribe_time': round(elapsed, 2),
+        'rtf': round(elapsed / duration, 3) if duration else None,
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+        'segments': len(segments),
+        'text': ''.join(seg['text'] for seg in segments),
+    }, ensure_ascii=False))
+
+def benchmark(audio_path, model_size='base', names=None, seconds=None, output_path=None):
+    """
+    Ejecuta cada motor instalado sobre el mismo audio, cada uno en su propio proceso
+    para medir la memoria pico por separado. Compara el texto con el del primer motor.
+    """
+    names = names or available_backends()
+    results = []
+    for name in names:
+        print(f"Ejecutando {name}...")
+        command = [sys.executable, os.path.abspath(__file__), '_run', name, audio_path, '--model', model_size]
+        if seconds:
+            command += ['--seconds', str(seconds)]
+        proc = subprocess.run(command, capture_output=True, text=True)
+        if proc.returncode != 0:
+            error = (proc.stderr.strip().splitlines() or ['error desconocido'])[-1]
+            print(f"  ✗ {error}")
+            results.append({'backend': name, 'error': error})
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    reference = next((r for r in results if 'error' not in r), None)
+    for result in results:
+        if 'error' not in result:
+            result['word_overlap'] = round(word_overlap(reference['text'], result['text']), 3)
+
+    print(f"\nModelo {model_size}; solapamiento de palabras respecto a {reference['backend'] if reference else '-'}")
+    print(f"{'motor':<16}{'RTF':>8}{'carga (s)':>11}{'RSS pico (MB)':>15}{'solapamiento':>14}")
+    for result in results:
+        if 'error' in result:
+            print(f"{result['backend']:<16}  error: {result['error']}")
+            continue
+        print(f"{result['backend']:<16}{result['rtf']:>8.3f}{result['load_time']:>11.2f}"
+              f"{result['peak_rss_mb']:>15.0f}{result['word_overlap'] * 100:>13.1f}%")
+
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump({'model': model_size, 'audio': audio_path, 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"Resultados guardados en {output_path}")
+    return results
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Motores de transcripción disponibles y comparativa entre ellos")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help="muestra los motores y qué admite cada uno")
+    bench = subparsers.add_parser('benchmark', help="ejecuta cada motor sobre el mismo audio")
+    bench.add_argument('audio', help="archivo de audio o video de muestra")
+    bench.add_argument('--model', default='base', help="tamaño del modelo")
+    bench.add_argument('--backends', help="motores separados por comas (por defecto, todos los instalados)")
+    bench.add_argument('--seconds', type=float, help="usar solo los primeros segundos del audio")
+    bench.add_argument('--output', help="guarda los resultados en este archivo JSON")
+    run = subparsers.add_parser('_run')
+    run.add_argument('backend')
+    run.add_argument('audio')
+    run.add_argument('--model', default='base')
+    run.add_argument('--seconds', type=float)
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for info in list_backends():
+            status = 'instalado' if info['available'] else 'no instalado'
+            caps = ', '.join(k for k, v in info['capabilities'].items() if v) or '-'
+            print(f"{info['name']:<16}{status:<14}{caps}" + ("  (por defecto)" if info['default'] else ''))
+    elif args.command == 'benchmark':
+        names = [n.strip() for n in args.backends.split(',')] if args.backends else None
+        benchmark(args.audio, model_size=args.model, names=names, seconds=args.seconds, output_path=args.output)
+    else:
+        _run_single(args.backend, args.audio, args.model, args.seconds)
@@ -0,0 +1,146 @@
+import glob
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from cpu_engine import threads_per_job
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+def find_inputs(pattern):
+    """
+    Devuelve los videos de un directorio o de un patrón glob
+    """
+    if os.path.isdir(pattern):
+        paths = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+    else:
+        paths = glob.glob(pattern, recursive=True)
+    return sorted(p for p in paths if os.path.isfile(p) and p.lower().endswith(VIDEO_EXTENSIONS))
+
+def existing_output(video_path, output_folder='outputs'):
+    """
+    Devuelve la transcripción ya generada para el video, o None si no existe
+    """
+    base_filename = os.path.splitext(os.path.basename(video_path))[0]
+    # Solo la marca de tiempo exacta: "clase_2_..." no es una salida de "clase"
+    pattern = re.compile(rf"^{re.escape(base_filename)}_\d{{8}}_\d{{6}}_transcription\.txt$")
+    if not os.path.isdir(output_folder):
+        return None
+    matches = [name for name in os.listdir(output_folder) if pattern.match(name)]
+    return max(matches) if matches else None
+
+def _init_worker(threads, slot_counter=None, slots=1, backend=None):
+    """
+    Cada proceso se fija a su parte de los núcleos; el modelo se carga con el primer
+    archivo y el registro lo reutiliza para los siguientes
+    """
+    from backends import get_backend
+    from cpu_engine import next_worker_slot, pin_worker
+    if slot_counter is not None:
+        pin_worker(next_worker_slot(slot_counter), slots)
+    # Los otros motores no usan PyTorch y pueden estar instalados sin él
+    if get_backend(backend).name == 'whisper':
+        import torch
+        torch.set_num_threads(threads)
+
+def _process_one(video_path, model_size, generate_summary_flag, backend=None):
+    from transcriber import process_video
+    start = time.perf_counter()
+    result = process_video(video_path, generate_summary_flag=generate_summary_flag, model_size=model_size,
+                           backend=backend)
+    return {
+        'output_file': result['output_file'],
+        'cached': result.get('cached', False),
+        'elapsed': time.perf_counter() - start,
+    }
+
+def run_batch(pattern, jobs=2, model_size='base', generate_summary_flag=True, skip_existing=True,
+              report_path=None, backend=None):
+    """
+    Transcribe todos los videos de un directorio o patrón glob.
+    Se procesan primero los más largos para equilibrar la carga entre los procesos.
+    """
+    from transcriber import probe_duration
+
+    paths = find_inputs(pattern)
+    if not paths:
+        print(f"No se encontraron videos en {pattern}")
+        return None
+
+    files = []
+    skipped = []
+    for path in paths:
+        output = existing_output(path) if skip_existing else None
+        if output:
+            skipped.append({'file': path, 'output_file': output})
+            continue
+        files.append({'file': path, 'duration': probe_duration(path) or 0.0})
+
+    # Primero los más largos: evita que un archivo largo quede solo al final
+    files.sort(key=lambda f: f['duration'], reverse=True)
+    jobs = max(1, min(jobs, len(files) or 1))
+    threads = threads_per_job(jobs)
+    total_audio = sum(f['duration'] for f in files)
+    print(f"{len(files)} archivos por procesar ({total_audio / 3600:.2f} h de audio), "
+          f"{len(skipped)} omitidos, {jobs} procesos")
+
+    completed = []
+    failures = []
+    wall_start = time.perf_counter()
+    if files:
+        slot_counter = multiprocessing.Value('i', 0)
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(threads, slot_counter, jobs, backend)) as pool:
+            futures = {
+                pool.submit(_process_one, f['file'], model_size, generate_summary_flag, backend): f
+                for f in files
+            }
+            for future in as_completed(futures):
+                info = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failures.append({'file': info['file'], 'error': str(e)})
+                    print(f"✗ {info['file']}: {e}")
+                    continue
+                rtf = result['elapsed'] / info['duration'] if info['duration'] else None
+                completed.append(dict(info, **result, rtf=rtf))
+                print(f"✓ {info['file']} ({result['elapsed']:.1f}s" +
+                      (f", RTF {rtf:.2f})" if rtf is not None else ")"))
+    wall = time.perf_counter() - wall_start
+
+    processed_audio = sum(f['duration'] for f in completed)
+    report = {
+        'files': len(paths),
+        'processed': len(completed),
+        'skipped': skipped,
+        'failures': failures,
+        'audio_hours': round(processed_audio / 3600, 3),
+        'wall_hours': round(wall / 3600, 3),
+        'audio_hours_per_wall_hour': round(processed_audio / wall, 2) if wall else None,
+        'per_file': [
+            {
+                'file': f['file'],
+                'duration': round(f['duration'], 1),
+                'elapsed': round(f['elapsed'], 1),
+                'rtf': round(f['rtf'], 3) if f['rtf'] is not None else None,
+                'output_file': f['output_file'],
+                'cached': f['cached'],
+            }
+            for f in sorted(completed, key=lambda f: f['file'])
+        ],
+    }
+
+    print(f"\nResumen del lote: {len(completed)} procesados, {len(skipped)} omitidos, {len(failures)} fallidos")
+    if report['audio_hours_per_wall_hour'] is not None:
+        print(f"Rendimiento: {report['audio_hours_per_wall_hour']:.2f} horas de audio por hora de reloj")
+
+    report_path = report_path or os.path.join(
+        'outputs', f"batch_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Informe guardado en {report_path}")
+    return report
@@ -0,0 +1,423 @@
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from datetime import datetime
+import numpy as np
+from backends import BACKEND_CLASSES, TranscriptionBackend
+from ffmpeg_utils import get_ffmpeg_exe
+
+BASELINE_PATH = os.path.join('benchmarks', 'baseline.json')
+RESULTS_DIR = os.path.join('benchmarks', 'results')
+
+# Tamaños de entrada de cada tipo de fixture
+SIZES = ('small', 'medium', 'large')
+AUDIO_SECONDS = {'small': 10, 'medium': 60, 'large': 300}
+VIDEO_SPECS = {'small': (5, 320, 240), 'medium': (15, 640, 480), 'large': (30, 1280, 720)}
+IMAGE_SPECS = {'small': (640, 480), 'medium': (1920, 1080), 'large': (4000, 3000)}
+TEXT_WORDS = {'small': 500, 'medium': 5000, 'large': 50000}
+
+# Paquetes opcionales de cada etapa: sin ellos la etapa se omite en lugar de fallar
+STAGE_REQUIREMENTS = {
+    'extract_audio': ('moviepy',),
+    'compress_image': ('PIL',),
+    'convert_image_format': ('PIL',),
+}
+
+# Variación relativa a partir de la cual un resultado se considera regresión
+DEFAULT_THRESHOLD = 0.2
+
+SAMPLE_RATE = 16000
+SEED = 1234
+
+# Vocabulario para las transcripciones sintéticas: muletillas, repeticiones y nombres
+# propios en minúscula, como en una clase transcrita
+SUBJECTS = ['el profesor', 'la clase', 'el algoritmo', 'la red neuronal', 'el modelo', 'la base de datos',
+            'el servidor', 'la función', 'el compilador', 'la variable', 'el sistema', 'la memoria',
+            'el estudiante', 'el ejemplo', 'la consulta', 'el proyecto', 'la interfaz', 'el programa']
+VERBS = ['utiliza', 'procesa', 'explica', 'calcula', 'almacena', 'optimiza', 'describe', 'analiza',
+         'transforma', 'devuelve', 'compara', 'organiza', 'evalúa', 'genera', 'recorre', 'divide']
+OBJECTS = ['los datos de entrada', 'una lista ordenada', 'el resultado final', 'la complejidad del problema',
+           'los registros de la tabla', 'las peticiones del cliente', 'el árbol de decisión',
+           'los parámetros del modelo', 'la estructura del código', 'las pruebas unitarias',
+           'el rendimiento del sistema', 'los valores intermedios', 'la memoria disponible']
+TAILS = ['en python', 'con javascript', 'usando sql', 'en linux', 'con git', 'en la nube de google',
+         'con react y node', 'en windows', 'paso a paso', 'de forma eficiente', 'en tiempo real',
+         'para cada caso', 'sin errores', 'con html y css']
+FILLERS = ['eh', 'um', 'bueno', 'entonces', 'o sea', 'emm', 'vale']
+CONNECTORS = ['además', 'sin embargo', 'por ejemplo', 'es decir', 'por lo tanto', 'y y', 'pero pero']
+
+class StubBackend(TranscriptionBackend):
+    """
+    Motor falso para medir el pipeline sin pesos de Whisper: recorre el audio y
+    devuelve un segmento cada cinco segundos
+    """
+    name = 'benchmark-stub'
+    capabilities = {'word_timestamps': False, 'confidence': True, 'initial_prompt': True, 'gpu': False}
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def load(self, model_size, device, precision):
+        return object()
+
+    def _transcribe(self, model, audio, language, initial_prompt, word_timestamps, verbose):
+        duration = len(audio) / SAMPLE_RATE
+        segments = []
+        for i, start in enumerate(np.arange(0.0, duration, 5.0)):
+            window = audio[int(start * SAMPLE_RATE):int(min(duration, start + 5) * SAMPLE_RATE)]
+            energy = float(np.sqrt(np.mean(np.square(window)))) if len(window) else 0.0
+            segments.append({'start': float(start), 'end': float(min(duration, start + 5)),
+                             'text': f" segmento {i} con energía {energy:.3f}", 'avg_logprob': -0.3,
+                             'no_speech_prob': 0.05, 'compression_ratio': 1.3, 'words': []})
+        return segments
+
+def missing_requirements(stage):
+    """
+    Paquetes opcionales que necesita la etapa y no están instalados
+    """
+    return [name for name in STAGE_REQUIREMENTS.get(stage, ()) if importlib.util.find_spec(name) is None]
+
+def whisper_weights_available(model_size='tiny'):
+    """
+    Indica si Whisper está instalado y los pesos del modelo ya están descargados
+    """
+    if not BACKEND_CLASSES['whisper'].is_available():
+        return False
+    cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'whisper')
+    return os.path.exists(os.path.join(cache_dir, f"{model_size}.pt"))
+
+# --- Fixtures sintéticos deterministas ---
+
+def make_audio(path, seconds, sample_rate=SAMPLE_RATE, seed=SEED):
+    """
+    WAV mono con tonos que cambian cada segundo, ruido y silencios (como una voz con pausas)
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    frequencies = rng.uniform(120, 400, size=int(seconds) + 1)
+    signal = 0.3 * np.sin(2 * np.pi * frequencies[t.astype(int)] * t)
+    signal *= (np.sin(2 * np.pi * 0.25 * t) > -0.6)
+    signal += 0.02 * rng.standard_normal(len(t))
+    pcm = (np.clip(signal, -1, 1) * 32767).astype(np.int16)
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
+    return path
+
+def make_video(path, seconds, width, height):
+    """
+    Video de prueba de FFmpeg (testsrc) con un tono de audio
+    """
+    cmd = [get_ffmpeg_exe(), '-nostdin', '-v', 'error', '-y',
+           '-f', 'lavfi', '-i', f"testsrc=size={width}x{height}:rate=25:duration={seconds}",
+           '-f', 'lavfi', '-i', f"sine=frequency=440:sample_rate=44100:duration={seconds}",
+           '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-shortest', path]
+    subprocess.run(cmd, check=True, capture_output=True)
+    return path
+
+def make_image(path, width, height, seed=SEED):
+    """
+    Imagen con degradados y ruido (comprime como una foto, no como un color plano)
+    """
+    from PIL import Image
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    pixels = np.stack([np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width)),
+                       (x + y) / 2], axis=-1)
+    pixels = np.clip(pixels + rng.normal(0, 12, pixels.shape), 0, 255).astype(np.uint8)
+    Image.fromarray(pixels, 'RGB').save(path, quality=92)
+    return path
+
+def make_transcript(words, seed=SEED):
+    """
+    Transcripción sintética en español de aproximadamente words palabras
+    """
+    rng = random.Random(seed)
+    parts = []
+    count = 0
+    while count < words:
+        sentence = []
+        if rng.random() < 0.3:
+            sentence.append(rng.choice(FILLERS))
+        if rng.random() < 0.25:
+            sentence.append(rng.choice(CONNECTORS))
+        sentence += [rng.choice(SUBJECTS), rng.choice(VERBS), rng.choice(OBJECTS)]
+        if rng.random() < 0.6:
+            sentence.append(rng.choice(TAILS))
+        text = ' '.join(sentence)
+        count += len(text.split())
+        # Las transcripciones no siempre tienen puntuación: a veces solo un espacio doble
+        parts.append(text + (rng.choice(['.', '.', '.', '  ', ','])))
+    return ' '.join(parts)
+
+def build_fixtures(directory, sizes):
+    """
+    Genera (o reutiliza) los fixtures de cada tamaño en directory
+    """
+    os.makedirs(directory, exist_ok=True)
+    fixtures = {}
+    for size in sizes:
+        audio = os.path.join(directory, f"audio_{size}.wav")
+        video = os.path.join(directory, f"video_{size}.mp4")
+        image = os.path.join(directory, f"image_{size}.jpg")
+        text = os.path.join(directory, f"text_{size}.txt")
+        if not os.path.exists(audio):
+            make_audio(audio, AUDIO_SECONDS[size])
+        if not os.path.exists(video):
+            make_video(video, *VIDEO_SPECS[size])
+        if not os.path.exists(image) and importlib.util.find_spec('PIL') is not None:
+            make_image(image, *IMAGE_SPECS[size])
+        if not os.path.exists(text):
+            with open(text, 'w', encoding='utf-8') as f:
+                f.write(make_transcript(TEXT_WORDS[size]))
+        fixtures[size] = {'audio': audio, 'video': video, 'image': image, 'text': text}
+    return fixtures
+
+# --- Medición ---
+
+def measure(func, repeat):
+    """
+    Ejecuta func repeat veces (silenciando su salida) y devuelve los tiempos en segundos
+    """
+    times = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    return times
+
+def _check(result):
+    if isinstance(result, dict) and not result.get('success', True):
+        raise RuntimeError(result.get('error'))
+    return result
+
+def stage_functions(fixtures, work_dir, model_size):
+    """
+    Devuelve {etapa: (tamaño -> (descripción, función))} con todas las etapas del pipeline
+    """
+    from humanizer import clear_cache as clear_humanizer_cache, humanize_text, improve_readability
+    from media_compressor import compress_image, convert_image_format, compress_video, convert_video_format
+    from analysis import cache as analysis_cache
+    from summarizer import summarize_text, extract_keywords
+    from transcriber import extract_audio, extract_audio_pcm, iter_segments
+
+    texts = {}
+    pcm = {}
+
+    def text(size):
+        if size not in texts:
+            with open(fixtures[size]['text'], encoding='utf-8') as f:
+                texts[size] = f.read()
+        return texts[size]
+
+    def audio(size):
+        if size not in pcm:
+            with contextlib.redirect_stdout(io.StringIO()):
+                pcm[size] = extract_audio_pcm(fixtures[size]['audio'])
+        return pcm[size]
+
+    def out(name):
+        return os.path.join(work_dir, name)
+
+    def uncached(func):
+        # Cada repetición mide el análisis completo y no un acierto de las cachés en memoria
+        def run():
+            analysis_cache.clear()
+            clear_humanizer_cache()
+            return func()
+        return run
+
+    backend = 'whisper' if whisper_weights_available(model_size) else StubBackend.name
+
+    return backend, {
+        'extract_audio': lambda size: (
+            f"{VIDEO_SPECS[size][0]}s video",
+            lambda: extract_audio(fixtures[size]['video'], out(f"audio_{size}.mp3"))),
+        'extract_audio_pcm': lambda size: (
+            f"{VIDEO_SPECS[size][0]}s video",
+            lambda: extract_audio_pcm(fixtures[size]['video'])),
+        'transcribe': lambda size: (
+            f"{AUDIO_SECONDS[size]}s audio ({backend})",
+            lambda: list(iter_segments(audio(size), model_size, backend=backend))),
+        'summarize_text': lambda size: (
+            f"{TEXT_WORDS[size]} palabras",
+            uncached(lambda: summarize_text(text(size), percentage=30))),
+        'summarize_textrank': lambda size: (
+            f"{TEXT_WORDS[size]} palabras",
+            uncached(lambda: summarize_text(text(size), percentage=30, method='textrank'))),
+        'extract_keywords': lambda size: (
+            f"{TEXT_WORDS[size]} palabras",
+            uncached(lambda: extract_keywords(text(size)))),
+        'humanize_text': lambda size: (
+            f"{TEXT_WORDS[size]} palabras",
+            uncached(lambda: humanize_text(text(size)))),
+        'improve_readability': lambda size: (
+            f"{TEXT_WORDS[size]} palabras",
+            uncached(lambda: improve_readability(text(size)))),
+        'compress_image': lambda size: (
+            "{}x{}".format(*IMAGE_SPECS[size]),
+            lambda: _check(compress_image(fixtures[size]['image'], out(f"compressed_{size}.jpg")))),
+        'convert_image_format': lambda size: (
+            "{}x{}".format(*IMAGE_SPECS[size]),
+            lambda: _check(convert_image_format(fixtures[size]['image'], out(f"converted_{size}.webp")))),
+        'compress_video': lambda size: (
+            "{}s {}x{}".format(*VIDEO_SPECS[size]),
+            lambda: _check(compress_video(fixtures[size]['video'], out(f"compressed_{size}.mp4"), quality='low'))),
+        'convert_video_format': lambda size: (
+            "{}s {}x{}".format(*VIDEO_SPECS[size]),
+            lambda: _check(convert_video_format(fixtures[size]['video'], out(f"converted_{size}.webm"),
+                                                target_format='webm'))),
+    }
+
+def run_benchmarks(sizes=SIZES, stages=None, repeat=3, model_size='tiny', fixtures_dir=None):
+    """
+    Ejecuta todas las etapas con cada tamaño de entrada y devuelve el informe
+    """
+    BACKEND_CLASSES.setdefault(StubBackend.name, StubBackend)
+    work_dir = tempfile.mkdtemp(prefix='benchmark_')
+    fixtures_dir = fixtures_dir or os.path.join(work_dir, 'fixtures')
+    try:
+        start = time.perf_counter()
+        fixtures = build_fixtures(fixtures_dir, sizes)
+        print(f"Fixtures listos en {time.perf_counter() - start:.1f}s ({fixtures_dir})")
+
+        backend, functions = stage_functions(fixtures, work_dir, model_size)
+        results = {}
+        for stage, factory in functions.items():
+            if stages and stage not in stages:
+                continue
+            missing = missing_requirements(stage)
+            for size in sizes:
+                description, func = factory(size)
+                key = f"{stage}/{size}"
+                if missing:
+                    reason = f"falta {', '.join(missing)}"
+                    results[key] = {'stage': stage, 'size': size, 'input': description, 'skipped': reason}
+                    print(f"  {key:<34} omitida ({reason})")
+                    continue
+                try:
+                    times = measure(func, repeat)
+                except Exception as e:
+                    results[key] = {'stage': stage, 'size': size, 'input': description, 'error': str(e)}
+                    print(f"  {key:<34} error: {e}")
+                    continue
+                entry = {
+                    'stage': stage,
+                    'size': size,
+                    'input': description,
+                    'median_s': round(statistics.median(times), 5),
+                    'min_s': round(min(times), 5),
+                    'runs': len(times),
+                }
+                if stage == 'transcribe':
+                    entry['rtf'] = round(entry['median_s'] / AUDIO_SECONDS[size], 5)
+                    entry['stub'] = backend != 'whisper'
+                results[key] = entry
+                print(f"  {key:<34}{entry['median_s'] * 1000:>11.1f} ms  ({description})")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment_info(),
+        'repeat': repeat,
+        'model': model_size,
+        'transcription_backend': backend,
+        'results': results,
+    }
+
+def environment_info():
+    info = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+    try:
+        info['commit'] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                        text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return info
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compara la mediana de cada etapa con la línea base. Devuelve la lista de diferencias
+    con 'regression' / 'improvement' cuando la variación supera threshold
+    """
+    rows = []
+    for key, entry in report['results'].items():
+        previous = baseline.get('results', {}).get(key)
+        if 'median_s' not in entry or not previous or 'median_s' not in previous or not previous['median_s']:
+            continue
+        change = entry['median_s'] / previous['median_s'] - 1
+        status = 'regression' if change > threshold else 'improvement' if change < -threshold else 'ok'
+        rows.append({'key': key, 'baseline_s': previous['median_s'], 'current_s': entry['median_s'],
+                     'change': round(change, 4), 'status': status})
+    return rows
+
+def print_comparison(rows, threshold):
+    print(f"\nComparación con la línea base (umbral {threshold * 100:.0f}%):")
+    for row in rows:
+        mark = {'regression': '✗', 'improvement': '✓', 'ok': ' '}[row['status']]
+        print(f"{mark} {row['key']:<34}{row['baseline_s'] * 1000:>10.1f} ms → {row['current_s'] * 1000:>10.1f} ms"
+              f"  ({row['change'] * 100:+.1f}%)")
+    regressions = sum(1 for row in rows if row['status'] == 'regression')
+    print(f"{regressions} regresiones, {sum(1 for row in rows if row['status'] == 'improvement')} mejoras")
+    return regressions
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark offline de todas las etapas del pipeline")
+    parser.add_argument('--sizes', default=','.join(SIZES), help="tamaños de entrada (small,medium,large)")
+    parser.add_argument('--stages', help="etapas a medir separadas por comas (por defecto todas)")
+    parser.add_argument('--repeat', type=int, default=3, help="repeticiones por medida (se usa la mediana)")
+    parser.add_argument('--model', default='tiny', help="modelo Whisper si sus pesos están descargados")
+    parser.add_argument('--fixtures', help="directorio donde generar y reutilizar los fixtures")
+    parser.add_argument('--output', help="archivo JSON de resultados (por defecto benchmarks/results/)")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="línea base con la que comparar")
+    parser.add_argument('--save-baseline', action='store_true', help="guarda estos resultados como línea base")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="variación relativa que se considera regresión (0.2 = 20%%)")
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help="termina con código 1 si alguna etapa empeora más que el umbral")
+    args = parser.parse_args()
+
+    sizes = [s.strip() for s in args.sizes.split(',') if s.strip() in SIZES]
+    stages = [s.strip() for s in args.stages.split(',')] if args.stages else None
+    report = run_benchmarks(sizes, stages, repeat=args.repeat, model_size=args.model, fixtures_dir=args.fixtures)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados guardados en {output}")
+
+    regressions = 0
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        shutil.copyfile(output, args.baseline)
+        print(f"Línea base actualizada: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = print_comparison(compare(report, baseline, args.threshold), args.threshold)
+    else:
+        print(f"No hay línea base en {args.baseline} (créala con --save-baseline)")
+    sys.exit(1 if args.fail_on_regression and regressions else 0)
@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: solo se coordinan los hilos del propio proceso
+    fcntl = None
+
+CHECKPOINT_DIR = os.path.join('outputs', '.checkpoints')
+
+# Checkpoints abiertos por este proceso (los de otros procesos se detectan con flock)
+_active = set()
+_active_lock = threading.Lock()
+
+# Campos del segmento que se guardan en el checkpoint
+SEGMENT_FIELDS = ('start', 'end', 'text', 'avg_logprob', 'no_speech_prob', 'compression_ratio')
+
+class Checkpoint:
+    """
+    Checkpoint de transcripción a nivel de segmento: cada segmento terminado se añade
+    como una línea JSON, de modo que si el proceso se interrumpe se puede reanudar
+    desde el último segmento completado.
+    La clave es el contenido, así que dos trabajos sobre el mismo archivo comparten
+    checkpoint: solo el que consigue acquire() lo lee y escribe; el otro transcribe sin él.
+    """
+
+    def __init__(self, key, checkpoint_dir=CHECKPOINT_DIR):
+        self.key = key
+        self.path = os.path.join(checkpoint_dir, f"{key}.jsonl")
+        self.owned = False
+        self._file = None
+
+    def acquire(self):
+        """
+        Reserva el checkpoint para este trabajo hasta close() o remove().
+        Devuelve False si otro trabajo (de este u otro proceso) lo está usando.
+        """
+        with _active_lock:
+            if self.path in _active:
+                return False
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # 'a' no trunca: lo que hay se lee con load() y se reescribe con open()
+            handle = open(self.path, 'a', encoding='utf-8')
+            if fcntl is not None:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    handle.close()
+                    return False
+            _active.add(self.path)
+        self._file = handle
+        self.owned = True
+        return True
+
+    def load(self):
+        """
+        Devuelve los segmentos ya completados (lista vacía si no hay checkpoint o es de
+        otro trabajo)
+        """
+        segments = []
+        if not self.owned:
+            return segments
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        segments.append(json.loads(line))
+                    except ValueError:
+                        # Última línea a medio escribir cuando se cortó el proceso
+                        break
+        except OSError:
+            pass
+        return segments
+
+    def resume_offset(self, segments):
+        """
+        Segundo desde el que continuar a partir de los segmentos completados
+        """
+        return segments[-1]['end'] if segments else 0.0
+
+    def open(self, segments):
+        """
+        Prepara el checkpoint para añadir segmentos, reescribiéndolo solo con los válidos
+        """
+        if not self.owned:
+            return
+        # Se trunca sobre el mismo descriptor para no soltar el bloqueo
+        self._file.seek(0)
+        self._file.truncate()
+        for seg in segments:
+            self._write(seg)
+        self._file.flush()
+
+    def append(self, segment):
+        if not self.owned:
+            return
+        self._write(segment)
+        self._file.flush()
+
+    def _write(self, segment):
+        record = {field: segment.get(field) for field in SEGMENT_FIELDS}
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def close(self):
+        """
+        Cierra el checkpoint y lo libera; se conserva para reanudar
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.owned:
+            with _active_lock:
+                _active.discard(self.path)
+            self.owned = False
+
+    def remove(self):
+        """
+        Elimina el checkpoint una vez escrita la transcripción final (solo si es de este trabajo)
+        """
+        owned = self.owned
+        if owned and fcntl is not None and os.path.exists(self.path):
+            # Se borra antes de soltar el bloqueo para que nadie reanude desde él
+            os.remove(self.path)
+        self.close()
+        if owned and fcntl is None and os.path.exists(self.path):
+            # Windows no permite borrar un archivo abierto
+            os.remove(self.path)
+
+def remove_orphaned(prefix, checkpoint_dir=CHECKPOINT_DIR):
+    """
+    Borra los checkpoints cuyo nombre empieza por prefix y que no está usando ningún
+    trabajo. Los de transcripción en tubería (stream_*) no se pueden reanudar, así que
+    los que quedan tras una caída del proceso solo ocupan disco. Devuelve cuántos borró.
+    """
+    if not os.path.isdir(checkpoint_dir):
+        return 0
+    removed = 0
+    for name in os.listdir(checkpoint_dir):
+        if not (name.startswith(prefix) and name.endswith('.jsonl')):
+            continue
+        checkpoint = Checkpoint(name[:-len('.jsonl')], checkpoint_dir)
+        try:
+            if checkpoint.acquire():
+                checkpoint.remove()
+                removed += 1
+        except OSError:
+            checkpoint.close()
+    return removed
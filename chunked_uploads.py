@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from transcription_cache import HASH_CHUNK_SIZE, write_upload_hash
+
+PARTIAL_DIR = os.path.join('uploads', '.partial')
+
+# Tamaño máximo de cada fragmento (el límite de MAX_CONTENT_LENGTH no se aplica a los fragmentos)
+CHUNK_MAX_MB = int(os.environ.get('UPLOAD_CHUNK_MAX_MB', 64))
+# Tamaño máximo del archivo completo (0 = sin límite)
+UPLOAD_MAX_MB = int(os.environ.get('UPLOAD_MAX_MB', 20480))
+# Las subidas sin actividad durante este tiempo se eliminan
+PARTIAL_TTL_HOURS = float(os.environ.get('UPLOAD_PARTIAL_TTL_HOURS', 24))
+
+class UploadError(Exception):
+    """
+    Error del protocolo de subida; status es el código HTTP a devolver
+    """
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+class ChunkedUpload:
+    """
+    Subida por fragmentos en curso. Los bytes se escriben directamente en el archivo
+    parcial y el SHA-256 se actualiza con cada fragmento.
+    """
+
+    def __init__(self, upload_id, filename, size=None, created_at=None, process=None, partial_dir=PARTIAL_DIR):
+        self.id = upload_id
+        self.filename = filename
+        self.size = size
+        self.created_at = created_at or time.time()
+        # Opciones de /process si hay que transcribir la subida en cuanto se pueda
+        self.process = process
+        # Tubería que recibe cada bloque según llega (streaming_pipeline.UploadPipeline)
+        self.pipeline = None
+        self.pipeline_decided = False
+        self.job_id = None
+        self.data_path = os.path.join(partial_dir, f"{upload_id}.part")
+        self.meta_path = os.path.join(partial_dir, f"{upload_id}.json")
+        self.lock = threading.Lock()
+        self._digest = None
+        self._hashed = 0
+
+    @property
+    def offset(self):
+        try:
+            return os.path.getsize(self.data_path)
+        except OSError:
+            return 0
+
+    def digest(self):
+        """
+        Hash de los bytes recibidos hasta ahora. Si el servidor se reinició (o falló una
+        escritura) se recalcula una vez leyendo el archivo parcial.
+        """
+        offset = self.offset
+        if self._digest is None or self._hashed != offset:
+            self._digest = hashlib.sha256()
+            with open(self.data_path, 'rb') as f:
+                for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                    self._digest.update(block)
+            self._hashed = offset
+        return self._digest
+
+    def to_dict(self):
+        data = {
+            'upload_id': self.id,
+            'filename': self.filename,
+            'size': self.size,
+            'offset': self.offset,
+            'created_at': self.created_at,
+        }
+        if self.job_id:
+            data['job_id'] = self.job_id
+            data['pipelined'] = self.pipeline is not None
+        return data
+
+class ChunkedUploadManager:
+    """
+    Protocolo de subida reanudable: iniciar, añadir fragmentos en un offset y finalizar.
+    El estado vive en disco (uploads/.partial), así que una subida sobrevive a un corte
+    de conexión o a un reinicio del servidor.
+    """
+
+    def __init__(self, upload_dir='uploads', partial_dir=PARTIAL_DIR, max_bytes=UPLOAD_MAX_MB * 1024 * 1024,
+                 ttl_seconds=PARTIAL_TTL_HOURS * 3600):
+        self.upload_dir = upload_dir
+        self.partial_dir = partial_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def create(self, filename, size=None, process=None):
+        if size is not None and size < 0:
+            raise UploadError('Invalid size')
+        if size is not None and self.max_bytes and size > self.max_bytes:
+            raise UploadError('File too large', status=413)
+        self.cleanup()
+        os.makedirs(self.partial_dir, exist_ok=True)
+        upload = ChunkedUpload(uuid.uuid4().hex, filename, size, process=process, partial_dir=self.partial_dir)
+        open(upload.data_path, 'wb').close()
+        with open(upload.meta_path, 'w', encoding='utf-8') as f:
+            json.dump({'filename': filename, 'size': size, 'created_at': upload.created_at, 'process': process}, f)
+        upload._digest = hashlib.sha256()
+        with self._lock:
+            self._uploads[upload.id] = upload
+        return upload
+
+    def get(self, upload_id):
+        """
+        Subida en curso, o None. Tras un reinicio se recupera de los metadatos en disco.
+        """
+        if not upload_id or not upload_id.isalnum():
+            return None
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+            if upload is not None:
+                return upload
+            meta_path = os.path.join(self.partial_dir, f"{upload_id}.json")
+            try:
+                with open(meta_path, encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                return None
+            upload = ChunkedUpload(upload_id, meta['filename'], meta.get('size'), meta.get('created_at'),
+                                   meta.get('process'), partial_dir=self.partial_dir)
+            if not os.path.exists(upload.data_path):
+                return None
+            self._uploads[upload_id] = upload
+            return upload
+
+    def append(self, upload, offset, stream, length=None, on_written=None):
+        """
+        Escribe el fragmento leído de stream en la posición offset, que debe coincidir con
+        lo recibido hasta ahora. Si la conexión se corta a mitad se conservan los bytes
+        que llegaron y el cliente puede continuar desde el nuevo offset.
+        Cada bloque escrito se pasa también a la tubería de la subida, si la tiene.
+        on_written: función opcional llamada con (upload, offset) al terminar, aún con el bloqueo
+        """
+        if not upload.lock.acquire(blocking=False):
+            raise UploadError('Another chunk is being written', status=409, offset=upload.offset)
+        try:
+            current = upload.offset
+            if offset != current:
+                raise UploadError('Offset mismatch', status=409, offset=current)
+            limit = upload.size if upload.size is not None else self.max_bytes
+            if limit and length is not None and current + length > limit:
+                raise UploadError('Chunk exceeds declared size', status=413, offset=current)
+            digest = upload.digest()
+            written = current
+            with open(upload.data_path, 'ab') as f:
+                try:
+                    for block in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+                        if limit and written + len(block) > limit:
+                            raise UploadError('Chunk exceeds declared size', status=413)
+                        f.write(block)
+                        digest.update(block)
+                        written += len(block)
+                        if upload.pipeline is not None:
+                            upload.pipeline.feed(block)
+                finally:
+                    f.flush()
+                    upload._hashed = written
+            if on_written is not None:
+                on_written(upload, written)
+            return written
+        except UploadError as e:
+            if e.offset is None:
+                e.offset = upload.offset
+            raise
+        finally:
+            upload.lock.release()
+
+    def finalize(self, upload, expected_hash=None):
+        """
+        Comprueba tamaño y hash, mueve el archivo a su destino y guarda el hash junto a él
+        (el mismo .sha256 que /upload). Devuelve (ruta, hash).
+        """
+        with upload.lock:
+            offset = upload.offset
+            if upload.size is not None and offset != upload.size:
+                raise UploadError('Upload incomplete', status=409, offset=offset)
+            content_hash = upload.digest().hexdigest()
+            if expected_hash and expected_hash.lower() != content_hash:
+                raise UploadError('Content hash mismatch', status=422, offset=offset)
+            dest_path = os.path.join(self.upload_dir, upload.filename)
+            os.replace(upload.data_path, dest_path)
+            write_upload_hash(dest_path, content_hash)
+            if upload.pipeline is not None:
+                upload.pipeline.finish(dest_path, content_hash)
+            self._forget(upload)
+        return dest_path, content_hash
+
+    def abort(self, upload):
+        with upload.lock:
+            if upload.pipeline is not None:
+                upload.pipeline.abort()
+            if os.path.exists(upload.data_path):
+                os.remove(upload.data_path)
+            self._forget(upload)
+
+    def _forget(self, upload):
+        if os.path.exists(upload.meta_path):
+            os.remove(upload.meta_path)
+        with self._lock:
+            self._uploads.pop(upload.id, None)
+        _abort_pipeline(upload)
+
+    def cleanup(self):
+        """
+        Elimina las subidas parciales sin actividad desde hace más de ttl_seconds
+        """
+        if not os.path.exists(self.partial_dir):
+            return 0
+        limit = time.time() - self.ttl_seconds
+        removed = 0
+        for name in os.listdir(self.partial_dir):
+            if not name.endswith('.json'):
+                continue
+            paths = [os.path.join(self.partial_dir, name[:-len('.json')] + ext) for ext in ('.json', '.part')]
+            # La última actividad es la última escritura de un fragmento
+            mtimes = [os.path.getmtime(path) for path in paths if os.path.exists(path)]
+            if mtimes and max(mtimes) < limit:
+                for path in paths:
+                    if os.path.exists(path):
+                        os.remove(path)
+                removed += 1
+        with self._lock:
+            stale = [self._uploads.pop(i) for i in [i for i, u in self._uploads.items()
+                                                     if not os.path.exists(u.meta_path)]]
+        # Sin esto el trabajo en tubería y su FFmpeg esperarían para siempre los bytes que faltan
+        for upload in stale:
+            _abort_pipeline(upload)
+        return removed
+
+def _abort_pipeline(upload):
+    """
+    Cancela la tubería de una subida que no llegó a finalizarse
+    """
+    if upload.pipeline is not None and not upload.pipeline.completed:
+        upload.pipeline.abort()
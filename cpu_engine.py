@@ -0,0 +1,252 @@
+import math
+import os
+import re
+import threading
+import time
+
+# Precisión del modelo en CPU: 'fp32' (PyTorch estándar) o 'int8' (cuantización dinámica)
+CPU_PRECISION = os.environ.get('WHISPER_CPU_PRECISION', 'fp32')
+
+# Hilos de PyTorch; 0 = calcular a partir de los núcleos disponibles
+INTRA_OP_THREADS = int(os.environ.get('TORCH_INTRA_THREADS', 0))
+INTER_OP_THREADS = int(os.environ.get('TORCH_INTER_THREADS', 1))
+
+def _cgroup_cpu_limit():
+    """
+    Límite de CPU impuesto por cgroups (contenedores), o None si no hay
+    """
+    # cgroup v2
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        if quota != 'max':
+            return max(1, math.ceil(int(quota) / int(period)))
+        return None
+    except (OSError, ValueError):
+        pass
+    # cgroup v1
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return max(1, math.ceil(quota / period))
+    except (OSError, ValueError):
+        pass
+    return None
+
+def allowed_cpus():
+    """
+    CPUs en las que puede ejecutarse el proceso (afinidad actual)
+    """
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+def available_cpus():
+    """
+    Núcleos realmente disponibles: afinidad del proceso limitada por la cuota de cgroups
+    """
+    count = len(allowed_cpus())
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        count = min(count, limit)
+    return max(1, count)
+
+def threads_per_job(concurrent_jobs=1):
+    """
+    Hilos intra-op para cada trabajo de forma que los trabajos simultáneos no
+    se repartan más hilos que núcleos disponibles
+    """
+    if INTRA_OP_THREADS:
+        return INTRA_OP_THREADS
+    return max(1, available_cpus() // max(1, concurrent_jobs))
+
+def configure_threads(concurrent_jobs=1):
+    """
+    Ajusta los hilos de PyTorch del proceso según los núcleos y los trabajos simultáneos
+    """
+    import torch
+    intra = threads_per_job(concurrent_jobs)
+    torch.set_num_threads(intra)
+    try:
+        # Solo se puede fijar una vez y antes de que PyTorch arranque su pool inter-op
+        torch.set_num_interop_threads(INTER_OP_THREADS)
+    except RuntimeError:
+        pass
+    print(f"PyTorch en CPU: {intra} hilos intra-op, {torch.get_num_interop_threads()} inter-op "
+          f"({available_cpus()} núcleos disponibles, {concurrent_jobs} trabajos)")
+    return intra
+
+# Configuración de hilos pendiente de aplicar (se aplica al cargar el primer modelo
+# para no importar PyTorch al arrancar el servidor)
+_planned_jobs = None
+_plan_lock = threading.Lock()
+
+def plan_threads(concurrent_jobs):
+    """
+    Registra cuántos trabajos simultáneos habrá; los hilos se ajustan con apply_planned_threads
+    """
+    global _planned_jobs
+    _planned_jobs = concurrent_jobs
+
+def apply_planned_threads():
+    """
+    Aplica (una sola vez) la configuración registrada con plan_threads
+    """
+    global _planned_jobs
+    with _plan_lock:
+        if _planned_jobs is None:
+            return
+        jobs, _planned_jobs = _planned_jobs, None
+        configure_threads(jobs)
+
+def pin_worker(slot, slots):
+    """
+    Fija el proceso actual a un subconjunto disjunto de CPUs (slot de slots) para que
+    los procesos trabajadores no compitan por los mismos núcleos. Solo en Linux.
+    """
+    cpus = allowed_cpus()[:available_cpus()]
+    if not hasattr(os, 'sched_setaffinity') or slots <= 1 or len(cpus) < slots:
+        return None
+    per_slot = len(cpus) // slots
+    selected = cpus[(slot % slots) * per_slot:(slot % slots + 1) * per_slot]
+    os.sched_setaffinity(0, selected)
+    return selected
+
+def next_worker_slot(counter):
+    """
+    Reserva el siguiente slot de un contador compartido (multiprocessing.Value)
+    """
+    with counter.get_lock():
+        slot = counter.value
+        counter.value += 1
+    return slot
+
+def default_precision(device):
+    return CPU_PRECISION if device == 'cpu' else 'fp32'
+
+def _plain_linears(module):
+    """
+    Sustituye las subclases de nn.Linear (Whisper usa su propia Linear) por nn.Linear con
+    los mismos pesos: quantize_dynamic solo acepta el tipo exacto
+    """
+    import torch
+    for name, child in module.named_children():
+        if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+            plain = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None,
+                                    device='meta')
+            plain.weight = child.weight
+            plain.bias = child.bias
+            setattr(module, name, plain)
+        else:
+            _plain_linears(child)
+    return module
+
+def quantize_model(model):
+    """
+    Cuantiza a int8 (dinámicamente) las capas lineales del modelo para inferencia en CPU
+    """
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+
+    # El modelo recién cargado no se usa en fp32: se convierte sin copiarlo
+    model = _plain_linears(model.cpu().float())
+    return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+def check_quantization(model_size='tiny'):
+    """
+    Carga el modelo, lo cuantiza a int8 y comprueba que todas las capas lineales se han
+    convertido. Devuelve el número de capas cuantizadas.
+    """
+    import torch
+    from torch.ao.nn.quantized import dynamic as nnqd
+    from model_registry import load_whisper_model
+
+    model = load_whisper_model(model_size, 'cpu', 'int8')
+    quantized = sum(isinstance(m, nnqd.Linear) for m in model.modules())
+    remaining = [name for name, m in model.named_modules() if isinstance(m, torch.nn.Linear)]
+    if remaining or not quantized:
+        raise RuntimeError(f"Cuantización incompleta: {quantized} capas int8, sin convertir: {remaining[:5]}")
+    print(f"Modelo {model_size} cuantizado: {quantized} capas lineales en int8")
+    return quantized
+
+def word_error_rate(reference, hypothesis):
+    """
+    Tasa de error por palabra (distancia de edición entre palabras / palabras de referencia)
+    """
+    ref = re.findall(r'\w+', reference.lower())
+    hyp = re.findall(r'\w+', hypothesis.lower())
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h))
+        previous = current
+    return previous[-1] / len(ref)
+
+def compare_engines(audio_path, model_size='base', sample_seconds=60, reference=None, concurrent_jobs=1):
+    """
+    Compara velocidad y precisión del modelo fp32 frente al int8 sobre la misma muestra
+    (los primeros sample_seconds del audio). Sin transcripción de referencia, el WER del
+    modo int8 se mide contra la salida fp32.
+    """
+    import whisper
+    from model_registry import load_whisper_model
+
+    configure_threads(concurrent_jobs)
+    audio = whisper.load_audio(audio_path)[:int(sample_seconds * whisper.audio.SAMPLE_RATE)]
+    duration = len(audio) / whisper.audio.SAMPLE_RATE
+
+    results = {}
+    for precision in ('fp32', 'int8'):
+        model = load_whisper_model(model_size, 'cpu', precision)
+        # Calentamiento corto para no medir la primera asignación de memoria
+        model.transcribe(audio[:whisper.audio.SAMPLE_RATE * 5], language='es', fp16=False, verbose=None)
+        start = time.perf_counter()
+        text = model.transcribe(audio, language='es', fp16=False, verbose=None)['text']
+        elapsed = time.perf_counter() - start
+        results[precision] = {'text': text, 'seconds': round(elapsed, 2), 'rtf': round(elapsed / duration, 3)}
+        del model
+
+    baseline = reference if reference is not None else results['fp32']['text']
+    for precision, result in results.items():
+        result['wer'] = round(word_error_rate(baseline, result['text']), 4)
+    speedup = results['fp32']['seconds'] / results['int8']['seconds'] if results['int8']['seconds'] else None
+
+    print(f"Muestra: {duration:.0f}s de audio, modelo {model_size}")
+    for precision, result in results.items():
+        print(f"  {precision}: {result['seconds']:.2f}s (RTF {result['rtf']:.3f}), WER {result['wer'] * 100:.1f}%")
+    if speedup:
+        print(f"  Aceleración int8: x{speedup:.2f}")
+    return {'sample_seconds': round(duration, 1), 'model': model_size, 'speedup': speedup,
+            'reference': 'manual' if reference is not None else 'fp32', 'results': results}
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compara el modelo fp32 con el cuantizado int8 en CPU")
+    parser.add_argument('audio', nargs='?', help="archivo de audio o video de muestra")
+    parser.add_argument('--model', default='base', help="tamaño del modelo Whisper")
+    parser.add_argument('--seconds', type=float, default=60, help="duración de la muestra en segundos")
+    parser.add_argument('--reference', help="archivo de texto con la transcripción correcta de la muestra")
+    parser.add_argument('--check', action='store_true',
+                        help="carga y cuantiza el modelo y comprueba sus capas (sin audio no compara)")
+    args = parser.parse_args()
+
+    if args.check:
+        check_quantization(args.model)
+        if not args.audio:
+            raise SystemExit(0)
+    if not args.audio:
+        parser.error("falta el archivo de audio")
+
+    reference = None
+    if args.reference:
+        with open(args.reference, encoding='utf-8') as f:
+            reference = f.read()
+    compare_engines(args.audio, model_size=args.model, sample_seconds=args.seconds, reference=reference)
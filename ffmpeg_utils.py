@@ -0,0 +1,63 @@
+import os
+import shutil
+import subprocess
+import time
+from functools import lru_cache
+from metrics import FFMPEG_FAILURES, FFMPEG_SECONDS
+
+@lru_cache(maxsize=None)
+def get_ffmpeg_exe():
+    """
+    Ruta del ejecutable de FFmpeg, resuelta una sola vez por proceso:
+    FFMPEG_BINARY, el binario incluido en imageio-ffmpeg o el del PATH
+    """
+    configured = os.environ.get('FFMPEG_BINARY')
+    if configured:
+        return configured
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except (ImportError, RuntimeError):
+        return shutil.which('ffmpeg') or 'ffmpeg'
+
+@lru_cache(maxsize=None)
+def get_ffprobe_exe():
+    """
+    Ruta de ffprobe (imageio-ffmpeg no lo incluye; se busca junto a FFmpeg y en el PATH).
+    None si no está instalado.
+    """
+    configured = os.environ.get('FFPROBE_BINARY')
+    if configured:
+        return configured
+    sibling = os.path.join(os.path.dirname(get_ffmpeg_exe()), 'ffprobe' + ('.exe' if os.name == 'nt' else ''))
+    if os.path.isfile(sibling):
+        return sibling
+    return shutil.which('ffprobe')
+
+@lru_cache(maxsize=None)
+def ensure_ffmpeg_on_path():
+    """
+    Añade el directorio de FFmpeg al PATH para las librerías que lo invocan por nombre
+    (Whisper al leer un archivo de audio). Solo se hace la primera vez.
+    """
+    directory = os.path.dirname(get_ffmpeg_exe())
+    if directory and directory not in os.environ.get('PATH', '').split(os.pathsep):
+        os.environ['PATH'] = directory + os.pathsep + os.environ.get('PATH', '')
+    return directory
+
+def run_ffmpeg(cmd, operation, ok_returncodes=(0,), **kwargs):
+    """
+    subprocess.run de un comando FFmpeg/ffprobe registrando su duración y sus fallos
+    en las métricas (operation: etiqueta del tipo de llamada, p. ej. 'extract_pcm')
+    """
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(cmd, **kwargs)
+    except Exception:
+        FFMPEG_FAILURES.inc(operation=operation)
+        raise
+    finally:
+        FFMPEG_SECONDS.observe(time.perf_counter() - start, operation=operation)
+    if result.returncode not in ok_returncodes:
+        FFMPEG_FAILURES.inc(operation=operation)
+    return result
@@ -1,67 +1,184 @@
+import os
 import re
+import threading
+from collections import OrderedDict
+from analysis import text_hash
+
+# Muletillas: las que se eliminan y las que solo se normalizan (p. ej. "Eh" -> "eh")
+FILLER_WORDS = {
+    'eh': 'eh',
+    'um': '',
+    'uh': '',
+    'emm': '',
+    'ahh': '',
+}
+
+# Nombres propios comunes en educación con su forma correcta
+PROPER_NOUNS = ['Python', 'JavaScript', 'Java', 'SQL', 'HTML', 'CSS', 'React',
+                'Node', 'Git', 'Linux', 'Windows', 'Mac', 'Google', 'Microsoft']
+
+# Conectores repetidos que se dejan en uno ("y y" -> "y")
+REPEATED_CONNECTORS = ['y', 'pero']
+
+# Oraciones por párrafo del texto humanizado
+SENTENCES_PER_PARAGRAPH = 4
+
+# Tamaño aproximado de cada bloque procesado; los bloques se cortan tras un punto
+CHUNK_CHARS = 64 * 1024
+
+# Resultados recientes que se conservan. Van aparte de la caché de análisis para que
+# /humanize no expulse los documentos de los que depende /summarize/<doc_id>
+RESULT_CACHE_ENTRIES = int(os.environ.get('HUMANIZE_CACHE_ENTRIES', 16))
+
+_results = OrderedDict()
+_results_lock = threading.Lock()
+
+def _word_rule(words):
+    """
+    Una sola expresión que reconoce cualquiera de las palabras (sin distinguir mayúsculas)
+    """
+    # Las más largas primero para que "Java" no gane a "JavaScript"; la anticipación de la
+    # primera letra descarta enseguida las posiciones que no pueden empezar ninguna
+    initials = ''.join(sorted({re.escape(word[0].lower()) for word in words}))
+    alternation = '|'.join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+    return re.compile(rf'\b(?=[{initials}])(?:{alternation})\b', re.IGNORECASE)
+
+# Reglas compiladas una sola vez al importar el módulo
+# Espacios a normalizar: un espacio simple ya está bien y no se sustituye
+WHITESPACE = re.compile(r'\s{2,}|[^\S ]')
+# Separador de oraciones (puntos y espacios sueltos) seguido de la letra a capitalizar
+SENTENCE_START = re.compile(r'(?:^| ?\.[ .]*)(.)', re.DOTALL)
+PUNCTUATION = re.compile(r' ?([.,!?;:]) ?')
+FILLERS = _word_rule(FILLER_WORDS)
+# Las claves se comparan con casefold(): IGNORECASE también acepta variantes como "ſ" por "s"
+FILLER_REPLACEMENTS = {word.casefold(): replacement for word, replacement in FILLER_WORDS.items()}
+DOUBLE_SPACE = re.compile(r'  +')
+REPEATED_WORD = re.compile(r'\b(\w+)\s+\1\b', re.IGNORECASE)
+CONNECTOR_RULES = [(re.compile(rf'\s+{word}\s+{word}\s+'), f' {word} ') for word in REPEATED_CONNECTORS]
+NOUNS = _word_rule(PROPER_NOUNS)
+NOUN_FORMS = {noun.casefold(): noun for noun in PROPER_NOUNS}
+
+def _cached(kind, text, compute):
+    """
+    Resultado de compute() para el texto, reutilizado si ya se calculó hace poco
+    """
+    key = (kind, text_hash(text))
+    with _results_lock:
+        if key in _results:
+            _results.move_to_end(key)
+            return _results[key]
+    value = compute()
+    with _results_lock:
+        _results[key] = value
+        while len(_results) > RESULT_CACHE_ENTRIES:
+            _results.popitem(last=False)
+    return value
+
+def clear_cache():
+    with _results_lock:
+        _results.clear()
+
+def _capitalize(match):
+    separator = '. ' if match.start(1) else ''
+    return separator + match.group(1).upper()
+
+def _filler(match):
+    return FILLER_REPLACEMENTS[match.group(0).casefold()]
+
+def _noun(match):
+    return NOUN_FORMS[match.group(0).casefold()]
+
+def sentence_chunks(pieces, chunk_chars=CHUNK_CHARS):
+    """
+    Reagrupa el texto (un str o un iterable de trozos, p. ej. un archivo leído por bloques)
+    en bloques de unos chunk_chars caracteres que terminan justo después de un punto.
+    Ninguna regla cruza un punto, así que cada bloque se procesa por separado.
+    """
+    if isinstance(pieces, str):
+        pieces = [pieces]
+    buffer = ''
+    for piece in pieces:
+        buffer = buffer + piece if buffer else piece
+        start = 0
+        while len(buffer) - start >= chunk_chars:
+            limit = start + chunk_chars
+            cut = buffer.rfind('.', start, limit) + 1 or buffer.find('.', limit) + 1
+            if not cut:
+                # Oración sin punto más larga que el bloque: se espera al siguiente trozo
+                break
+            yield buffer[start:cut]
+            start = cut
+        buffer = buffer[start:]
+    if buffer:
+        yield buffer
+
+def _humanize_chunk(chunk):
+    """
+    Oraciones de un bloque normalizadas, capitalizadas y sin muletillas; cada una
+    termina en '. '
+    """
+    text = WHITESPACE.sub(' ', chunk).strip(' .')
+    if not text:
+        return ''
+    text = SENTENCE_START.sub(_capitalize, text)
+    text = PUNCTUATION.sub(r'\1 ', text + '.')
+    text = DOUBLE_SPACE.sub(' ', FILLERS.sub(_filler, text))
+    # El bloque anterior ya termina en espacio (y al principio del texto se recorta)
+    return text[1:] if text.startswith(' ') else text
+
+def iter_humanized(pieces, chunk_chars=CHUNK_CHARS):
+    """
+    Humaniza un texto por bloques y va devolviendo el resultado, de modo que una
+    transcripción muy larga se procesa con memoria constante. Concatenar lo devuelto da
+    lo mismo que humanize_text.
+    """
+    count = 0
+    separator = ''
+    for chunk in sentence_chunks(pieces, chunk_chars):
+        text = _humanize_chunk(chunk)
+        if not text:
+            continue
+        sentences = text[:-2].split('. ')
+        # Oraciones que faltan para completar el párrafo en curso
+        start = 0
+        end = (SENTENCES_PER_PARAGRAPH - count % SENTENCES_PER_PARAGRAPH) or SENTENCES_PER_PARAGRAPH
+        parts = []
+        while start < len(sentences):
+            parts.append(separator + '. '.join(sentences[start:end]) + '.')
+            separator = '\n\n' if end <= len(sentences) else ' '
+            start, end = end, end + SENTENCES_PER_PARAGRAPH
+        count += len(sentences)
+        yield ''.join(parts)
+    if not count:
+        yield '.'
 
 def humanize_text(text):
     """
-    Humaniza texto generado por IA, haciéndolo más natural y legible
+    Humaniza texto generado por IA, haciéndolo más natural y legible.
+    El resultado se guarda en memoria: repetir la petición con el mismo texto no vuelve
+    a procesarlo.
     """
     if not text:
         return ""
-    
-    # Eliminar espacios múltiples
-    text = re.sub(r'\s+', ' ', text)
-    
-    # Capitalizar primera letra de cada oración
-    sentences = text.split('.')
-    humanized_sentences = []
-    
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if sentence:
-            # Capitalizar primera letra
-            sentence = sentence[0].upper() + sentence[1:] if len(sentence) > 1 else sentence.upper()
-            humanized_sentences.append(sentence)
-    
-    text = '. '.join(humanized_sentences)
-    
-    # Agregar punto final si no existe
-    if text and not text.endswith('.'):
-        text += '.'
-    
-    # Mejorar puntuación común
-    text = re.sub(r'\s+([.,!?;:])', r'\1', text)  # Eliminar espacios antes de puntuación
-    text = re.sub(r'([.,!?;:])\s*', r'\1 ', text)  # Agregar espacio después de puntuación
-    text = re.sub(r'\s+', ' ', text)  # Limpiar espacios múltiples nuevamente
-    
-    # Mejorar palabras comunes mal escritas
-    replacements = {
-        r'\beh\b': 'eh',
-        r'\bum\b': '',
-        r'\buh\b': '',
-        r'\bemm\b': '',
-        r'\bahh\b': '',
-        r'\s+': ' ',
-    }
-    
-    for pattern, replacement in replacements.items():
-        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-    
-    # Limpiar espacios finales
-    text = text.strip()
-    
-    # Organizar en párrafos (cada 3-4 oraciones)
-    sentences = text.split('. ')
-    paragraphs = []
-    current_paragraph = []
-    
-    for i, sentence in enumerate(sentences):
-        current_paragraph.append(sentence)
-        if (i + 1) % 4 == 0 or i == len(sentences) - 1:
-            paragraphs.append('. '.join(current_paragraph) + ('.' if not sentence.endswith('.') else ''))
-            current_paragraph = []
-    
-    text = '\n\n'.join(paragraphs)
-    
-    return text
+    return _cached('humanize', text, lambda: ''.join(iter_humanized(text)))
+
+def _improve_chunk(chunk):
+    # Eliminar muletillas y repeticiones excesivas
+    text = REPEATED_WORD.sub(r'\1', chunk)
+
+    # Mejorar conectores
+    for pattern, replacement in CONNECTOR_RULES:
+        text = pattern.sub(replacement, text)
+
+    # Capitalizar nombres propios comunes en educación
+    return NOUNS.sub(_noun, text)
+
+def iter_improved(pieces, chunk_chars=CHUNK_CHARS):
+    """
+    improve_readability por bloques (ver iter_humanized)
+    """
+    for chunk in sentence_chunks(pieces, chunk_chars):
+        yield _improve_chunk(chunk)
 
 def improve_readability(text):
     """
@@ -69,27 +186,12 @@ def improve_readability(text):
     """
     if not text:
         return ""
-    
-    # Eliminar muletillas y repeticiones excesivas
-    text = re.sub(r'\b(\w+)\s+\1\b', r'\1', text, flags=re.IGNORECASE)
-    
-    # Mejorar conectores
-    text = re.sub(r'\s+y\s+y\s+', ' y ', text)
-    text = re.sub(r'\s+pero\s+pero\s+', ' pero ', text)
-    
-    # Capitalizar nombres propios comunes en educación
-    proper_nouns = ['Python', 'JavaScript', 'Java', 'SQL', 'HTML', 'CSS', 'React', 
-                    'Node', 'Git', 'Linux', 'Windows', 'Mac', 'Google', 'Microsoft']
-    
-    for noun in proper_nouns:
-        text = re.sub(rf'\b{noun}\b', noun, text, flags=re.IGNORECASE)
-    
-    return text
+    return _cached('readability', text, lambda: ''.join(iter_improved(text)))
 
 if __name__ == "__main__":
     # Ejemplo de uso
     sample_text = "eh bueno entonces um vamos a hablar sobre python  python es un lenguaje de programación  muy popular  eh muy usado en ciencia de datos  y  y machine learning"
-    
+
     print("Texto original:")
     print(sample_text)
     print("\nTexto humanizado:")
@@ -0,0 +1,197 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from metrics import JOBS
+
+# Etapas de procesamiento y porcentaje de avance con el que empieza cada una
+STAGES = {
+    'queued': 0,
+    'extracting': 0,
+    'transcribing': 10,
+    'summarizing': 85,
+    'writing': 95,
+    'done': 100,
+}
+
+class QueueFullError(Exception):
+    pass
+
+class Job:
+    """
+    Trabajo de procesamiento en segundo plano
+    """
+
+    def __init__(self, description=''):
+        self.id = uuid.uuid4().hex
+        self.description = description
+        self.status = 'queued'
+        self.stage = 'queued'
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Segmentos transcritos hasta ahora (modo streaming)
+        self.segments = []
+        # Registro .npz del que se leen los segmentos una vez terminado (ver release_segments)
+        self.segments_path = None
+        # Se incrementa con cada cambio para despertar a quien espera eventos
+        self.version = 0
+        self._changed = threading.Condition()
+
+    def _notify(self):
+        with self._changed:
+            self.version += 1
+            self._changed.notify_all()
+
+    def update(self, stage, progress=None):
+        """
+        Actualiza la etapa y el porcentaje completado (0-100)
+        """
+        self.stage = stage
+        if progress is None:
+            progress = STAGES.get(stage, self.progress)
+        self.progress = round(max(self.progress, min(100.0, progress)), 1)
+        self._notify()
+
+    def add_segment(self, segment):
+        self.segments.append({
+            'start': round(segment['start'], 2),
+            'end': round(segment['end'], 2),
+            'text': segment['text'],
+        })
+        self._notify()
+
+    def segments_since(self, index):
+        """
+        Segmentos a partir de index: de memoria mientras se transcribe y del registro de
+        segmentos cuando el trabajo ya terminó
+        """
+        # Primero la lista y luego la ruta: release_segments fija la ruta antes de vaciarla
+        segments = self.segments
+        path = self.segments_path
+        if path is None or segments:
+            return segments[index:]
+        from segment_store import SegmentStore
+        try:
+            store = SegmentStore(path)
+        except (OSError, ValueError, KeyError):
+            return []
+        return [{'start': round(float(store.start[i]), 2), 'end': round(float(store.end[i]), 2),
+                 'text': store.text(i)} for i in range(index, len(store))]
+
+    def release_segments(self, output_folder='outputs'):
+        """
+        Libera los segmentos en memoria (con tiempos por palabra en result) si ya están en
+        el registro .npz de outputs/: un trabajo terminado se conserva retention_seconds
+        """
+        result = self.result
+        if not isinstance(result, dict) or not result.get('segments_file'):
+            return
+        path = os.path.join(output_folder, result['segments_file'])
+        if not os.path.exists(path):
+            return
+        self.segments_path = path
+        self.segments = []
+        result.pop('segments', None)
+
+    def wait_for_change(self, version, timeout=15):
+        """
+        Espera hasta que el trabajo cambie respecto a version. Devuelve la versión actual
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout=timeout)
+            return self.version
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'error')
+
+    def to_dict(self, include_result=False):
+        data = {
+            'job_id': self.id,
+            'description': self.description,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': self.progress,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        if self.error:
+            data['error'] = self.error
+        if include_result and self.result is not None:
+            data['result'] = self.result
+        return data
+
+class JobManager:
+    """
+    Cola de trabajos con un número acotado de hilos trabajadores
+    """
+
+    def __init__(self, max_workers=2, max_pending=20, retention_seconds=3600):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, description='', stream=False, **kwargs):
+        """
+        Encola func(*args, progress_callback=..., **kwargs) y devuelve el trabajo creado.
+        Con stream=True también se pasa on_segment para ir guardando los segmentos.
+        """
+        with self._lock:
+            self._prune_locked()
+            if self._pending_count_locked() >= self.max_pending:
+                raise QueueFullError('Demasiados trabajos en cola, inténtalo más tarde')
+            job = Job(description)
+            self._jobs[job.id] = job
+        if stream:
+            kwargs['on_segment'] = job.add_segment
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        job.started_at = time.time()
+        job.status = 'running'
+        job.update('extracting')
+        try:
+            job.result = func(*args, progress_callback=job.update, **kwargs)
+            job.release_segments()
+            job.update('done')
+            job.finished_at = time.time()
+            job.status = 'done'
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            job.finished_at = time.time()
+            job.status = 'error'
+        JOBS.inc(status=job.status)
+        job._notify()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _pending_count_locked(self):
+        return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def queue_depth(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status == 'queued')
+
+    def _prune_locked(self):
+        """
+        Olvida los trabajos terminados hace más de retention_seconds
+        """
+        limit = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at < limit]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -1,7 +1,25 @@
 import os
-from PIL import Image
 import subprocess
 import json
+from ffmpeg_utils import get_ffmpeg_exe, get_ffprobe_exe, run_ffmpeg
+
+# Margen sobre el tamaño final al reducir con reduce() antes del filtro LANCZOS (como en
+# Image.thumbnail): con 2.0 el resultado es prácticamente igual al de LANCZOS directo
+REDUCING_GAP = 2.0
+
+def _flatten_alpha(img, background=(255, 255, 255)):
+    """
+    Compone la imagen sobre un fondo blanco para guardarla como JPEG. La propia imagen
+    hace de máscara (paste usa su canal alfa), así que solo se crea la copia RGB.
+    """
+    from PIL import Image
+    if img.mode == 'P':
+        img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+    if img.mode not in ('RGBA', 'LA'):
+        return img
+    rgb_img = Image.new('RGB', img.size, background)
+    rgb_img.paste(img, mask=img)
+    return rgb_img
 
 def compress_image(input_path, output_path, quality=75, max_width=1920):
     """
@@ -9,20 +27,22 @@ def compress_image(input_path, output_path, quality=75, max_width=1920):
     quality: 1-95 (menor = más comprimido)
     max_width: ancho máximo en píxeles
     """
+    from PIL import Image
     try:
         img = Image.open(input_path)
         
         # Redimensionar si es necesario
         if img.width > max_width:
             ratio = max_width / img.width
-            new_height = int(img.height * ratio)
-            img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
+            size = (max_width, int(img.height * ratio))
+            # Los JPEG se decodifican directamente a 1/2, 1/4 u 1/8 de la resolución (sin
+            # bajar del tamaño final); draft devuelve la región exacta para el filtro final
+            draft = img.draft(None, size) if img.format == 'JPEG' else None
+            box = draft[1] if draft else None
+            img = img.resize(size, Image.Resampling.LANCZOS, box=box, reducing_gap=REDUCING_GAP)
         
         # Convertir a RGB si es necesario (para JPEG)
-        if img.mode in ('RGBA', 'LA', 'P'):
-            rgb_img = Image.new('RGB', img.size, (255, 255, 255))
-            rgb_img.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-            img = rgb_img
+        img = _flatten_alpha(img)
         
         # Guardar con compresión
         img.save(output_path, 'JPEG', quality=quality, optimize=True)
@@ -46,6 +66,7 @@ def convert_image_format(input_path, output_path, target_format='webp', quality=
     """
     Convierte imagen a otro formato (webp, png, jpg, etc)
     """
+    from PIL import Image
     try:
         img = Image.open(input_path)
         
@@ -115,7 +136,7 @@ def compress_video(input_path, output_path, quality='medium'):
         settings = quality_settings.get(quality, quality_settings['medium'])
         
         cmd = [
-            'ffmpeg',
+            get_ffmpeg_exe(),
             '-i', input_path,
             '-vf', f"scale={settings['width']}:{settings['height']}",
             '-b:v', settings['bitrate'],
@@ -130,7 +151,7 @@ def compress_video(input_path, output_path, quality='medium'):
         
         print(f"Ejecutando comando FFmpeg: {' '.join(cmd)}")
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)  # 10 minutos de timeout
+            result = run_ffmpeg(cmd, 'compress_video', capture_output=True, text=True, timeout=600)  # 10 minutos de timeout
         except subprocess.TimeoutExpired:
             return {'success': False, 'error': 'Video compression timed out (exceeded 10 minutes)'}
         
@@ -209,7 +230,7 @@ def convert_video_format(input_path, output_path, target_format='mp4'):
         settings = format_settings.get(target_format.lower(), format_settings['mp4'])
         
         cmd = [
-            'ffmpeg',
+            get_ffmpeg_exe(),
             '-i', input_path,
             '-c:v', settings['vcodec'],
             '-c:a', settings['acodec'],
@@ -221,7 +242,7 @@ def convert_video_format(input_path, output_path, target_format='mp4'):
         
         print(f"Ejecutando comando FFmpeg para conversión: {' '.join(cmd)}")
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=900)  # 15 minutos de timeout
+            result = run_ffmpeg(cmd, 'convert_video', capture_output=True, text=True, timeout=900)  # 15 minutos de timeout
         except subprocess.TimeoutExpired:
             return {'success': False, 'error': 'Video conversion timed out (exceeded 15 minutes)'}
         
@@ -265,6 +286,7 @@ def get_media_info(file_path):
         file_ext = os.path.splitext(file_path)[1].lower()
         
         if file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp']:
+            from PIL import Image
             img = Image.open(file_path)
             return {
                 'type': 'image',
@@ -275,9 +297,9 @@ def get_media_info(file_path):
             }
         elif file_ext in ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv']:
             # Para videos, usar ffprobe
-            cmd = ['ffprobe', '-v', 'error', '-print_format', 'json', 
+            cmd = [get_ffprobe_exe() or 'ffprobe', '-v', 'error', '-print_format', 'json', 
                    '-show_format', '-show_streams', file_path]
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            result = run_ffmpeg(cmd, 'probe', capture_output=True, text=True)
             info = json.loads(result.stdout)
             
             duration = float(info['format'].get('duration', 0))
@@ -0,0 +1,209 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Límites de los histogramas de latencia (segundos)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+                   600.0, 1800.0)
+# Límites para el factor de tiempo real (segundos de cómputo por segundo de audio)
+RTF_BUCKETS = (0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labels)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    """
+    Valor que solo crece (peticiones, bytes, errores)
+    """
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+                                for key, value in items]
+
+class Gauge(_Metric):
+    """
+    Valor instantáneo; con callback se calcula al exponer las métricas
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labels=(), callback=None):
+        super().__init__(name, help_text, labels)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def render(self):
+        if self.callback is not None:
+            try:
+                items = [((), self.callback())]
+            except Exception:
+                items = []
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+                                for key, value in items]
+
+class Histogram(_Metric):
+    """
+    Distribución de valores en cubetas acumuladas, con suma y número de observaciones
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Cuentas por cubeta (la última es +Inf), suma y total
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """
+    Conjunto de métricas del proceso expuesto en formato de texto de Prometheus
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=(), callback=None):
+        return self._register(Gauge(name, help_text, labels, callback))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+# Registro global del proceso
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'classtranscriber_stage_seconds', 'Duración de cada etapa del pipeline', ('stage',))
+MODEL_LOAD_SECONDS = registry.histogram(
+    'classtranscriber_model_load_seconds', 'Tiempo de carga de modelos', ('model',))
+FFMPEG_SECONDS = registry.histogram(
+    'classtranscriber_ffmpeg_seconds', 'Duración de cada invocación de FFmpeg/ffprobe', ('operation',))
+FFMPEG_FAILURES = registry.counter(
+    'classtranscriber_ffmpeg_failures_total', 'Invocaciones de FFmpeg/ffprobe fallidas', ('operation',))
+TRANSCRIPTION_RTF = registry.histogram(
+    'classtranscriber_transcription_rtf', 'Factor de tiempo real de cada transcripción', ('model',),
+    buckets=RTF_BUCKETS)
+AUDIO_SECONDS = registry.counter(
+    'classtranscriber_audio_seconds_total', 'Segundos de audio transcritos', ('model',))
+JOBS = registry.counter(
+    'classtranscriber_jobs_total', 'Trabajos en segundo plano terminados', ('status',))
+HTTP_REQUESTS = registry.counter(
+    'classtranscriber_http_requests_total', 'Peticiones HTTP', ('route', 'method', 'status'))
+HTTP_ERRORS = registry.counter(
+    'classtranscriber_http_errors_total', 'Respuestas HTTP con error (4xx/5xx)', ('route', 'status'))
+HTTP_SECONDS = registry.histogram(
+    'classtranscriber_http_request_seconds', 'Latencia de las peticiones HTTP', ('route',))
+HTTP_BYTES_IN = registry.counter(
+    'classtranscriber_http_request_bytes_total', 'Bytes recibidos en las peticiones', ('route',))
+HTTP_BYTES_OUT = registry.counter(
+    'classtranscriber_http_response_bytes_total', 'Bytes enviados en las respuestas', ('route',))
+
+def time_stage(stage):
+    """
+    Mide un bloque como etapa del pipeline: with time_stage('upload_save'): ...
+    """
+    return STAGE_SECONDS.time(stage=stage)
+
+def observe_stages(timings):
+    """
+    Registra los tiempos por etapa ya medidos ({etapa: segundos})
+    """
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+
+def render():
+    return registry.render()
@@ -0,0 +1,287 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from cpu_engine import default_precision
+from metrics import MODEL_LOAD_SECONDS
+
+# Presupuesto de memoria por defecto para modelos residentes (en MB)
+DEFAULT_MEMORY_BUDGET_MB = int(os.environ.get('WHISPER_MODEL_BUDGET_MB', 4096))
+
+# Copias de cada modelo que pueden decodificar a la vez (ver set_default_replicas)
+_default_replicas = 1
+
+def set_default_replicas(replicas):
+    """
+    Copias por modelo de los registros que no fijan las suyas. La aplicación usa una por
+    trabajo simultáneo, que es como se reparten los núcleos (cpu_engine.plan_threads)
+    """
+    global _default_replicas
+    _default_replicas = max(1, int(replicas))
+
+def get_process_rss_mb():
+    """
+    Devuelve la memoria residente actual del proceso en MB
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        import resource
+        # ru_maxrss está en KB en Linux (pico, no actual)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def estimate_model_size_mb(model):
+    """
+    Estima la memoria ocupada por los pesos de un modelo de PyTorch
+    """
+    try:
+        total = sum(p.numel() * p.element_size() for p in model.parameters())
+        total += sum(b.numel() * b.element_size() for b in model.buffers())
+        return total / (1024 * 1024)
+    except AttributeError:
+        return 0.0
+
+def default_device():
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+def load_whisper_model(model_size, device, precision):
+    """
+    Carga un modelo Whisper con la precisión indicada ('fp32', 'fp16' o 'int8' en CPU)
+    """
+    import whisper
+    from cpu_engine import apply_planned_threads
+    apply_planned_threads()
+    model = whisper.load_model(model_size, device=device)
+    if precision == 'fp16' and device != 'cpu':
+        model = model.half()
+    elif precision == 'int8' and device == 'cpu':
+        from cpu_engine import quantize_model
+        model = quantize_model(model)
+    return model
+
+class ModelRegistry:
+    """
+    Registro de modelos compartido por todo el proceso.
+    Carga cada combinación (modelo, dispositivo, precisión) una sola vez y
+    expulsa el modelo usado menos recientemente cuando se supera el presupuesto.
+    use_model puede cargar hasta `replicas` copias de un mismo modelo para que los
+    trabajos simultáneos no se esperen unos a otros.
+    """
+
+    def __init__(self, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, loader=load_whisper_model, replicas=None):
+        self.memory_budget_mb = memory_budget_mb
+        self.loader = loader
+        # None = las de set_default_replicas
+        self.replicas = replicas
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        # Se avisa al devolver una copia o al terminar de cargar una
+        self._released = threading.Condition(self._lock)
+        self._loading = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_model(self, model_size='base', device=None, precision=None):
+        """
+        Devuelve el modelo solicitado, cargándolo si aún no está en memoria.
+        Sin precisión explícita se usa la configurada para el dispositivo (ver cpu_engine).
+        """
+        if device is None:
+            device = default_device()
+        if precision is None:
+            precision = default_precision(device)
+        key = (model_size, device, precision)
+
+        while True:
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    self._models.move_to_end(key)
+                    entry['uses'] += 1
+                    entry['last_used'] = time.time()
+                    self.hits += 1
+                    return entry['model']
+
+                # Otro hilo ya está cargando este modelo: esperar a que termine
+                pending = self._loading.get(key)
+                if pending is None:
+                    pending = threading.Event()
+                    self._loading[key] = pending
+                    self.misses += 1
+                    break
+            pending.wait()
+
+        try:
+            print(f"Cargando modelo Whisper ({model_size}, {device}, {precision})...")
+            rss_before = get_process_rss_mb()
+            start = time.perf_counter()
+            model = self.loader(model_size, device, precision)
+            load_time = time.perf_counter() - start
+            MODEL_LOAD_SECONDS.observe(load_time, model=f"{model_size}/{device}/{precision}")
+            size_mb = estimate_model_size_mb(model) or max(0.0, get_process_rss_mb() - rss_before)
+            print(f"Modelo cargado en {load_time:.2f}s ({size_mb:.0f} MB)")
+
+            with self._lock:
+                self._models[key] = {
+                    'model': model,
+                    'size_mb': size_mb,
+                    'load_time': load_time,
+                    'loaded_at': time.time(),
+                    'last_used': time.time(),
+                    'uses': 1,
+                    # Copias cargadas (la primera es model) y las que no está usando nadie
+                    'instances': [model],
+                    'free': [model],
+                    'replicas_loading': 0,
+                }
+                self._evict_locked(keep=key)
+            return model
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            pending.set()
+
+    @contextmanager
+    def use_model(self, model_size='base', device=None, precision=None):
+        """
+        Entrega una copia del modelo con uso exclusivo: la decodificación de Whisper instala
+        hooks sobre el modelo, así que dos hilos no pueden usar la misma a la vez. Si todas
+        están ocupadas se carga otra (hasta `replicas` y sin pasar del presupuesto de
+        memoria) o se espera a que se libere una.
+        """
+        if device is None:
+            device = default_device()
+        if precision is None:
+            precision = default_precision(device)
+        key = (model_size, device, precision)
+        model = self.get_model(model_size, device=device, precision=precision)
+        instance = self._acquire(key, model)
+        if instance is None:
+            # El modelo fue expulsado entre la carga y el uso; nadie más lo comparte
+            yield model
+            return
+        try:
+            yield instance
+        finally:
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None and any(m is instance for m in entry['instances']):
+                    entry['free'].append(instance)
+                    self._released.notify_all()
+
+    def _acquire(self, key, model):
+        """
+        Reserva una copia libre del modelo, cargando una nueva si hace falta y se puede.
+        Devuelve None si el modelo ya no está en el registro.
+        """
+        with self._lock:
+            while True:
+                entry = self._models.get(key)
+                if entry is None or not any(m is model for m in entry['instances']):
+                    return None
+                if entry['free']:
+                    return entry['free'].pop()
+                replicas = self.replicas or _default_replicas
+                loaded = len(entry['instances']) + entry['replicas_loading']
+                fits = self._resident_mb_locked() + entry['size_mb'] <= self.memory_budget_mb
+                if loaded < replicas and fits:
+                    entry['replicas_loading'] += 1
+                    break
+                self._released.wait()
+
+        replica = None
+        try:
+            print(f"Cargando copia {loaded + 1} del modelo {key[0]} ({key[1]}, {key[2]})...")
+            replica = self.loader(*key)
+        finally:
+            with self._lock:
+                entry['replicas_loading'] -= 1
+                if replica is not None:
+                    entry['instances'].append(replica)
+                self._released.notify_all()
+        return replica
+
+    def _evict_locked(self, keep=None):
+        """
+        Expulsa modelos LRU hasta respetar el presupuesto de memoria
+        """
+        evicted = False
+        while self._resident_mb_locked() > self.memory_budget_mb and len(self._models) > 1:
+            key = next(iter(self._models))
+            if key == keep:
+                break
+            entry = self._models.pop(key)
+            self.evictions += 1
+            evicted = True
+            print(f"Modelo expulsado de memoria: {key} ({entry['size_mb']:.0f} MB)")
+        if evicted:
+            self._release_device_cache()
+
+    def _resident_mb_locked(self):
+        return sum(entry['size_mb'] * len(entry['instances']) for entry in self._models.values())
+
+    def _release_device_cache(self):
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    def warm_up(self, model_sizes, device=None, precision=None):
+        """
+        Precarga los modelos indicados (por ejemplo al iniciar la aplicación)
+        """
+        for model_size in model_sizes:
+            model_size = model_size.strip()
+            if model_size:
+                self.get_model(model_size, device=device, precision=precision)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+        self._release_device_cache()
+
+    def stats(self):
+        """
+        Devuelve estadísticas del registro: aciertos, tiempos de carga y memoria
+        """
+        with self._lock:
+            models = [
+                {
+                    'model_size': key[0],
+                    'device': key[1],
+                    'precision': key[2],
+                    'size_mb': round(entry['size_mb'], 1),
+                    'load_time': round(entry['load_time'], 3),
+                    'uses': entry['uses'],
+                    'replicas': len(entry['instances']),
+                    'idle_seconds': round(time.time() - entry['last_used'], 1),
+                }
+                for key, entry in self._models.items()
+            ]
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'evictions': self.evictions,
+                'resident_models_mb': round(self._resident_mb_locked(), 1),
+                'memory_budget_mb': self.memory_budget_mb,
+                'process_rss_mb': round(get_process_rss_mb(), 1),
+                'models': models,
+            }
+
+# Registro global compartido por los hilos de la aplicación
+registry = ModelRegistry()
+
+def get_model(model_size='base', device=None, precision=None):
+    return registry.get_model(model_size, device=device, precision=precision)
+
+def use_model(model_size='base', device=None, precision=None):
+    return registry.use_model(model_size, device=device, precision=precision)
@@ -0,0 +1,201 @@
+import multiprocessing
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from cpu_engine import available_cpus, threads_per_job
+
+# Whisper trabaja con audio mono a 16 kHz
+SAMPLE_RATE = 16000
+
+# Valores por defecto del modo por fragmentos
+DEFAULT_CHUNK_SECONDS = 300
+DEFAULT_OVERLAP_SECONDS = 5
+
+# Motor y modelo de cada proceso trabajador
+_worker_backend = None
+_worker_model_size = None
+
+def default_workers():
+    return available_cpus()
+
+def split_windows(num_samples, chunk_seconds=DEFAULT_CHUNK_SECONDS, overlap_seconds=DEFAULT_OVERLAP_SECONDS,
+                  sample_rate=SAMPLE_RATE):
+    """
+    Divide el audio en ventanas solapadas. Devuelve una lista de (inicio, fin) en muestras
+    """
+    chunk = int(chunk_seconds * sample_rate)
+    overlap = int(overlap_seconds * sample_rate)
+    if chunk <= overlap:
+        raise ValueError("chunk_seconds debe ser mayor que overlap_seconds")
+
+    windows = []
+    start = 0
+    while start < num_samples:
+        end = min(start + chunk, num_samples)
+        windows.append((start, end))
+        if end == num_samples:
+            break
+        start = end - overlap
+    return windows
+
+def offset_segment(seg, offset):
+    """
+    Copia un segmento de Whisper con los campos que usa el pipeline y los tiempos
+    desplazados offset segundos (para pasar de la ventana al eje global)
+    """
+    words = [
+        {'word': w['word'], 'start': w['start'] + offset, 'end': w['end'] + offset}
+        for w in seg.get('words', [])
+    ]
+    return {
+        'start': seg['start'] + offset,
+        'end': seg['end'] + offset,
+        'text': seg['text'],
+        'avg_logprob': seg.get('avg_logprob'),
+        'no_speech_prob': seg.get('no_speech_prob'),
+        'compression_ratio': seg.get('compression_ratio'),
+        'words': words,
+    }
+
+def _init_worker(model_size, threads, slot_counter=None, slots=1, backend=None):
+    """
+    Inicializa un proceso trabajador: lo fija a sus núcleos, ajusta los hilos de PyTorch
+    y carga el modelo una vez
+    """
+    global _worker_backend, _worker_model_size
+    from backends import get_backend
+    from cpu_engine import next_worker_slot, pin_worker
+    if slot_counter is not None:
+        pin_worker(next_worker_slot(slot_counter), slots)
+    _worker_backend = get_backend(backend)
+    if _worker_backend.name == 'whisper':
+        import torch
+        torch.set_num_threads(threads)
+    _worker_model_size = model_size
+    _worker_backend.registry.get_model(model_size, device='cpu')
+
+def _transcribe_window(source, start, end, language='es'):
+    """
+    Transcribe una ventana de audio y desplaza los tiempos al eje global
+    source: array con la ventana o ruta a un archivo PCM float32 mapeable
+    """
+    if isinstance(source, str):
+        audio = np.array(np.memmap(source, dtype=np.float32, mode='r')[start:end])
+    else:
+        audio = source
+
+    offset = start / SAMPLE_RATE
+    segments = _worker_backend.transcribe(audio, model_size=_worker_model_size, language=language,
+                                          word_timestamps=True, device='cpu')
+
+    return [offset_segment(seg, offset) for seg in segments]
+
+def _normalize_word(word):
+    return re.sub(r'[^\w]', '', word.lower())
+
+def _trim_segments(segments, keep):
+    """
+    Filtra las palabras de cada segmento con keep(palabra) y recalcula texto y tiempos
+    """
+    trimmed = []
+    for seg in segments:
+        words = seg['words']
+        if not words:
+            # Sin marcas por palabra: decidir por el centro del segmento
+            center = (seg['start'] + seg['end']) / 2
+            if keep({'start': center, 'end': center}):
+                trimmed.append(seg)
+            continue
+        kept = [w for w in words if keep(w)]
+        if not kept:
+            continue
+        trimmed.append(dict(seg, words=kept, start=kept[0]['start'], end=kept[-1]['end'],
+                            text=''.join(w['word'] for w in kept)))
+    return trimmed
+
+def _drop_duplicated_head(previous, current, max_words=6):
+    """
+    Elimina del inicio de current las palabras que repiten el final de previous
+    (misma frase reconocida a ambos lados del corte)
+    """
+    tail = [w for seg in previous for w in seg['words']][-max_words:]
+    head = [w for seg in current for w in seg['words']][:max_words]
+    tail_norm = [_normalize_word(w['word']) for w in tail]
+    head_norm = [_normalize_word(w['word']) for w in head]
+
+    overlap = 0
+    for k in range(min(len(tail_norm), len(head_norm)), 0, -1):
+        if tail_norm[-k:] == head_norm[:k] and any(tail_norm[-k:]):
+            overlap = k
+            break
+    if not overlap:
+        return current
+
+    duplicated = {id(w) for w in head[:overlap]}
+    return _trim_segments(current, lambda w: id(w) not in duplicated)
+
+def stitch_segments(chunk_results, windows, sample_rate=SAMPLE_RATE):
+    """
+    Une los segmentos de ventanas solapadas en una sola lista con tiempos globales.
+    En cada solapamiento se corta en el punto medio y se eliminan palabras duplicadas.
+    """
+    stitched = []
+    for i, segments in enumerate(chunk_results):
+        lower = None
+        upper = None
+        if i > 0:
+            lower = (windows[i][0] + windows[i - 1][1]) / 2 / sample_rate
+        if i < len(windows) - 1:
+            upper = (windows[i + 1][0] + windows[i][1]) / 2 / sample_rate
+
+        def keep(w, lower=lower, upper=upper):
+            center = (w['start'] + w['end']) / 2
+            return (lower is None or center >= lower) and (upper is None or center < upper)
+
+        segments = _trim_segments(segments, keep)
+        if stitched and segments:
+            segments = _drop_duplicated_head(stitched, segments)
+        stitched.extend(segments)
+    return stitched
+
+def transcribe_chunked(audio, model_size='base', workers=None, chunk_seconds=DEFAULT_CHUNK_SECONDS,
+                       overlap_seconds=DEFAULT_OVERLAP_SECONDS, language='es', on_progress=None, backend=None):
+    """
+    Transcribe el audio en ventanas solapadas repartidas en un pool de procesos,
+    con un modelo cargado por proceso
+    audio: array float32 a 16 kHz (si es np.memmap, los procesos leen del archivo)
+    on_progress: función opcional llamada con (fragmentos_completados, total)
+    backend: motor de transcripción de cada proceso (por defecto el configurado)
+    """
+    workers = workers or default_workers()
+    windows = split_windows(len(audio), chunk_seconds, overlap_seconds)
+    workers = min(workers, len(windows))
+    threads = threads_per_job(workers)
+
+    # Con un archivo mapeado cada proceso lee su ventana sin copiar el audio completo
+    filename = getattr(audio, 'filename', None)
+
+    print(f"Transcribiendo {len(windows)} fragmentos con {workers} procesos ({threads} hilos cada uno)...")
+    start_time = time.perf_counter()
+    slot_counter = multiprocessing.Value('i', 0)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_size, threads, slot_counter, workers, backend)) as pool:
+        futures = []
+        for start, end in windows:
+            if filename:
+                futures.append(pool.submit(_transcribe_window, filename, start, end, language))
+            else:
+                futures.append(pool.submit(_transcribe_window, np.asarray(audio[start:end]), start, end, language))
+        chunk_results = [None] * len(futures)
+        index = {future: i for i, future in enumerate(futures)}
+        for done, future in enumerate(as_completed(futures), 1):
+            chunk_results[index[future]] = future.result()
+            if on_progress:
+                on_progress(done, len(futures))
+
+    segments = stitch_segments(chunk_results, windows)
+    text = ''.join(seg['text'] for seg in segments)
+    print(f"Transcripción por fragmentos completada en {time.perf_counter() - start_time:.1f}s")
+
+    return {'text': text, 'segments': segments}
@@ -0,0 +1,181 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+PROFILE_DIR = os.path.join('outputs', '.profiles')
+
+# Fracción de peticiones perfiladas sin pedirlo (0 = solo bajo demanda)
+DEFAULT_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+# Perfiles que se conservan en disco (se borran los más antiguos)
+MAX_PROFILES = int(os.environ.get('PROFILE_MAX_FILES', 200))
+# Funciones que se guardan en el resumen de cada perfil
+TOP_FUNCTIONS = 30
+
+# cProfile no admite dos perfiladores activos a la vez en el proceso: mientras hay
+# uno en marcha las demás peticiones se atienden sin perfilar
+_active = threading.Lock()
+
+def wants_profile(request, sample_rate=DEFAULT_SAMPLE_RATE):
+    """
+    Indica si hay que perfilar la petición: cabecera X-Profile: 1, ?profile=1 o muestreo aleatorio
+    """
+    flag = request.headers.get('X-Profile') or request.args.get('profile')
+    if flag is not None:
+        return flag.lower() in ('1', 'true', 'yes', 'on')
+    return sample_rate > 0 and random.random() < sample_rate
+
+def new_profile_id(kind):
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{kind}_{uuid.uuid4().hex[:8]}"
+
+class Profiler:
+    """
+    Perfil de CPU (cProfile) y pico de memoria (tracemalloc) de un bloque de código.
+    El pico de tracemalloc es del proceso completo durante el perfil.
+    """
+
+    def __init__(self, kind, label='', profile_id=None, profile_dir=PROFILE_DIR):
+        self.kind = kind
+        self.label = label
+        self.id = profile_id or new_profile_id(kind)
+        self.profile_dir = profile_dir
+        self._profile = None
+        self._started_tracemalloc = False
+        self._start = None
+
+    def start(self):
+        """
+        Empieza a perfilar. Devuelve False si ya hay otro perfil en curso.
+        """
+        if not _active.acquire(blocking=False):
+            return False
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._profile = cProfile.Profile()
+        self._start = time.perf_counter()
+        self._profile.enable()
+        return True
+
+    def stop(self, **metadata):
+        """
+        Termina el perfil y lo guarda (.prof para pstats/snakeviz y .json con el resumen)
+        """
+        if self._profile is None:
+            return None
+        try:
+            self._profile.disable()
+            elapsed = time.perf_counter() - self._start
+            _, peak = tracemalloc.get_traced_memory()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        finally:
+            _active.release()
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self._profile.dump_stats(os.path.join(self.profile_dir, f"{self.id}.prof"))
+        summary = dict(metadata, **{
+            'id': self.id,
+            'kind': self.kind,
+            'label': self.label,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'duration': round(elapsed, 4),
+            'tracemalloc_peak_mb': round(peak / (1024 * 1024), 2),
+            'top_functions': top_functions(self._profile),
+        })
+        with open(os.path.join(self.profile_dir, f"{self.id}.json"), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        self._profile = None
+        _prune(self.profile_dir)
+        print(f"Perfil guardado: {self.id} ({elapsed:.2f}s, pico de memoria {summary['tracemalloc_peak_mb']} MB)")
+        return summary
+
+def top_functions(profile, limit=TOP_FUNCTIONS):
+    """
+    Funciones con más tiempo acumulado del perfil
+    """
+    stats = pstats.Stats(profile)
+    rows = []
+    for (filename, line, name), (calls, primitive, own, cumulative, _) in stats.stats.items():
+        rows.append({
+            'function': f"{os.path.basename(filename)}:{line}({name})",
+            'calls': calls,
+            'own_s': round(own, 4),
+            'cumulative_s': round(cumulative, 4),
+        })
+    rows.sort(key=lambda row: row['cumulative_s'], reverse=True)
+    return rows[:limit]
+
+def profile_call(func, kind='job', label='', profile_id=None):
+    """
+    Envuelve func para perfilar cada llamada (p. ej. un trabajo en segundo plano)
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = Profiler(kind, label, profile_id)
+        started = profiler.start()
+        status = 'error'
+        try:
+            result = func(*args, **kwargs)
+            status = 'done'
+            return result
+        finally:
+            if started:
+                profiler.stop(status=status)
+    return wrapper
+
+def _prune(profile_dir, max_profiles=MAX_PROFILES):
+    summaries = sorted(name for name in os.listdir(profile_dir) if name.endswith('.json'))
+    for name in summaries[:max(0, len(summaries) - max_profiles)]:
+        for ext in ('.json', '.prof'):
+            path = os.path.join(profile_dir, name[:-len('.json')] + ext)
+            if os.path.exists(path):
+                os.remove(path)
+
+def list_profiles(profile_dir=PROFILE_DIR):
+    """
+    Perfiles guardados, del más reciente al más antiguo (sin la lista de funciones)
+    """
+    if not os.path.exists(profile_dir):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(profile_dir), reverse=True):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(profile_dir, name), encoding='utf-8') as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue
+        summary.pop('top_functions', None)
+        profiles.append(summary)
+    return profiles
+
+def profile_path(profile_id, ext, profile_dir=PROFILE_DIR):
+    """
+    Ruta de un archivo del perfil, o None si no existe (o el id no es válido)
+    """
+    if not profile_id or os.path.basename(profile_id) != profile_id or profile_id.startswith('.'):
+        return None
+    path = os.path.join(profile_dir, f"{profile_id}.{ext}")
+    return path if os.path.exists(path) else None
+
+def render_text(profile_id, sort='cumulative', limit=60, profile_dir=PROFILE_DIR):
+    """
+    Informe de pstats en texto de un perfil guardado
+    """
+    path = profile_path(profile_id, 'prof', profile_dir)
+    if path is None:
+        return None
+    stream = io.StringIO()
+    pstats.Stats(path, stream=stream).strip_dirs().sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
@@ -0,0 +1,272 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+from analysis import STOP_WORDS
+
+INDEX_PATH = os.path.join('outputs', '.index', 'search.db')
+
+# Parámetros de BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    filename TEXT UNIQUE NOT NULL,
+    source TEXT,
+    mtime REAL,
+    size INTEGER,
+    length INTEGER,
+    indexed_at REAL
+);
+CREATE TABLE IF NOT EXISTS segments (
+    doc_id INTEGER NOT NULL,
+    seg INTEGER NOT NULL,
+    start REAL,
+    end REAL,
+    text TEXT,
+    PRIMARY KEY (doc_id, seg)
+);
+CREATE TABLE IF NOT EXISTS doc_terms (
+    term TEXT NOT NULL,
+    doc_id INTEGER NOT NULL,
+    tf INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    doc_id INTEGER NOT NULL,
+    seg INTEGER NOT NULL,
+    tf INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS doc_terms_term ON doc_terms (term);
+CREATE INDEX IF NOT EXISTS doc_terms_doc ON doc_terms (doc_id);
+CREATE INDEX IF NOT EXISTS postings_term_doc ON postings (term, doc_id);
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+"""
+
+def tokenize(text):
+    """
+    Separa el texto en términos con el mismo criterio que analysis.py
+    """
+    return [w for w in re.findall(r'\b\w+\b', text.lower()) if w not in STOP_WORDS]
+
+def _transcription_body(content):
+    """
+    Extrae la sección de transcripción completa de un archivo de salida
+    """
+    marker = 'TRANSCRIPCIÓN COMPLETA\n'
+    index = content.find(marker)
+    if index < 0:
+        return content
+    body = content[index + len(marker):]
+    return body.split('\n', 1)[1] if body.startswith('-') else body
+
+def _source_name(content):
+    match = re.search(r'^Archivo: (.+)$', content, re.MULTILINE)
+    return match.group(1).strip() if match else None
+
+class SearchIndex:
+    """
+    Índice invertido en disco (SQLite) sobre las transcripciones de outputs/.
+    Guarda término -> (transcripción, frecuencia) para puntuar, término -> (transcripción,
+    segmento, frecuencia) para localizar los aciertos y los tiempos de cada segmento.
+    """
+
+    def __init__(self, path=INDEX_PATH, output_folder='outputs'):
+        self.path = path
+        self.output_folder = output_folder
+        self._lock = threading.Lock()
+        # Una sincronización a la vez (la periódica de app.py y las de la línea de comandos)
+        self._sync_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._initialized = True
+        return conn
+
+    def add_transcript(self, filename, segments=None):
+        """
+        Indexa (o reindexa) una transcripción de outputs/.
+        segments: lista de segmentos con tiempos; si falta se indexa el texto como un solo segmento
+        """
+        path = os.path.join(self.output_folder, filename)
+        with open(path, encoding='utf-8') as f:
+            content = f.read()
+        if not segments:
+            segments = [{'start': 0.0, 'end': 0.0, 'text': _transcription_body(content)}]
+        stat = os.stat(path)
+
+        rows = []
+        postings = []
+        doc_terms = Counter()
+        for i, seg in enumerate(segments):
+            text = seg['text'].strip()
+            rows.append((i, float(seg['start']), float(seg['end']), text))
+            terms = Counter(tokenize(text))
+            doc_terms.update(terms)
+            postings.extend((term, i, tf) for term, tf in terms.items())
+        length = sum(doc_terms.values())
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    self._delete_locked(conn, filename)
+                    cur = conn.execute(
+                        'INSERT INTO docs (filename, source, mtime, size, length, indexed_at) VALUES (?, ?, ?, ?, ?, ?)',
+                        (filename, _source_name(content), stat.st_mtime, stat.st_size, length, time.time()))
+                    doc_id = cur.lastrowid
+                    conn.executemany('INSERT INTO segments (doc_id, seg, start, end, text) VALUES (?, ?, ?, ?, ?)',
+                                     [(doc_id,) + row for row in rows])
+                    conn.executemany('INSERT INTO doc_terms (term, doc_id, tf) VALUES (?, ?, ?)',
+                                     [(term, doc_id, tf) for term, tf in doc_terms.items()])
+                    conn.executemany('INSERT INTO postings (term, doc_id, seg, tf) VALUES (?, ?, ?, ?)',
+                                     [(term, doc_id, seg, tf) for term, seg, tf in postings])
+            finally:
+                conn.close()
+
+    def _delete_locked(self, conn, filename):
+        row = conn.execute('SELECT id FROM docs WHERE filename = ?', (filename,)).fetchone()
+        if row:
+            conn.execute('DELETE FROM doc_terms WHERE doc_id = ?', row)
+            conn.execute('DELETE FROM postings WHERE doc_id = ?', row)
+            conn.execute('DELETE FROM segments WHERE doc_id = ?', row)
+            conn.execute('DELETE FROM docs WHERE id = ?', row)
+
+    def remove(self, filename):
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    self._delete_locked(conn, filename)
+            finally:
+                conn.close()
+
+    def sync(self):
+        """
+        Pone el índice al día con outputs/: indexa transcripciones nuevas o modificadas
+        y olvida las eliminadas. Devuelve (añadidas, eliminadas).
+        Solo compara fechas de modificación, así que es barato cuando no hay cambios.
+        """
+        with self._sync_lock:
+            return self._sync()
+
+    def _sync(self):
+        conn = self._connect()
+        try:
+            known = {name: mtime for name, mtime in conn.execute('SELECT filename, mtime FROM docs')}
+        finally:
+            conn.close()
+
+        on_disk = {}
+        if os.path.exists(self.output_folder):
+            for name in os.listdir(self.output_folder):
+                if name.endswith('.txt'):
+                    on_disk[name] = os.path.getmtime(os.path.join(self.output_folder, name))
+
+        added = 0
+        changed = [name for name, mtime in on_disk.items() if known.get(name) != mtime]
+        if changed:
+            # Solo se carga NumPy (registros de segmentos) si hay algo que indexar
+            from segment_store import SegmentStore, segments_path_for
+        for name in changed:
+            segments = None
+            segments_path = segments_path_for(name, self.output_folder)
+            if os.path.exists(segments_path):
+                store = SegmentStore(segments_path)
+                segments = [{'start': store.start[i], 'end': store.end[i], 'text': store.text(i)}
+                            for i in range(len(store))]
+            try:
+                self.add_transcript(name, segments)
+                added += 1
+            except (OSError, UnicodeDecodeError):
+                continue
+
+        removed = [name for name in known if name not in on_disk]
+        for name in removed:
+            self.remove(name)
+        return added, len(removed)
+
+    def list_documents(self):
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT filename, source, size, mtime FROM docs ORDER BY mtime DESC').fetchall()
+        finally:
+            conn.close()
+        return [{'filename': f, 'source': s, 'size': size, 'mtime': m} for f, s, size, m in rows]
+
+    def search(self, query, limit=10, segments_per_doc=3):
+        """
+        Busca los términos de la consulta y devuelve las transcripciones ordenadas por BM25,
+        con los segmentos (y sus tiempos) donde aparecen
+        """
+        start_time = time.perf_counter()
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return {'query': query, 'hits': [], 'took_ms': 0.0}
+
+        conn = self._connect()
+        try:
+            num_docs, total_length = conn.execute('SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs').fetchone()
+            avg_length = total_length / num_docs if num_docs else 1
+
+            # Puntuación a nivel de transcripción con las frecuencias agregadas
+            doc_tf = defaultdict(dict)
+            for term in terms:
+                for doc_id, tf in conn.execute('SELECT doc_id, tf FROM doc_terms WHERE term = ?', (term,)):
+                    doc_tf[doc_id][term] = tf
+            if not doc_tf:
+                return {'query': query, 'hits': [], 'took_ms': round((time.perf_counter() - start_time) * 1000, 2)}
+
+            df = Counter(term for tfs in doc_tf.values() for term in tfs)
+            idf = {term: math.log(1 + (num_docs - n + 0.5) / (n + 0.5)) for term, n in df.items()}
+            placeholders = ','.join('?' * len(doc_tf))
+            docs = {row[0]: row[1:] for row in conn.execute(
+                f'SELECT id, filename, source, length FROM docs WHERE id IN ({placeholders})', list(doc_tf))}
+
+            scores = {}
+            for doc_id, tfs in doc_tf.items():
+                length = docs[doc_id][2] or 1
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                scores[doc_id] = sum(idf[t] * tf * (BM25_K1 + 1) / (tf + norm) for t, tf in tfs.items())
+            ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
+
+            # Solo para las mejores transcripciones se buscan los segmentos concretos
+            hits = []
+            for doc_id in ranked:
+                seg_terms = defaultdict(set)
+                for term in doc_tf[doc_id]:
+                    for (seg,) in conn.execute('SELECT seg FROM postings WHERE term = ? AND doc_id = ?',
+                                               (term, doc_id)):
+                        seg_terms[seg].add(term)
+                best = sorted(seg_terms, key=lambda seg: (-len(seg_terms[seg]), seg))[:segments_per_doc]
+                rows = conn.execute(
+                    f'SELECT seg, start, end, text FROM segments WHERE doc_id = ? AND seg IN ({",".join("?" * len(best))})',
+                    [doc_id] + best).fetchall()
+                filename, source, _ = docs[doc_id]
+                hits.append({
+                    'filename': filename,
+                    'source': source,
+                    'score': round(scores[doc_id], 4),
+                    'segments': [
+                        {'start': round(s, 2), 'end': round(e, 2), 'text': text[:300]}
+                        for _, s, e, text in sorted(rows)
+                    ],
+                })
+        finally:
+            conn.close()
+
+        return {'query': query, 'hits': hits, 'took_ms': round((time.perf_counter() - start_time) * 1000, 2)}
+
+# Índice global compartido por la aplicación y la línea de comandos
+index = SearchIndex()
@@ -0,0 +1,152 @@
+import json
+import os
+import threading
+import numpy as np
+
+RENDER_DIR = os.path.join('outputs', '.renders')
+RENDER_FORMATS = ('txt', 'srt', 'vtt', 'json')
+
+_render_lock = threading.Lock()
+
+def _float_column(segments, field):
+    return np.array([np.nan if seg.get(field) is None else seg[field] for seg in segments], dtype=np.float32)
+
+def save_segments(path, segments, metadata=None):
+    """
+    Guarda los segmentos en un registro compacto por columnas (.npz):
+    inicios y finales, desplazamientos del texto en un único bloque UTF-8,
+    confianza (avg_logprob), probabilidad de silencio y modelo de cada segmento
+    """
+    encoded = [seg['text'].encode('utf-8') for seg in segments]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+
+    models = sorted({seg.get('model') or '' for seg in segments})
+    model_codes = np.array([models.index(seg.get('model') or '') for seg in segments], dtype=np.uint8)
+
+    metadata = dict(metadata or {}, models=models)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez_compressed(
+        tmp_path,
+        start=np.array([seg['start'] for seg in segments], dtype=np.float64),
+        end=np.array([seg['end'] for seg in segments], dtype=np.float64),
+        text=np.frombuffer(b''.join(encoded), dtype=np.uint8),
+        text_offsets=offsets,
+        avg_logprob=_float_column(segments, 'avg_logprob'),
+        no_speech_prob=_float_column(segments, 'no_speech_prob'),
+        model=model_codes,
+        metadata=np.frombuffer(json.dumps(metadata, ensure_ascii=False).encode('utf-8'), dtype=np.uint8),
+    )
+    os.replace(tmp_path, path)
+    return path
+
+class SegmentStore:
+    """
+    Segmentos de una transcripción cargados desde su registro .npz
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with np.load(path) as data:
+            self.start = data['start']
+            self.end = data['end']
+            self._text = data['text'].tobytes()
+            self.text_offsets = data['text_offsets']
+            self.avg_logprob = data['avg_logprob']
+            self.no_speech_prob = data['no_speech_prob']
+            self.model = data['model']
+            self.metadata = json.loads(data['metadata'].tobytes().decode('utf-8'))
+
+    def __len__(self):
+        return len(self.start)
+
+    def text(self, i):
+        return self._text[self.text_offsets[i]:self.text_offsets[i + 1]].decode('utf-8')
+
+    def texts(self):
+        return [self.text(i) for i in range(len(self))]
+
+    def full_text(self):
+        return self._text.decode('utf-8')
+
+def _timestamp(seconds, separator):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+def render_txt(store):
+    return store.full_text().strip() + '\n'
+
+def render_srt(store):
+    blocks = []
+    for i in range(len(store)):
+        blocks.append(f"{i + 1}\n{_timestamp(store.start[i], ',')} --> {_timestamp(store.end[i], ',')}\n"
+                      f"{store.text(i).strip()}\n")
+    return '\n'.join(blocks)
+
+def render_vtt(store):
+    blocks = ['WEBVTT\n']
+    for i in range(len(store)):
+        blocks.append(f"{_timestamp(store.start[i], '.')} --> {_timestamp(store.end[i], '.')}\n"
+                      f"{store.text(i).strip()}\n")
+    return '\n'.join(blocks)
+
+def render_json(store):
+    models = store.metadata.get('models', [])
+    segments = []
+    for i in range(len(store)):
+        segment = {
+            'start': round(float(store.start[i]), 3),
+            'end': round(float(store.end[i]), 3),
+            'text': store.text(i),
+        }
+        if not np.isnan(store.avg_logprob[i]):
+            segment['avg_logprob'] = round(float(store.avg_logprob[i]), 4)
+        if models and models[store.model[i]]:
+            segment['model'] = models[store.model[i]]
+        segments.append(segment)
+    return json.dumps({'metadata': store.metadata, 'segments': segments}, ensure_ascii=False, indent=2)
+
+RENDERERS = {
+    'txt': render_txt,
+    'srt': render_srt,
+    'vtt': render_vtt,
+    'json': render_json,
+}
+
+def segments_path_for(output_file, output_folder='outputs'):
+    """
+    Ruta del registro de segmentos asociado a un archivo de salida
+    (x_transcription.txt o x_segments.npz -> x_segments.npz)
+    """
+    stem = os.path.splitext(output_file)[0]
+    for suffix in ('_transcription', '_segments'):
+        if stem.endswith(suffix):
+            stem = stem[:-len(suffix)]
+            break
+    return os.path.join(output_folder, f"{stem}_segments.npz")
+
+def render_file(segments_path, fmt, render_dir=RENDER_DIR):
+    """
+    Genera (o reutiliza de la caché) la transcripción en el formato pedido.
+    Devuelve la ruta del archivo generado.
+    """
+    if fmt not in RENDERERS:
+        raise ValueError(f"Formato no soportado: {fmt}")
+    stem = os.path.splitext(os.path.basename(segments_path))[0]
+    if stem.endswith('_segments'):
+        stem = stem[:-len('_segments')]
+    rendered_path = os.path.join(render_dir, f"{stem}.{fmt}")
+
+    with _render_lock:
+        if os.path.exists(rendered_path) and os.path.getmtime(rendered_path) >= os.path.getmtime(segments_path):
+            return rendered_path
+        os.makedirs(render_dir, exist_ok=True)
+        content = RENDERERS[fmt](SegmentStore(segments_path))
+        tmp_path = f"{rendered_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, rendered_path)
+    return rendered_path
@@ -0,0 +1,66 @@
+import os
+import re
+import subprocess
+import sys
+
+# Dependencias pesadas que no deben cargarse al importar la aplicación
+HEAVY_MODULES = ('torch', 'whisper', 'moviepy', 'numpy', 'PIL', 'faster_whisper', 'pywhispercpp', 'onnxruntime')
+
+# Límite orientativo del tiempo de importación de app.py (ms)
+DEFAULT_BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', 1500))
+
+def import_report(module='app', top=15):
+    """
+    Importa el módulo en un proceso limpio con -X importtime y devuelve el tiempo total,
+    los módulos más costosos (tiempo acumulado) y las dependencias pesadas cargadas
+    """
+    # Además de -X importtime se consulta sys.modules al terminar: los hilos de arranque
+    # también pueden importar dependencias
+    code = (f"import sys, {module}; "
+            f"print(','.join(sorted({{m.split('.')[0] for m in sys.modules}} & set({HEAVY_MODULES!r}))))")
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \| *(\S+)', line)
+        if match:
+            entries.append({
+                'module': match.group(3),
+                'self_ms': int(match.group(1)) / 1000,
+                'cumulative_ms': int(match.group(2)) / 1000,
+            })
+
+    total = next((e['cumulative_ms'] for e in entries if e['module'] == module), 0.0)
+    heavy = [name for name in result.stdout.strip().split(',') if name]
+    slowest = sorted(entries, key=lambda e: e['cumulative_ms'], reverse=True)[:top]
+    return {'module': module, 'total_ms': round(total, 1), 'heavy_modules': heavy, 'slowest': slowest}
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mide el tiempo de importación de la aplicación")
+    parser.add_argument('--module', default='app', help="módulo a importar (por defecto app)")
+    parser.add_argument('--top', type=int, default=15, help="número de módulos más lentos a mostrar")
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help="falla si la importación supera este tiempo")
+    args = parser.parse_args()
+
+    report = import_report(args.module, args.top)
+    print(f"Importar {report['module']}: {report['total_ms']:.0f} ms")
+    print(f"{'acumulado (ms)':>15}{'propio (ms)':>13}  módulo")
+    for entry in report['slowest']:
+        print(f"{entry['cumulative_ms']:>15.1f}{entry['self_ms']:>13.1f}  {entry['module']}")
+
+    failed = False
+    if report['heavy_modules']:
+        print(f"✗ Dependencias pesadas cargadas al arrancar: {', '.join(report['heavy_modules'])}")
+        failed = True
+    if report['total_ms'] > args.budget_ms:
+        print(f"✗ La importación supera el límite de {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("✓ Arranque sin dependencias pesadas y dentro del límite")
+    sys.exit(1 if failed else 0)
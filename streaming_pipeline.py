@@ -0,0 +1,374 @@
+import os
+import queue
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+from ffmpeg_utils import get_ffmpeg_exe
+from metrics import FFMPEG_FAILURES, FFMPEG_SECONDS
+from transcription_cache import HASH_CHUNK_SIZE
+
+STREAM_DIR = os.path.join('outputs', '.stream')
+
+# El mismo que parallel_transcriber.SAMPLE_RATE (importarlo cargaría NumPy al arrancar)
+SAMPLE_RATE = 16000
+
+# Contenedores que FFmpeg puede leer de una tubería en el orden en que llegan los bytes.
+# MP4/MOV solo si el índice (moov) va antes de los datos (mdat), como con -movflags faststart
+STREAMABLE_EXTENSIONS = {'mkv', 'webm', 'avi'}
+ISO_BMFF_EXTENSIONS = {'mp4', 'mov', 'm4a', 'm4v'}
+
+# Bloques pendientes de enviar a FFmpeg antes de frenar la subida
+FEED_QUEUE_BLOCKS = 32
+
+# Sin bytes nuevos ni audio decodificado durante este tiempo la subida se da por abandonada
+IDLE_TIMEOUT_SECONDS = float(os.environ.get('UPLOAD_STREAM_IDLE_SECONDS', 300))
+
+class PipelineError(Exception):
+    pass
+
+class UploadStalledError(PipelineError):
+    """
+    La subida dejó de recibir datos: la tubería se cancela en lugar de esperar indefinidamente
+    """
+
+def moov_before_mdat(path, available):
+    """
+    Recorre las cajas de primer nivel de un MP4/MOV parcial. True si moov aparece antes que
+    mdat, False si mdat va primero y None si aún no han llegado bytes suficientes.
+    """
+    position = 0
+    with open(path, 'rb') as f:
+        while position + 8 <= available:
+            f.seek(position)
+            size, box = struct.unpack('>I4s', f.read(8))
+            if box == b'moov':
+                return True
+            if box == b'mdat':
+                return False
+            if size == 1:
+                # Tamaño de 64 bits a continuación de la cabecera
+                if position + 16 > available:
+                    return None
+                size = struct.unpack('>Q', f.read(8))[0]
+            if size < 8:
+                # 0 = la caja llega hasta el final del archivo: no hay moov delante
+                return False
+            position += size
+    return None
+
+def remove_orphaned_streams(stream_dir=STREAM_DIR, max_idle=IDLE_TIMEOUT_SECONDS):
+    """
+    Borra lo que dejaron las tuberías de un proceso que cayó antes de cleanup(): los
+    checkpoints stream_* que no usa ningún trabajo y el PCM que lleva más de max_idle
+    segundos sin escribirse. Devuelve cuántos archivos borró.
+    """
+    from checkpoints import remove_orphaned
+    removed = remove_orphaned('stream_')
+    if os.path.isdir(stream_dir):
+        now = time.time()
+        for name in os.listdir(stream_dir):
+            path = os.path.join(stream_dir, name)
+            try:
+                if now - os.path.getmtime(path) > max_idle:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+    return removed
+
+def is_streamable(filename, path, available):
+    """
+    Indica si el archivo se puede decodificar mientras se sube (None = aún no se sabe)
+    """
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension in STREAMABLE_EXTENSIONS:
+        return True
+    if extension in ISO_BMFF_EXTENSIONS:
+        return moov_before_mdat(path, available)
+    return False
+
+class LiveAudio:
+    """
+    PCM mono float32 a 16 kHz que va creciendo mientras FFmpeg decodifica la subida.
+    Las muestras se guardan en un archivo y las ventanas se leen de él, así que una clase
+    larga no ocupa memoria. iter_segments espera con wait_for a que haya audio suficiente.
+    """
+
+    def __init__(self, path, expected_bytes=None, idle_timeout=IDLE_TIMEOUT_SECONDS):
+        self.id = os.path.splitext(os.path.basename(path))[0]
+        self.path = path
+        self.expected_bytes = expected_bytes
+        self.idle_timeout = idle_timeout
+        self.finished = False
+        self.error = None
+        self.content_hash = None
+        self.waited = 0.0
+        self._samples = 0
+        self._bytes_in = 0
+        self._activity = time.monotonic()
+        self._changed = threading.Condition()
+
+    def __len__(self):
+        return self._samples
+
+    def __getitem__(self, key):
+        import numpy as np
+        start, stop, _ = key.indices(self._samples)
+        return np.fromfile(self.path, dtype=np.float32, count=max(0, stop - start), offset=start * 4)
+
+    def wait_for(self, samples):
+        """
+        Bloquea hasta que haya al menos samples muestras o termine la decodificación.
+        Lanza PipelineError si FFmpeg falló y UploadStalledError si pasan idle_timeout
+        segundos sin bytes nuevos de la subida ni audio decodificado.
+        """
+        start = time.perf_counter()
+        stalled = False
+        with self._changed:
+            while not (self._samples >= samples or self.finished or self.error):
+                remaining = self.idle_timeout - self.idle_seconds()
+                if remaining <= 0:
+                    stalled = True
+                    break
+                self._changed.wait(remaining)
+        self.waited += time.perf_counter() - start
+        if self.error:
+            raise PipelineError(self.error)
+        if stalled:
+            raise UploadStalledError(f"Subida sin actividad durante {self.idle_timeout:.0f}s")
+        return self._samples
+
+    def touch(self):
+        """
+        Registra actividad de la subida (llegó un bloque aunque FFmpeg aún no haya producido audio)
+        """
+        self._activity = time.monotonic()
+
+    def idle_seconds(self):
+        return time.monotonic() - self._activity
+
+    def expected_seconds(self):
+        """
+        Duración estimada a partir de la proporción de la subida ya decodificada
+        """
+        seconds = self._samples / SAMPLE_RATE
+        if self.finished or not self.expected_bytes or not self._bytes_in:
+            return seconds or 1.0
+        return max(seconds, seconds * self.expected_bytes / self._bytes_in) or 1.0
+
+    def to_array(self):
+        """
+        Audio completo como array mapeado en memoria (una vez terminada la decodificación)
+        """
+        import numpy as np
+        self.wait_for(float('inf'))
+        if not self._samples:
+            return np.zeros(0, dtype=np.float32)
+        return np.memmap(self.path, dtype=np.float32, mode='c', shape=(self._samples,))
+
+    def _add(self, samples, bytes_in):
+        with self._changed:
+            self._samples += samples
+            self._bytes_in = bytes_in
+            self._activity = time.monotonic()
+            self._changed.notify_all()
+
+    def _finish(self, error=None):
+        with self._changed:
+            self.error = error
+            self.finished = True
+            self._changed.notify_all()
+
+class UploadPipeline:
+    """
+    Envía a FFmpeg (por stdin) los bytes de una subida a medida que llegan y va guardando
+    el PCM decodificado en un LiveAudio. Empieza por lo que ya está en el archivo parcial y
+    después recibe cada bloque nuevo con feed().
+    """
+
+    def __init__(self, upload, video_path, stream_dir=STREAM_DIR):
+        os.makedirs(stream_dir, exist_ok=True)
+        self.upload = upload
+        # Ruta que tendrá el archivo al finalizar la subida
+        self.video_path = video_path
+        self.audio = LiveAudio(os.path.join(stream_dir, f"{upload.id}.f32"), expected_bytes=upload.size)
+        self._queue = queue.Queue(maxsize=FEED_QUEUE_BLOCKS)
+        self._uploaded = threading.Event()
+        self._aborted = False
+        self._process = None
+        self._stderr = None
+        self._start = None
+        self._fed = 0
+
+    def start(self, offset):
+        """
+        Lanza FFmpeg y le envía primero los offset bytes que ya están en disco
+        """
+        self._stderr = tempfile.TemporaryFile()
+        self._start = time.perf_counter()
+        self._process = subprocess.Popen(
+            [get_ffmpeg_exe(), '-nostdin', '-loglevel', 'error', '-threads', '0', '-i', 'pipe:0',
+             '-vn', '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 'f32le', '-acodec', 'pcm_f32le', 'pipe:1'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self._stderr
+        )
+        threading.Thread(target=self._write_input, args=(self.upload.data_path, offset), daemon=True).start()
+        threading.Thread(target=self._read_output, daemon=True).start()
+        print(f"Transcripción en tubería iniciada para {self.upload.filename}")
+
+    def feed(self, block):
+        if not self._aborted:
+            self.audio.touch()
+            self._queue.put(block)
+
+    def finish(self, video_path, content_hash):
+        """
+        La subida terminó: se cierra la entrada de FFmpeg para que vacíe lo que le queda
+        """
+        self.video_path = video_path
+        self.audio.content_hash = content_hash
+        self._uploaded.set()
+        self._queue.put(None)
+
+    def abort(self):
+        if self._aborted:
+            return
+        self._aborted = True
+        self._uploaded.set()
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+        self._queue.put(None)
+
+    def wait_for_upload(self):
+        """
+        Espera a que termine la subida y devuelve la ruta final del archivo. Lanza
+        UploadStalledError si deja de llegar datos durante idle_timeout segundos.
+        """
+        while not self._uploaded.is_set():
+            remaining = self.audio.idle_timeout - self.audio.idle_seconds()
+            if remaining <= 0:
+                raise UploadStalledError(f"Subida sin actividad durante {self.audio.idle_timeout:.0f}s")
+            self._uploaded.wait(remaining)
+        if self._aborted:
+            raise PipelineError('Subida cancelada')
+        return self.video_path
+
+    @property
+    def aborted(self):
+        return self._aborted
+
+    @property
+    def completed(self):
+        """
+        La subida terminó (finish) y la tubería sigue con el archivo completo
+        """
+        return self._uploaded.is_set() and not self._aborted
+
+    def cleanup(self):
+        """
+        Borra el PCM temporal y el checkpoint de la transcripción en tubería (no se reanuda)
+        """
+        from checkpoints import Checkpoint
+        if os.path.exists(self.audio.path):
+            os.remove(self.audio.path)
+        checkpoint = Checkpoint(f"stream_{self.audio.id}")
+        if checkpoint.acquire():
+            checkpoint.remove()
+
+    def _write_input(self, path, offset):
+        stdin = self._process.stdin
+        try:
+            # Lo recibido antes de decidir que el archivo admite la tubería
+            with open(path, 'rb') as f:
+                remaining = offset
+                while remaining > 0:
+                    block = f.read(min(HASH_CHUNK_SIZE, remaining))
+                    if not block:
+                        break
+                    stdin.write(block)
+                    self._fed += len(block)
+                    remaining -= len(block)
+            while True:
+                block = self._queue.get()
+                if block is None:
+                    break
+                stdin.write(block)
+                self._fed += len(block)
+        except (BrokenPipeError, OSError):
+            # FFmpeg terminó antes de tiempo; el lector informa del error. Se sigue vaciando
+            # la cola para no bloquear la subida
+            while self._queue.get() is not None:
+                pass
+        finally:
+            try:
+                stdin.close()
+            except OSError:
+                pass
+
+    def _read_output(self):
+        stdout = self._process.stdout
+        pending = b''
+        with open(self.audio.path, 'wb') as out:
+            for block in iter(lambda: stdout.read(HASH_CHUNK_SIZE), b''):
+                block = pending + block
+                usable = len(block) - len(block) % 4
+                pending = block[usable:]
+                out.write(block[:usable])
+                out.flush()
+                self.audio._add(usable // 4, self._fed)
+        returncode = self._process.wait()
+        FFMPEG_SECONDS.observe(time.perf_counter() - self._start, operation='stream_pcm')
+        error = None
+        if self._aborted:
+            error = 'Subida cancelada'
+        elif returncode != 0:
+            FFMPEG_FAILURES.inc(operation='stream_pcm')
+            self._stderr.seek(0)
+            error = f"FFmpeg error: {self._stderr.read().decode(errors='ignore').strip()}"
+        self._stderr.close()
+        self.audio._finish(error)
+
+def process_upload_stream(pipeline, generate_summary_flag=True, model_size='base', progress_callback=None,
+                          on_segment=None, refine_model=None, backend=None):
+    """
+    Trabajo de transcripción en tubería: transcribe el audio a medida que se sube.
+    Si FFmpeg no puede decodificar el flujo, espera al final de la subida y procesa el
+    archivo completo por el camino normal.
+    """
+    from transcriber import process_video
+    emitted = {'end': 0.0}
+
+    def emit(seg):
+        emitted['end'] = max(emitted['end'], seg['end'])
+        if on_segment is not None:
+            on_segment(seg)
+
+    try:
+        return process_video(pipeline.video_path, generate_summary_flag, model_size,
+                             progress_callback=progress_callback, on_segment=emit, refine_model=refine_model,
+                             backend=backend, live_audio=pipeline.audio)
+    except PipelineError as e:
+        if pipeline.aborted:
+            raise
+        try:
+            if isinstance(e, UploadStalledError):
+                raise
+            print(f"La tubería falló ({e}); se procesa el archivo al terminar la subida")
+            video_path = pipeline.wait_for_upload()
+        except UploadStalledError as stalled:
+            # Subida abandonada: se detiene FFmpeg y el trabajo termina con error
+            print(f"{stalled}; se cancela la transcripción en tubería")
+            pipeline.abort()
+            raise
+
+        def emit_new(seg):
+            # Los segmentos ya enviados durante la tubería no se repiten
+            if seg['end'] > emitted['end']:
+                emit(seg)
+
+        return process_video(video_path, generate_summary_flag, model_size, progress_callback=progress_callback,
+                             content_hash=pipeline.audio.content_hash, on_segment=emit_new,
+                             refine_model=refine_model, backend=backend)
+    finally:
+        pipeline.cleanup()
@@ -1,61 +1,86 @@
-import re
-from collections import Counter
+from analysis import AnalyzedDocument, analyze, NUM_KEYWORD_STOP_WORDS, NUM_STOP_WORDS
 
-def summarize_text(text, percentage=30):
+SUMMARY_METHODS = ('frequency', 'textrank')
+
+def _frequency_scores(document):
+    """
+    Suma de las frecuencias en el texto de las palabras de cada oración (sin stop words)
+    """
+    import numpy as np
+    weights = document.counts.astype(np.float64)
+    weights[:NUM_STOP_WORDS] = 0.0
+    return np.bincount(document.sentence_ids, weights=weights[document.term_ids],
+                       minlength=len(document.sentences))
+
+def _textrank_scores(document, damping=0.85, max_iterations=50, tolerance=1e-6):
+    """
+    TextRank sobre el grafo de similitud coseno TF-IDF entre oraciones. La matriz de
+    similitud (n x n) no se construye: cada iteración calcula X·(Xᵀ·r) con la matriz
+    dispersa oración-término, así que el coste es lineal en el número de palabras.
+    """
+    import numpy as np
+    n = len(document.sentences)
+    vocabulary_size = len(document.terms)
+    content = document.term_ids >= NUM_STOP_WORDS
+    keys, tf = np.unique(document.sentence_ids[content] * vocabulary_size + document.term_ids[content],
+                         return_counts=True)
+    rows = keys // vocabulary_size
+    cols = keys % vocabulary_size
+    document_freq = np.bincount(cols, minlength=vocabulary_size)
+    values = tf * np.log(n / document_freq[cols])
+    # Filas unitarias: el producto escalar entre oraciones es su similitud coseno
+    norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=n))
+    values = values / np.where(norms > 0, norms, 1.0)[rows]
+    self_similarity = np.bincount(rows, weights=values ** 2, minlength=n)
+
+    def similarity(vector):
+        projected = np.bincount(cols, weights=values * vector[rows], minlength=vocabulary_size)
+        return np.bincount(rows, weights=values * projected[cols], minlength=n) - self_similarity * vector
+
+    degree = similarity(np.ones(n))
+    degree[degree <= 0] = 1.0
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iterations):
+        updated = (1 - damping) / n + damping * similarity(rank / degree)
+        converged = np.abs(updated - rank).sum() < tolerance
+        rank = updated
+        if converged:
+            break
+    return rank
+
+def summarize_text(text, percentage=30, method='frequency'):
     """
     Genera un resumen del texto usando extracción de oraciones más importantes
     percentage: porcentaje del texto original a mantener (por defecto 30%)
+    method: 'frequency' (frecuencia de las palabras de cada oración) o 'textrank'
+    (centralidad en el grafo de similitud entre oraciones)
+    text también puede ser un AnalyzedDocument; el análisis y la puntuación se reutilizan
+    entre llamadas con el mismo texto
     """
-    if not text or len(text.strip()) < 100:
-        return text
+    if method not in SUMMARY_METHODS:
+        raise ValueError(f"Método de resumen no soportado: {method}")
+    raw_text = text.text if isinstance(text, AnalyzedDocument) else text
+    if not raw_text or len(raw_text.strip()) < 100:
+        return raw_text
     
-    # Dividir en oraciones
-    sentences = re.split(r'[.!?]+', text)
-    sentences = [s.strip() for s in sentences if s.strip()]
+    document = analyze(text)
+    sentences = document.sentences
     
     if len(sentences) < 3:
-        return text
-    
-    # Calcular puntuación de oraciones
-    words = re.findall(r'\b\w+\b', text.lower())
-    word_freq = Counter(words)
-    
-    # Eliminar palabras comunes (stop words en español)
-    stop_words = {
-        'el', 'la', 'de', 'que', 'y', 'a', 'en', 'un', 'es', 'se', 'no', 'por',
-        'con', 'su', 'para', 'una', 'o', 'del', 'al', 'lo', 'como', 'más',
-        'pero', 'sus', 'le', 'ya', 'o', 'este', 'sí', 'porque', 'esta', 'son',
-        'entre', 'está', 'cuando', 'muy', 'sin', 'sobre', 'ser', 'tiene',
-        'también', 'me', 'hasta', 'hay', 'donde', 'han', 'quien', 'están',
-        'estado', 'desde', 'todo', 'nos', 'durante', 'estados', 'todos',
-        'uno', 'les', 'ni', 'contra', 'otros', 'fueron', 'ese', 'eso', 'había',
-        'ante', 'ellos', 'era', 'éramos', 'eran', 'eras', 'eres', 'esa', 'esas',
-        'este', 'estemos', 'esto', 'estos', 'estoy', 'estuvo', 'estuve',
-        'estuviera', 'estuviese', 'estuviesen', 'estuviesemos', 'esté',
-        'estéis', 'estén', 'estés', 'estábamos', 'estabais', 'estaban',
-        'estabas', 'estaba', 'estada', 'estadas', 'estado', 'estados',
-        'estatua'
-    }
+        return raw_text
     
-    for word in stop_words:
-        word_freq.pop(word, None)
+    # Orden de las oraciones por puntuación (a igual puntuación, la que aparece antes)
+    import numpy as np
+    score = _textrank_scores if method == 'textrank' else _frequency_scores
+    ranking = document.memo(('ranking', method),
+                            lambda: np.argsort(-score(document), kind='stable'))
     
-    # Puntuación de oraciones
-    sentence_scores = {}
-    for i, sentence in enumerate(sentences):
-        words_in_sentence = re.findall(r'\b\w+\b', sentence.lower())
-        score = sum(word_freq.get(word, 0) for word in words_in_sentence)
-        sentence_scores[i] = score
-    
-    # Seleccionar top oraciones
+    # Seleccionar top oraciones en su orden original
     num_sentences = max(1, int(len(sentences) * percentage / 100))
-    top_sentences = sorted(sentence_scores.items(), key=lambda x: x[1], reverse=True)[:num_sentences]
-    
-    # Mantener orden original
-    top_sentences = sorted(top_sentences, key=lambda x: x[0])
+    top_sentences = np.sort(ranking[:num_sentences])
     
     # Reconstruir resumen
-    summary = '. '.join([sentences[i] for i, _ in top_sentences])
+    summary = '. '.join([sentences[i] for i in top_sentences])
     
     if summary and not summary.endswith('.'):
         summary += '.'
@@ -64,42 +89,46 @@ def summarize_text(text, percentage=30):
 
 def extract_keywords(text, num_keywords=10):
     """
-    Extrae las palabras clave más importantes del texto
+    Extrae las palabras clave más importantes del texto (o de un AnalyzedDocument)
     """
-    words = re.findall(r'\b\w+\b', text.lower())
-    
-    stop_words = {
-        'el', 'la', 'de', 'que', 'y', 'a', 'en', 'un', 'es', 'se', 'no', 'por',
-        'con', 'su', 'para', 'una', 'o', 'del', 'al', 'lo', 'como', 'más',
-        'pero', 'sus', 'le', 'ya', 'este', 'sí', 'porque', 'esta', 'son',
-        'entre', 'está', 'cuando', 'muy', 'sin', 'sobre', 'ser', 'tiene',
-        'también', 'me', 'hasta', 'hay', 'donde', 'han', 'quien', 'están'
-    }
-    
-    words = [w for w in words if w not in stop_words and len(w) > 3]
-    word_freq = Counter(words)
-    
-    keywords = word_freq.most_common(num_keywords)
-    return [word for word, _ in keywords]
+    document = analyze(text)
+    return document.memo('keywords', lambda: _rank_keywords(document))[:num_keywords]
+
+def _rank_keywords(document):
+    """
+    Todas las palabras candidatas: más frecuentes primero y, a igual frecuencia, la que aparece antes
+    """
+    import numpy as np
+    lengths = np.fromiter(map(len, document.terms), dtype=np.int64, count=len(document.terms))
+    candidates = np.flatnonzero((document.counts > 0) & (lengths > 3))
+    candidates = candidates[candidates >= NUM_KEYWORD_STOP_WORDS]
+    order = np.lexsort((document.first_seen[candidates], -document.counts[candidates]))
+    return [document.terms[i] for i in candidates[order]]
 
 def create_outline(text):
     """
     Crea un esquema o outline del texto basado en palabras clave
     """
-    keywords = extract_keywords(text, num_keywords=15)
+    document = analyze(text)
+    return _copy_outline(document.memo('outline', lambda: _build_outline(document)))
+
+def _build_outline(document):
+    keywords = extract_keywords(document, num_keywords=15)
     
-    # Agrupar párrafos por palabra clave
-    paragraphs = text.split('\n\n')
+    # Agrupar párrafos por palabra clave (cada párrafo se pasa a minúsculas una sola vez)
+    paragraphs = document.paragraphs
+    lowered = document.lowered_paragraphs
     outline = {}
     
     for keyword in keywords:
-        outline[keyword] = []
-        for para in paragraphs:
-            if keyword.lower() in para.lower():
-                outline[keyword].append(para[:100] + '...')
+        outline[keyword] = [paragraphs[i][:100] + '...' for i, para in enumerate(lowered) if keyword in para]
     
     return outline
 
+def _copy_outline(outline):
+    # El esquema guardado en el documento no se modifica desde fuera
+    return {keyword: list(paragraphs) for keyword, paragraphs in outline.items()}
+
 if __name__ == "__main__":
     sample_text = """
     Python es un lenguaje de programación versátil y poderoso. Se utiliza en una variedad de campos como 
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+import backends
+from adaptive_transcriber import MAX_WINDOW_SECONDS, is_weak, refine_segments, weak_windows
+from parallel_transcriber import SAMPLE_RATE
+
+def seg(start, end, avg_logprob=-0.2, compression_ratio=1.2, no_speech_prob=0.01, text=None):
+    return {'start': start, 'end': end, 'text': text or f' {start:g}-{end:g}', 'avg_logprob': avg_logprob,
+            'compression_ratio': compression_ratio, 'no_speech_prob': no_speech_prob, 'words': []}
+
+def weak(start, end, **kwargs):
+    return seg(start, end, avg_logprob=-1.5, **kwargs)
+
+def test_low_logprob_or_repetitive_text_is_weak():
+    assert is_weak(weak(0, 1))
+    assert is_weak(seg(0, 1, compression_ratio=3.0))
+    assert not is_weak(seg(0, 1))
+
+def test_silence_is_never_weak():
+    assert not is_weak(weak(0, 1, no_speech_prob=0.9))
+
+def test_missing_confidence_is_not_weak():
+    assert not is_weak({'start': 0, 'end': 1, 'text': ' x'})
+
+def test_thresholds_can_be_overridden():
+    assert not is_weak(weak(0, 1), logprob_threshold=-2.0)
+
+def test_weak_windows_pad_and_clamp_to_the_audio():
+    assert weak_windows([weak(0.2, 2.0), seg(2.0, 5.0), weak(8.0, 9.8)], duration=10.0) == [(0.0, 2.5), (7.5, 10.0)]
+
+def test_weak_windows_merge_close_zones():
+    windows = weak_windows([weak(1.0, 2.0), seg(2.0, 3.0), weak(3.0, 4.0)], duration=60.0)
+    assert windows == [(0.5, 4.5)]
+
+def test_weak_windows_do_not_grow_past_the_maximum():
+    segments = [weak(float(i), float(i + 1)) for i in range(int(MAX_WINDOW_SECONDS) + 10)]
+    windows = weak_windows(segments, duration=120.0)
+    assert len(windows) == 2
+    assert all(end - start <= MAX_WINDOW_SECONDS for start, end in windows)
+
+def test_no_weak_segments_no_windows():
+    assert weak_windows([seg(0, 1), seg(1, 2)], duration=2.0) == []
+
+class FakeEngine:
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, model_size, language, initial_prompt, device):
+        self.calls.append((len(audio) / SAMPLE_RATE, model_size, initial_prompt))
+        return [seg(0.0, len(audio) / SAMPLE_RATE, text=' refinado')]
+
+@pytest.fixture
+def engine(monkeypatch):
+    fake = FakeEngine()
+    monkeypatch.setattr(backends, 'get_backend', lambda name=None: fake)
+    return fake
+
+def test_refine_replaces_only_the_weak_zone(engine):
+    audio = np.zeros(10 * SAMPLE_RATE, dtype=np.float32)
+    segments = [seg(0.0, 2.0, text=' bien'), weak(3.0, 5.0), seg(6.0, 10.0, text=' también')]
+    refined, stats = refine_segments(audio, segments, 'tiny', 'small')
+
+    assert [s['text'] for s in refined] == [' bien', ' refinado', ' también']
+    assert [s['model'] for s in refined] == ['tiny', 'small', 'tiny']
+    # Se decodifica la zona débil con su margen y el texto anterior como contexto
+    assert engine.calls == [(3.0, 'small', ' bien')]
+    assert (refined[1]['start'], refined[1]['end']) == (2.5, 5.5)
+    assert stats['weak_windows'] == 1
+    assert stats['refined_segments'] == 1
+    assert 0 < stats['compute_saved'] < 1
+
+def test_refine_without_weak_segments_does_nothing(engine):
+    audio = np.zeros(4 * SAMPLE_RATE, dtype=np.float32)
+    refined, stats = refine_segments(audio, [seg(0.0, 4.0)], 'tiny', 'small')
+    assert engine.calls == []
+    assert refined[0]['model'] == 'tiny'
+    assert stats['redecoded_seconds'] == 0
@@ -0,0 +1,105 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import checkpoints
+from checkpoints import Checkpoint, remove_orphaned
+
+def seg(i):
+    return {'start': float(i), 'end': float(i + 1), 'text': f' frase {i}', 'avg_logprob': -0.3,
+            'no_speech_prob': 0.1, 'compression_ratio': 1.2, 'words': [{'word': 'x', 'start': 0, 'end': 1}]}
+
+def test_segments_survive_an_interrupted_run(tmp_path):
+    first = Checkpoint('clase', str(tmp_path))
+    assert first.acquire()
+    first.open([])
+    first.append(seg(0))
+    first.append(seg(1))
+    first.close()
+
+    second = Checkpoint('clase', str(tmp_path))
+    assert second.acquire()
+    done = second.load()
+    assert [s['text'] for s in done] == [' frase 0', ' frase 1']
+    # Solo se guardan los campos necesarios para reanudar
+    assert 'words' not in done[0]
+    assert second.resume_offset(done) == 2.0
+    second.close()
+
+def test_a_half_written_last_line_is_ignored(tmp_path):
+    checkpoint = Checkpoint('clase', str(tmp_path))
+    assert checkpoint.acquire()
+    checkpoint.open([seg(0)])
+    checkpoint.close()
+    with open(checkpoint.path, 'a', encoding='utf-8') as f:
+        f.write('{"start": 1.0, "end"')
+    assert checkpoint.acquire()
+    assert len(checkpoint.load()) == 1
+    # Al reabrir se reescribe solo con los segmentos válidos
+    checkpoint.open(checkpoint.load())
+    checkpoint.append(seg(1))
+    checkpoint.close()
+    assert checkpoint.acquire()
+    assert [s['end'] for s in checkpoint.load()] == [1.0, 2.0]
+    checkpoint.close()
+
+def test_resume_offset_without_segments_is_zero(tmp_path):
+    assert Checkpoint('nada', str(tmp_path)).resume_offset([]) == 0.0
+
+def test_only_one_job_owns_a_checkpoint(tmp_path):
+    owner = Checkpoint('clase', str(tmp_path))
+    assert owner.acquire()
+    owner.open([seg(0)])
+
+    other = Checkpoint('clase', str(tmp_path))
+    assert not other.acquire()
+    # El que no lo tiene ni lo lee ni lo modifica
+    assert other.load() == []
+    other.open([])
+    other.append(seg(5))
+    other.remove()
+    assert os.path.exists(owner.path)
+
+    owner.append(seg(1))
+    owner.close()
+    assert other.acquire()
+    assert len(other.load()) == 2
+    other.close()
+
+@pytest.mark.skipif(checkpoints.fcntl is None, reason="el bloqueo entre procesos usa flock")
+def test_a_checkpoint_is_locked_for_other_processes(tmp_path):
+    owner = Checkpoint('clase', str(tmp_path))
+    assert owner.acquire()
+    code = ("import sys; sys.path.insert(0, sys.argv[1]); from checkpoints import Checkpoint; "
+            "print(Checkpoint('clase', sys.argv[2]).acquire())")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', code, root, str(tmp_path)], capture_output=True, text=True)
+    assert result.stdout.strip() == 'False'
+    owner.close()
+
+def test_remove_deletes_the_owned_checkpoint(tmp_path):
+    checkpoint = Checkpoint('clase', str(tmp_path))
+    assert checkpoint.acquire()
+    checkpoint.open([seg(0)])
+    checkpoint.remove()
+    assert not os.path.exists(checkpoint.path)
+    assert Checkpoint('clase', str(tmp_path)).acquire()
+
+def test_remove_orphaned_skips_checkpoints_in_use(tmp_path):
+    live = Checkpoint('stream_vivo', str(tmp_path))
+    assert live.acquire()
+    live.open([seg(0)])
+    for key in ('stream_muerto', 'contenido'):
+        dead = Checkpoint(key, str(tmp_path))
+        assert dead.acquire()
+        dead.open([seg(0)])
+        dead.close()
+
+    assert remove_orphaned('stream_', str(tmp_path)) == 1
+    assert sorted(os.listdir(tmp_path)) == ['contenido.jsonl', 'stream_vivo.jsonl']
+    live.remove()
+
+def test_remove_orphaned_without_directory(tmp_path):
+    assert remove_orphaned('stream_', str(tmp_path / 'no-existe')) == 0
@@ -0,0 +1,167 @@
+import hashlib
+import io
+import os
+import time
+
+import pytest
+
+from chunked_uploads import ChunkedUploadManager, UploadError
+
+DATA = os.urandom(2 * 1024 * 1024 + 123)
+
+class FakePipeline:
+    def __init__(self):
+        self.fed = b''
+        self.finished = None
+        self.aborted = False
+
+    @property
+    def completed(self):
+        return self.finished is not None
+
+    def feed(self, block):
+        self.fed += block
+
+    def finish(self, path, content_hash):
+        self.finished = (path, content_hash)
+
+    def abort(self):
+        self.aborted = True
+
+class BrokenStream:
+    """
+    Entrega unos bytes y luego se corta, como una conexión caída a mitad de fragmento
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.sent = False
+
+    def read(self, size):
+        if self.sent:
+            raise OSError('conexión perdida')
+        self.sent = True
+        return self.data
+
+@pytest.fixture
+def manager(tmp_path):
+    return ChunkedUploadManager(upload_dir=str(tmp_path), partial_dir=str(tmp_path / '.partial'))
+
+def upload_all(manager, upload, data, chunk=700 * 1024):
+    offset = 0
+    while offset < len(data):
+        offset = manager.append(upload, offset, io.BytesIO(data[offset:offset + chunk]))
+    return offset
+
+def test_chunks_are_assembled_and_hashed(manager, tmp_path):
+    upload = manager.create('clase.mkv', size=len(DATA))
+    assert upload_all(manager, upload, DATA) == len(DATA)
+    path, content_hash = manager.finalize(upload)
+
+    assert path == os.path.join(str(tmp_path), 'clase.mkv')
+    assert open(path, 'rb').read() == DATA
+    assert content_hash == hashlib.sha256(DATA).hexdigest()
+    assert open(path + '.sha256').read() == content_hash
+    # La subida deja de existir y no quedan parciales
+    assert manager.get(upload.id) is None
+    assert os.listdir(tmp_path / '.partial') == []
+
+def test_wrong_offset_is_rejected_with_the_current_offset(manager):
+    upload = manager.create('clase.mkv', size=len(DATA))
+    manager.append(upload, 0, io.BytesIO(DATA[:1000]))
+    with pytest.raises(UploadError) as error:
+        manager.append(upload, 0, io.BytesIO(DATA[:1000]))
+    assert (error.value.status, error.value.offset) == (409, 1000)
+
+def test_concurrent_chunk_is_rejected(manager):
+    upload = manager.create('clase.mkv', size=len(DATA))
+    with upload.lock:
+        with pytest.raises(UploadError) as error:
+            manager.append(upload, 0, io.BytesIO(DATA[:10]))
+    assert error.value.status == 409
+
+def test_bytes_past_the_declared_size_are_rejected(manager):
+    upload = manager.create('clase.mkv', size=100)
+    with pytest.raises(UploadError) as error:
+        manager.append(upload, 0, io.BytesIO(DATA[:200]), length=200)
+    assert error.value.status == 413
+    # Sin Content-Length se corta al leer
+    with pytest.raises(UploadError) as error:
+        manager.append(upload, 0, io.BytesIO(DATA[:200]))
+    assert error.value.status == 413
+
+def test_declared_size_over_the_limit(tmp_path):
+    manager = ChunkedUploadManager(upload_dir=str(tmp_path), partial_dir=str(tmp_path / '.partial'), max_bytes=10)
+    with pytest.raises(UploadError) as error:
+        manager.create('clase.mkv', size=11)
+    assert error.value.status == 413
+    with pytest.raises(UploadError):
+        manager.create('clase.mkv', size=-1)
+
+def test_interrupted_chunk_keeps_the_received_bytes(manager):
+    upload = manager.create('clase.mkv', size=len(DATA))
+    with pytest.raises(OSError):
+        manager.append(upload, 0, BrokenStream(DATA[:5000]))
+    assert upload.offset == 5000
+    assert manager.append(upload, 5000, io.BytesIO(DATA[5000:])) == len(DATA)
+    assert manager.finalize(upload)[1] == hashlib.sha256(DATA).hexdigest()
+
+def test_upload_resumes_after_a_restart(manager, tmp_path):
+    upload = manager.create('clase.mkv', size=len(DATA))
+    manager.append(upload, 0, io.BytesIO(DATA[:1_000_000]))
+
+    restarted = ChunkedUploadManager(upload_dir=str(tmp_path), partial_dir=str(tmp_path / '.partial'))
+    resumed = restarted.get(upload.id)
+    assert (resumed.filename, resumed.size, resumed.offset) == ('clase.mkv', len(DATA), 1_000_000)
+    restarted.append(resumed, 1_000_000, io.BytesIO(DATA[1_000_000:]))
+    # El hash se recalcula a partir de lo que ya estaba en disco
+    assert restarted.finalize(resumed)[1] == hashlib.sha256(DATA).hexdigest()
+
+def test_get_rejects_unknown_and_unsafe_ids(manager):
+    assert manager.get('no-existe') is None
+    assert manager.get('../../etc') is None
+    assert manager.get('') is None
+
+def test_finalize_checks_completeness_and_client_hash(manager):
+    upload = manager.create('clase.mkv', size=len(DATA))
+    manager.append(upload, 0, io.BytesIO(DATA[:10]))
+    with pytest.raises(UploadError) as error:
+        manager.finalize(upload)
+    assert (error.value.status, error.value.offset) == (409, 10)
+
+    manager.append(upload, 10, io.BytesIO(DATA[10:]))
+    with pytest.raises(UploadError) as error:
+        manager.finalize(upload, expected_hash='0' * 64)
+    assert error.value.status == 422
+    assert manager.finalize(upload, expected_hash=hashlib.sha256(DATA).hexdigest().upper())
+
+def test_blocks_are_fed_to_the_pipeline(manager):
+    upload = manager.create('clase.mkv', size=len(DATA))
+    upload.pipeline = FakePipeline()
+    upload_all(manager, upload, DATA)
+    path, content_hash = manager.finalize(upload)
+    assert upload.pipeline.fed == DATA
+    assert upload.pipeline.finished == (path, content_hash)
+    assert not upload.pipeline.aborted
+
+def test_abort_removes_the_upload_and_stops_the_pipeline(manager, tmp_path):
+    upload = manager.create('clase.mkv', size=len(DATA))
+    upload.pipeline = FakePipeline()
+    manager.append(upload, 0, io.BytesIO(DATA[:10]))
+    manager.abort(upload)
+    assert upload.pipeline.aborted
+    assert manager.get(upload.id) is None
+    assert os.listdir(tmp_path / '.partial') == []
+
+def test_cleanup_removes_stale_uploads_and_aborts_their_pipeline(manager):
+    stale = manager.create('viejo.mkv', size=len(DATA))
+    stale.pipeline = FakePipeline()
+    fresh = manager.create('nuevo.mkv', size=len(DATA))
+    old = time.time() - manager.ttl_seconds - 60
+    for path in (stale.data_path, stale.meta_path):
+        os.utime(path, (old, old))
+
+    assert manager.cleanup() == 1
+    assert stale.pipeline.aborted
+    assert manager.get(stale.id) is None
+    assert manager.get(fresh.id) is fresh
@@ -0,0 +1,112 @@
+import threading
+import time
+
+from model_registry import ModelRegistry
+
+class FakeModel:
+    def __init__(self, size_mb):
+        self.size_mb = size_mb
+
+def make_registry(budget_mb=1000, replicas=1, delay=0.0):
+    loads = []
+
+    def loader(model_size, device, precision):
+        loads.append((model_size, device, precision))
+        time.sleep(delay)
+        return FakeModel({'tiny': 100, 'base': 200, 'small': 500}[model_size])
+
+    registry = ModelRegistry(memory_budget_mb=budget_mb, loader=loader, replicas=replicas)
+    return registry, loads
+
+def patch_sizes(monkeypatch):
+    monkeypatch.setattr('model_registry.estimate_model_size_mb', lambda model: model.size_mb)
+
+def test_loads_each_model_once(monkeypatch):
+    patch_sizes(monkeypatch)
+    registry, loads = make_registry()
+    first = registry.get_model('base', device='cpu', precision='fp32')
+    assert registry.get_model('base', device='cpu', precision='fp32') is first
+    assert loads == [('base', 'cpu', 'fp32')]
+    stats = registry.stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+def test_precision_is_part_of_the_key(monkeypatch):
+    patch_sizes(monkeypatch)
+    registry, loads = make_registry()
+    registry.get_model('base', device='cpu', precision='fp32')
+    registry.get_model('base', device='cpu', precision='int8')
+    assert len(loads) == 2
+
+def test_evicts_least_recently_used_over_budget(monkeypatch):
+    patch_sizes(monkeypatch)
+    registry, _ = make_registry(budget_mb=650)
+    registry.get_model('tiny', device='cpu', precision='fp32')
+    registry.get_model('base', device='cpu', precision='fp32')
+    # tiny pasa a ser el más reciente: al cargar small sale base
+    registry.get_model('tiny', device='cpu', precision='fp32')
+    registry.get_model('small', device='cpu', precision='fp32')
+    resident = {m['model_size'] for m in registry.stats()['models']}
+    assert resident == {'tiny', 'small'}
+    assert registry.evictions == 1
+
+def test_never_evicts_the_model_just_loaded(monkeypatch):
+    patch_sizes(monkeypatch)
+    registry, _ = make_registry(budget_mb=50)
+    registry.get_model('small', device='cpu', precision='fp32')
+    assert [m['model_size'] for m in registry.stats()['models']] == ['small']
+
+def test_concurrent_requests_share_one_load(monkeypatch):
+    patch_sizes(monkeypatch)
+    registry, loads = make_registry(delay=0.05)
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(registry.get_model('base', 'cpu', 'fp32')))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1
+    assert all(model is models[0] for model in models)
+
+def run_concurrently(registry, jobs, hold=0.1):
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def job():
+        with registry.use_model('base', device='cpu', precision='fp32') as model:
+            with lock:
+                active.append(model)
+                peak.append(len(active))
+                # Ningún otro trabajo usa la misma copia a la vez
+                assert sum(m is model for m in active) == 1
+            time.sleep(hold)
+            with lock:
+                active.remove(model)
+
+    threads = [threading.Thread(target=job) for _ in range(jobs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return max(peak)
+
+def test_use_model_is_exclusive_with_one_replica(monkeypatch):
+    patch_sizes(monkeypatch)
+    registry, loads = make_registry(replicas=1)
+    assert run_concurrently(registry, 3) == 1
+    assert len(loads) == 1
+
+def test_use_model_loads_replicas_for_concurrent_jobs(monkeypatch):
+    patch_sizes(monkeypatch)
+    registry, loads = make_registry(replicas=2)
+    assert run_concurrently(registry, 4) == 2
+    assert len(loads) == 2
+    assert registry.stats()['models'][0]['replicas'] == 2
+    assert registry.stats()['resident_models_mb'] == 400
+
+def test_replicas_respect_the_memory_budget(monkeypatch):
+    patch_sizes(monkeypatch)
+    registry, loads = make_registry(budget_mb=300, replicas=3)
+    assert run_concurrently(registry, 3) == 1
+    assert len(loads) == 1
@@ -0,0 +1,60 @@
+import pytest
+
+from parallel_transcriber import SAMPLE_RATE, offset_segment, split_windows, stitch_segments
+
+def word(text, start, end):
+    return {'word': text, 'start': start, 'end': end}
+
+def segment(*words):
+    return {'start': words[0]['start'], 'end': words[-1]['end'], 'text': ''.join(w['word'] for w in words),
+            'avg_logprob': -0.2, 'no_speech_prob': 0.01, 'compression_ratio': 1.1, 'words': list(words)}
+
+def seconds(*pairs):
+    return [(int(start * SAMPLE_RATE), int(end * SAMPLE_RATE)) for start, end in pairs]
+
+def test_split_windows_overlap_and_cover_the_audio():
+    windows = split_windows(25 * SAMPLE_RATE, chunk_seconds=10, overlap_seconds=2)
+    assert windows == seconds((0, 10), (8, 18), (16, 25))
+
+def test_split_windows_short_audio_is_one_window():
+    assert split_windows(3 * SAMPLE_RATE, chunk_seconds=10, overlap_seconds=2) == seconds((0, 3))
+
+def test_split_windows_rejects_overlap_larger_than_chunk():
+    with pytest.raises(ValueError):
+        split_windows(SAMPLE_RATE * 60, chunk_seconds=5, overlap_seconds=5)
+
+def test_offset_segment_shifts_segment_and_words():
+    seg = offset_segment(segment(word(' hola', 1.0, 1.5)), 300.0)
+    assert (seg['start'], seg['end']) == (301.0, 301.5)
+    assert seg['words'] == [word(' hola', 301.0, 301.5)]
+
+def test_stitch_cuts_each_overlap_at_its_midpoint():
+    windows = seconds((0, 10), (8, 18))
+    first = [segment(word(' uno', 7.0, 7.5), word(' dos', 8.6, 8.9), word(' tres', 9.1, 9.6))]
+    second = [segment(word(' dos', 8.6, 8.9), word(' tres', 9.1, 9.6), word(' cuatro', 12.0, 12.4))]
+    stitched = stitch_segments([first, second], windows)
+    # El corte está en 9 s: "dos" sale de la primera ventana y "tres" de la segunda
+    assert [seg['text'] for seg in stitched] == [' uno dos', ' tres cuatro']
+    assert stitched[0]['end'] == 8.9
+    assert stitched[1]['start'] == 9.1
+
+def test_stitch_drops_words_repeated_across_the_cut():
+    windows = seconds((0, 10), (8, 18))
+    # La misma palabra reconocida a ambos lados del corte, con tiempos algo distintos
+    first = [segment(word(' hola', 8.5, 8.95), word(' Mundo', 8.95, 9.02))]
+    second = [segment(word(' mundo,', 8.99, 9.3), word(' adiós', 10.0, 10.4))]
+    stitched = stitch_segments([first, second], windows)
+    assert ''.join(seg['text'] for seg in stitched) == ' hola Mundo adiós'
+
+def test_stitch_keeps_segments_without_words_by_their_center():
+    windows = seconds((0, 10), (8, 18))
+    first = [{'start': 7.0, 'end': 8.5, 'text': ' antes', 'words': []},
+             {'start': 8.8, 'end': 9.6, 'text': ' solapado', 'words': []}]
+    second = [{'start': 8.8, 'end': 9.6, 'text': ' solapado', 'words': []},
+              {'start': 12.0, 'end': 13.0, 'text': ' después', 'words': []}]
+    stitched = stitch_segments([first, second], windows)
+    assert [seg['text'] for seg in stitched] == [' antes', ' solapado', ' después']
+
+def test_stitch_single_window_is_unchanged():
+    segments = [segment(word(' a', 0.0, 0.5)), segment(word(' b', 1.0, 1.5))]
+    assert stitch_segments([segments], seconds((0, 5))) == segments
@@ -0,0 +1,125 @@
+import math
+import os
+
+import pytest
+
+from search_index import BM25_B, BM25_K1, SearchIndex, tokenize
+
+def transcript(source, text, summary=''):
+    content = f"TRANSCRIPCIÓN DE LA CLASE\n{'=' * 80}\n\nArchivo: {source}\n\n"
+    if summary:
+        content += f"RESUMEN\n{'-' * 80}\n{summary}\n\n"
+    return content + f"TRANSCRIPCIÓN COMPLETA\n{'-' * 80}\n{text}\n"
+
+@pytest.fixture
+def outputs(tmp_path):
+    folder = tmp_path / 'outputs'
+    folder.mkdir()
+    return folder
+
+@pytest.fixture
+def index(outputs):
+    return SearchIndex(path=str(outputs / '.index' / 'search.db'), output_folder=str(outputs))
+
+def write(outputs, name, text, source='clase.mp4', summary='', mtime=None):
+    path = outputs / name
+    path.write_text(transcript(source, text, summary), encoding='utf-8')
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return name
+
+def add(index, outputs, name, text, segments=None, **kwargs):
+    write(outputs, name, text, **kwargs)
+    index.add_transcript(name, segments)
+    return name
+
+def test_tokenize_lowercases_and_drops_stop_words():
+    assert tokenize('La Red neuronal y el algoritmo') == ['red', 'neuronal', 'algoritmo']
+
+def test_only_the_transcription_section_is_indexed(index, outputs):
+    add(index, outputs, 'a.txt', 'hablamos de grafos', summary='resumen sobre compiladores')
+    assert index.search('compiladores')['hits'] == []
+    hit = index.search('grafos')['hits'][0]
+    assert (hit['filename'], hit['source']) == ('a.txt', 'clase.mp4')
+
+def test_bm25_score_of_a_single_term(index, outputs):
+    add(index, outputs, 'a.txt', 'grafo grafo árbol')
+    add(index, outputs, 'b.txt', 'árbol pila cola lista')
+    hits = index.search('grafo')['hits']
+    assert [hit['filename'] for hit in hits] == ['a.txt']
+
+    num_docs, avg_length, tf, length = 2, 3.5, 2, 3
+    idf = math.log(1 + (num_docs - 1 + 0.5) / (1 + 0.5))
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+    assert hits[0]['score'] == round(idf * tf * (BM25_K1 + 1) / (tf + norm), 4)
+
+def test_rarer_terms_and_shorter_documents_rank_higher(index, outputs):
+    add(index, outputs, 'comun.txt', 'árbol árbol')
+    add(index, outputs, 'raro.txt', 'árbol heap')
+    add(index, outputs, 'otro.txt', 'árbol pila')
+    # "heap" solo aparece en un documento y pesa más que dos "árbol"
+    assert index.search('árbol heap')['hits'][0]['filename'] == 'raro.txt'
+
+    add(index, outputs, 'corto.txt', 'recursión ejemplo')
+    add(index, outputs, 'largo.txt', 'recursión ' + ' '.join(f'palabra{i}' for i in range(50)))
+    ranked = [hit['filename'] for hit in index.search('recursión')['hits']]
+    assert ranked.index('corto.txt') < ranked.index('largo.txt')
+
+def test_hits_point_to_the_best_segments(index, outputs):
+    segments = [
+        {'start': 0.0, 'end': 5.0, 'text': ' introducción al curso'},
+        {'start': 5.0, 'end': 9.0, 'text': ' una red sencilla'},
+        {'start': 9.0, 'end': 14.0, 'text': ' la red neuronal aprende'},
+    ]
+    add(index, outputs, 'a.txt', ''.join(s['text'] for s in segments), segments)
+    hit = index.search('red neuronal', segments_per_doc=1)['hits'][0]
+    assert hit['segments'] == [{'start': 9.0, 'end': 14.0, 'text': 'la red neuronal aprende'}]
+    hit = index.search('red neuronal')['hits'][0]
+    assert [s['start'] for s in hit['segments']] == [5.0, 9.0]
+
+def test_reindexing_replaces_the_document(index, outputs):
+    add(index, outputs, 'a.txt', 'grafos')
+    add(index, outputs, 'a.txt', 'compiladores')
+    assert index.search('grafos')['hits'] == []
+    assert len(index.search('compiladores')['hits']) == 1
+    assert len(index.list_documents()) == 1
+
+def test_remove(index, outputs):
+    add(index, outputs, 'a.txt', 'grafos')
+    index.remove('a.txt')
+    assert index.search('grafos')['hits'] == []
+    assert index.list_documents() == []
+
+def test_queries_without_terms(index, outputs):
+    add(index, outputs, 'a.txt', 'grafos')
+    assert index.search('el de la')['hits'] == []
+    assert index.search('inexistente')['hits'] == []
+
+def test_list_documents_newest_first(index, outputs):
+    add(index, outputs, 'viejo.txt', 'uno', mtime=1_000_000)
+    add(index, outputs, 'nuevo.txt', 'dos', mtime=2_000_000)
+    assert [doc['filename'] for doc in index.list_documents()] == ['nuevo.txt', 'viejo.txt']
+
+def test_sync_picks_up_new_changed_and_deleted_files(index, outputs):
+    write(outputs, 'a.txt', 'grafos', mtime=1_000_000)
+    write(outputs, 'b.txt', 'pilas', mtime=1_000_000)
+    (outputs / 'notas.json').write_text('{}')
+    assert index.sync() == (2, 0)
+    # Sin cambios no se reindexa nada
+    assert index.sync() == (0, 0)
+
+    write(outputs, 'a.txt', 'compiladores', mtime=2_000_000)
+    os.remove(outputs / 'b.txt')
+    assert index.sync() == (1, 1)
+    assert index.search('grafos')['hits'] == []
+    assert [hit['filename'] for hit in index.search('compiladores')['hits']] == ['a.txt']
+    assert [doc['filename'] for doc in index.list_documents()] == ['a.txt']
+
+def test_sync_uses_the_segment_store_when_present(index, outputs):
+    from segment_store import save_segments
+    write(outputs, 'clase_20260101_101010_transcription.txt', 'la red neuronal')
+    save_segments(str(outputs / 'clase_20260101_101010_segments.npz'),
+                  [{'start': 0.0, 'end': 3.0, 'text': ' intro'}, {'start': 3.0, 'end': 7.5, 'text': ' la red neuronal'}])
+    index.sync()
+    hit = index.search('neuronal')['hits'][0]
+    assert hit['segments'] == [{'start': 3.0, 'end': 7.5, 'text': 'la red neuronal'}]
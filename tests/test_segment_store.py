@@ -0,0 +1,85 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from segment_store import SegmentStore, render_file, render_json, render_srt, render_txt, render_vtt, \
+    save_segments, segments_path_for
+
+SEGMENTS = [
+    {'start': 0.0, 'end': 2.5, 'text': ' Hola a todos.', 'avg_logprob': -0.21, 'no_speech_prob': 0.01,
+     'model': 'base'},
+    {'start': 2.5, 'end': 3661.25, 'text': ' Programación en Python: ñandú €.', 'avg_logprob': None,
+     'no_speech_prob': None, 'model': 'small'},
+    {'start': 3661.25, 'end': 3662.0, 'text': '', 'avg_logprob': -0.5, 'no_speech_prob': 0.9},
+]
+
+def saved(tmp_path, segments=SEGMENTS):
+    path = str(tmp_path / 'clase_20260101_101010_segments.npz')
+    save_segments(path, segments, metadata={'source': 'clase.mp4', 'language': 'es'})
+    return SegmentStore(path)
+
+def test_round_trip_keeps_times_text_and_metadata(tmp_path):
+    store = saved(tmp_path)
+    assert len(store) == 3
+    assert list(store.start) == [0.0, 2.5, 3661.25]
+    assert store.texts() == [seg['text'] for seg in SEGMENTS]
+    assert store.full_text() == ''.join(seg['text'] for seg in SEGMENTS)
+    assert np.isnan(store.avg_logprob[1])
+    assert store.metadata['source'] == 'clase.mp4'
+    assert store.metadata['models'][store.model[1]] == 'small'
+    assert store.metadata['models'][store.model[2]] == ''
+
+def test_empty_transcript(tmp_path):
+    store = saved(tmp_path, [])
+    assert len(store) == 0
+    assert render_srt(store) == ''
+    assert json.loads(render_json(store))['segments'] == []
+
+def test_no_temporary_file_is_left(tmp_path):
+    saved(tmp_path)
+    assert os.listdir(tmp_path) == ['clase_20260101_101010_segments.npz']
+
+def test_render_srt_and_vtt_timestamps(tmp_path):
+    store = saved(tmp_path)
+    srt = render_srt(store)
+    assert srt.startswith('1\n00:00:00,000 --> 00:00:02,500\nHola a todos.\n')
+    assert '2\n00:00:02,500 --> 01:01:01,250\nProgramación en Python: ñandú €.\n' in srt
+    vtt = render_vtt(store)
+    assert vtt.startswith('WEBVTT\n')
+    assert '00:00:02.500 --> 01:01:01.250\n' in vtt
+
+def test_render_txt_and_json(tmp_path):
+    store = saved(tmp_path)
+    assert render_txt(store) == 'Hola a todos. Programación en Python: ñandú €.\n'
+    data = json.loads(render_json(store))
+    assert data['segments'][0] == {'start': 0.0, 'end': 2.5, 'text': ' Hola a todos.', 'avg_logprob': -0.21,
+                                   'model': 'base'}
+    # Sin confianza ni modelo esos campos se omiten
+    assert set(data['segments'][2]) == {'start', 'end', 'text', 'avg_logprob'}
+    assert 'avg_logprob' not in data['segments'][1]
+
+def test_segments_path_for_output_names():
+    assert segments_path_for('clase_20260101_101010_transcription.txt', 'out') == \
+        os.path.join('out', 'clase_20260101_101010_segments.npz')
+    assert segments_path_for('clase_20260101_101010_segments.npz', 'out') == \
+        os.path.join('out', 'clase_20260101_101010_segments.npz')
+
+def test_render_file_is_cached_until_the_store_changes(tmp_path):
+    store = saved(tmp_path)
+    render_dir = str(tmp_path / 'renders')
+    path = render_file(store.path, 'srt', render_dir)
+    assert path == os.path.join(render_dir, 'clase_20260101_101010.srt')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('marcado')
+    assert open(render_file(store.path, 'srt', render_dir), encoding='utf-8').read() == 'marcado'
+
+    later = os.path.getmtime(path) + 10
+    os.utime(store.path, (later, later))
+    assert open(render_file(store.path, 'srt', render_dir), encoding='utf-8').read() != 'marcado'
+
+def test_render_file_rejects_unknown_formats(tmp_path):
+    store = saved(tmp_path)
+    with pytest.raises(ValueError):
+        render_file(store.path, 'docx', str(tmp_path / 'renders'))
@@ -0,0 +1,112 @@
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from streaming_pipeline import LiveAudio, PipelineError, SAMPLE_RATE, UploadStalledError, is_streamable, \
+    moov_before_mdat, remove_orphaned_streams
+
+def box(kind, payload=b''):
+    return struct.pack('>I4s', 8 + len(payload), kind) + payload
+
+def large_box(kind, payload=b''):
+    # size == 1: el tamaño real va en 64 bits tras la cabecera
+    return struct.pack('>I4sQ', 1, kind, 16 + len(payload)) + payload
+
+def write(tmp_path, data):
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(data)
+    return str(path)
+
+def test_moov_first_is_streamable(tmp_path):
+    data = box(b'ftyp', b'isom' * 4) + box(b'moov', b'\0' * 100) + box(b'mdat', b'\0' * 1000)
+    assert moov_before_mdat(write(tmp_path, data), len(data)) is True
+
+def test_mdat_first_is_not_streamable(tmp_path):
+    data = box(b'ftyp', b'isom' * 4) + box(b'mdat', b'\0' * 1000) + box(b'moov', b'\0' * 100)
+    assert moov_before_mdat(write(tmp_path, data), len(data)) is False
+
+def test_undecided_until_enough_bytes_arrive(tmp_path):
+    data = box(b'ftyp', b'isom' * 4) + box(b'free', b'\0' * 5000) + box(b'moov')
+    path = write(tmp_path, data)
+    assert moov_before_mdat(path, 30) is None
+    assert moov_before_mdat(path, len(data)) is True
+
+def test_64_bit_box_sizes_are_followed(tmp_path):
+    data = box(b'ftyp', b'isom' * 4) + large_box(b'free', b'\0' * 300) + box(b'moov')
+    path = write(tmp_path, data)
+    assert moov_before_mdat(path, len(data)) is True
+    # La cabecera de 64 bits aún no llegó entera
+    assert moov_before_mdat(path, len(box(b'ftyp', b'isom' * 4)) + 12) is None
+
+def test_box_to_end_of_file_means_no_moov_ahead(tmp_path):
+    data = box(b'ftyp', b'isom' * 4) + struct.pack('>I4s', 0, b'free') + b'\0' * 100
+    assert moov_before_mdat(write(tmp_path, data), len(data)) is False
+
+def test_is_streamable_by_container(tmp_path):
+    moov_first = write(tmp_path, box(b'ftyp') + box(b'moov'))
+    assert is_streamable('clase.MKV', None, 0) is True
+    assert is_streamable('clase.webm', None, 0) is True
+    assert is_streamable('clase.mp4', moov_first, 16) is True
+    assert is_streamable('clase.flv', None, 0) is False
+
+def live_audio(tmp_path, **kwargs):
+    return LiveAudio(str(tmp_path / 'upload.f32'), **kwargs)
+
+def add_samples(audio, samples, bytes_in):
+    with open(audio.path, 'ab') as f:
+        f.write(np.arange(samples, dtype=np.float32).tobytes())
+    audio._add(samples, bytes_in)
+
+def test_wait_for_returns_once_the_audio_arrives(tmp_path):
+    audio = live_audio(tmp_path, idle_timeout=5)
+    threading.Timer(0.05, add_samples, (audio, SAMPLE_RATE, 1000)).start()
+    assert audio.wait_for(SAMPLE_RATE) == SAMPLE_RATE
+    assert audio.waited > 0
+    assert list(audio[10:13]) == [10.0, 11.0, 12.0]
+
+def test_wait_for_raises_when_ffmpeg_fails(tmp_path):
+    audio = live_audio(tmp_path, idle_timeout=5)
+    audio._finish('ffmpeg falló')
+    with pytest.raises(PipelineError, match='ffmpeg falló'):
+        audio.wait_for(1)
+
+def test_wait_for_times_out_without_activity(tmp_path):
+    audio = live_audio(tmp_path, idle_timeout=0.1)
+    with pytest.raises(UploadStalledError):
+        audio.wait_for(1)
+
+def test_upload_activity_keeps_the_wait_alive(tmp_path):
+    audio = live_audio(tmp_path, idle_timeout=0.2)
+    stop = time.monotonic() + 0.5
+
+    def keep_uploading():
+        while time.monotonic() < stop:
+            audio.touch()
+            time.sleep(0.05)
+        add_samples(audio, 10, 100)
+
+    threading.Thread(target=keep_uploading).start()
+    assert audio.wait_for(10) == 10
+
+def test_expected_seconds_extrapolates_from_the_bytes_received(tmp_path):
+    audio = live_audio(tmp_path, expected_bytes=4000)
+    add_samples(audio, SAMPLE_RATE * 2, 1000)
+    assert audio.expected_seconds() == pytest.approx(8.0)
+    audio._finish()
+    assert audio.expected_seconds() == pytest.approx(2.0)
+
+def test_remove_orphaned_streams_only_removes_idle_pcm(tmp_path, monkeypatch):
+    monkeypatch.setattr('checkpoints.CHECKPOINT_DIR', str(tmp_path / 'checkpoints'))
+    stream_dir = tmp_path / '.stream'
+    stream_dir.mkdir()
+    (stream_dir / 'viejo.f32').write_bytes(b'\0' * 8)
+    (stream_dir / 'activo.f32').write_bytes(b'\0' * 8)
+    old = time.time() - 3600
+    os.utime(stream_dir / 'viejo.f32', (old, old))
+
+    assert remove_orphaned_streams(str(stream_dir), max_idle=60) == 1
+    assert os.listdir(stream_dir) == ['activo.f32']
@@ -0,0 +1,68 @@
+import hashlib
+import io
+import os
+
+from transcription_cache import TranscriptionCache, hash_file, read_upload_hash, save_upload_hashed
+
+class FakeUpload:
+    def __init__(self, data):
+        self.stream = io.BytesIO(data)
+
+def entry(size=0):
+    return {'transcription': 'x' * size, 'summary': '', 'output_file': 'clase_transcription.txt'}
+
+def age(cache, key, seconds_ago):
+    path = cache._path(key)
+    mtime = os.path.getmtime(path) - seconds_ago
+    os.utime(path, (mtime, mtime))
+
+def test_key_depends_on_content_model_and_language(tmp_path):
+    cache = TranscriptionCache(str(tmp_path))
+    key = cache.make_key('abc', 'base/fp32')
+    assert key == cache.make_key('abc', 'base/fp32', language='es')
+    assert key != cache.make_key('abd', 'base/fp32')
+    assert key != cache.make_key('abc', 'base/int8')
+    assert key != cache.make_key('abc', 'base/fp32', language='en')
+
+def test_put_and_get_round_trip(tmp_path):
+    cache = TranscriptionCache(str(tmp_path))
+    assert cache.get('missing') is None
+    cache.put('k', entry(10))
+    assert cache.get('k')['transcription'] == 'x' * 10
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+def test_evicts_least_recently_used_over_the_size_limit(tmp_path):
+    cache = TranscriptionCache(str(tmp_path), max_bytes=2500)
+    cache.put('a', entry(1000))
+    age(cache, 'a', 30)
+    cache.put('b', entry(1000))
+    age(cache, 'b', 20)
+    # Leer "a" la marca como usada recientemente: al llenarse sale "b"
+    cache.get('a')
+    cache.put('c', entry(1000))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+    assert cache.evictions == 1
+
+def test_an_entry_larger_than_the_limit_is_not_kept(tmp_path):
+    cache = TranscriptionCache(str(tmp_path), max_bytes=100)
+    cache.put('big', entry(1000))
+    assert cache.get('big') is None
+
+def test_save_upload_hashed_matches_hash_file(tmp_path):
+    data = os.urandom(3 * 1024 * 1024 + 17)
+    path = str(tmp_path / 'video.mp4')
+    content_hash = save_upload_hashed(FakeUpload(data), path)
+    assert content_hash == hashlib.sha256(data).hexdigest() == hash_file(path)
+    assert read_upload_hash(path) == content_hash
+
+def test_stale_hash_sidecar_is_ignored(tmp_path):
+    path = str(tmp_path / 'video.mp4')
+    save_upload_hashed(FakeUpload(b'original'), path)
+    later = os.path.getmtime(path + '.sha256') + 10
+    with open(path, 'wb') as f:
+        f.write(b'modificado')
+    os.utime(path, (later, later))
+    assert read_upload_hash(path) is None
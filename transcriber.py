@@ -1,17 +1,32 @@
 import os
-import whisper
-from moviepy import VideoFileClip
+import re
+import time
 from datetime import datetime
-import torch
-import imageio_ffmpeg
+import numpy as np
+from analysis import analyze
+from backends import DEFAULT_BACKEND, get_backend
+from ffmpeg_utils import get_ffmpeg_exe, get_ffprobe_exe, run_ffmpeg
+from metrics import AUDIO_SECONDS, TRANSCRIPTION_RTF, observe_stages
+from transcription_cache import cache as transcription_cache, get_content_hash
+from checkpoints import Checkpoint
+from cpu_engine import default_precision
+from adaptive_transcriber import refine_segments
+from segment_store import save_segments
+from search_index import index as search_index
+from parallel_transcriber import (SAMPLE_RATE, DEFAULT_CHUNK_SECONDS, DEFAULT_OVERLAP_SECONDS, transcribe_chunked,
+                                  offset_segment)
 
-# Configurar la ruta de FFmpeg
-os.environ['PATH'] = os.path.dirname(imageio_ffmpeg.get_ffmpeg_exe()) + os.pathsep + os.environ['PATH']
+# A partir de esta duración el PCM se escribe en un archivo mapeado en memoria
+MMAP_THRESHOLD_SECONDS = 30 * 60
+
+# Duración de cada ventana en el modo de transcripción por streaming
+STREAM_WINDOW_SECONDS = 30
 
 def extract_audio(video_path, audio_output_path):
     """
     Extrae el audio de un archivo de video MP4
     """
+    from moviepy import VideoFileClip
     print(f"Extrayendo audio de {video_path}...")
     video = VideoFileClip(video_path)
     audio = video.audio
@@ -20,36 +35,173 @@ def extract_audio(video_path, audio_output_path):
     print(f"Audio extraído exitosamente a {audio_output_path}")
     return audio_output_path
 
-def transcribe_audio(audio_path, model_size='base'):
+def probe_duration(media_path):
     """
-    Transcribe el audio usando Whisper de OpenAI
-    model_size: 'tiny', 'base', 'small', 'medium', 'large'
+    Obtiene la duración en segundos de un archivo multimedia (None si no se puede)
     """
-    print(f"Cargando modelo Whisper ({model_size})...")
+    ffprobe = get_ffprobe_exe()
+    if ffprobe:
+        try:
+            result = run_ffmpeg(
+                [ffprobe, '-v', 'error', '-show_entries', 'format=duration',
+                 '-of', 'default=noprint_wrappers=1:nokey=1', media_path],
+                'probe', capture_output=True, text=True
+            )
+            if result.returncode == 0 and result.stdout.strip():
+                return float(result.stdout.strip())
+        except (OSError, ValueError):
+            pass
     
-    # Detectar si hay GPU disponible
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"Usando dispositivo: {device}")
+    # imageio-ffmpeg no incluye ffprobe: leer la duración de la salida de ffmpeg
+    # (sin archivo de salida ffmpeg siempre termina con código 1)
+    try:
+        result = run_ffmpeg([get_ffmpeg_exe(), '-nostdin', '-i', media_path], 'probe', ok_returncodes=(0, 1),
+                            capture_output=True, text=True)
+    except OSError:
+        return None
+    match = re.search(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)', result.stderr)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+def extract_audio_pcm(video_path, sample_rate=SAMPLE_RATE, mmap_path=None):
+    """
+    Decodifica el audio directamente a PCM mono float32 con FFmpeg, sin MP3 intermedio.
+    Si se indica mmap_path, FFmpeg escribe el PCM en ese archivo y se devuelve
+    un array mapeado en memoria (para entradas largas).
+    """
+    print(f"Extrayendo audio PCM de {video_path}...")
+    cmd = [
+        get_ffmpeg_exe(), '-nostdin', '-threads', '0',
+        '-i', video_path,
+        '-vn', '-ac', '1', '-ar', str(sample_rate),
+    ]
+    
+    if mmap_path:
+        cmd += ['-f', 'f32le', '-acodec', 'pcm_f32le', '-y', mmap_path]
+        result = run_ffmpeg(cmd, 'extract_pcm', capture_output=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"FFmpeg error: {result.stderr.decode(errors='ignore')}")
+        # Modo copy-on-write: el array es escribible sin modificar el archivo
+        audio = np.memmap(mmap_path, dtype=np.float32, mode='c')
+    else:
+        cmd += ['-f', 's16le', '-acodec', 'pcm_s16le', '-']
+        result = run_ffmpeg(cmd, 'extract_pcm', capture_output=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"FFmpeg error: {result.stderr.decode(errors='ignore')}")
+        audio = np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
+    
+    print(f"Audio extraído: {len(audio) / sample_rate:.1f} segundos")
+    return audio
+
+def compare_audio_modes(video_path):
+    """
+    Mide el tiempo de extracción con el camino MP3 (MoviePy + decodificación) frente
+    al camino PCM directo, para cuantificar el ahorro por etapa
+    """
+    base_filename = os.path.splitext(os.path.basename(video_path))[0]
+    audio_path = f"outputs/{base_filename}_compare_audio.mp3"
+    
+    start = time.perf_counter()
+    extract_audio(video_path, audio_path)
+    mp3_encode = time.perf_counter() - start
     
-    model = whisper.load_model(model_size, device=device)
+    # Whisper decodifica el MP3 con FFmpeg antes de transcribir
+    start = time.perf_counter()
+    extract_audio_pcm(audio_path)
+    mp3_decode = time.perf_counter() - start
+    os.remove(audio_path)
+    
+    start = time.perf_counter()
+    extract_audio_pcm(video_path)
+    pcm = time.perf_counter() - start
+    
+    report = {
+        'mp3_extract': round(mp3_encode, 3),
+        'mp3_decode': round(mp3_decode, 3),
+        'pcm_extract': round(pcm, 3),
+        'saved_extract': round(mp3_encode - pcm, 3),
+        'saved_decode': round(mp3_decode, 3),
+        'saved_total': round(mp3_encode + mp3_decode - pcm, 3),
+    }
+    print(f"Ahorro en extracción: {report['saved_extract']:.2f}s, "
+          f"en decodificación: {report['saved_decode']:.2f}s, total: {report['saved_total']:.2f}s")
+    return report
+
+def transcribe_audio(audio, model_size='base', backend=None):
+    """
+    Transcribe el audio con el motor indicado (por defecto Whisper de OpenAI)
+    audio: ruta a un archivo de audio o array float32 mono a 16 kHz
+    model_size: 'tiny', 'base', 'small', 'medium', 'large'
+    """
+    engine = get_backend(backend)
+    # Detectar si hay GPU disponible
+    device = engine.default_device()
+    print(f"Usando dispositivo: {device} ({engine.name})")
     
+    # El modelo se carga una sola vez por proceso y se reutiliza entre peticiones
     print(f"Transcribiendo audio...")
-    # Usar fp16=False para evitar problemas en CPU
-    result = model.transcribe(audio_path, language='es', verbose=True, fp16=False)
+    segments = engine.transcribe(audio, model_size=model_size, language='es', device=device, verbose=True)
     
-    transcription = result['text']
+    transcription = ''.join(seg['text'] for seg in segments)
     print(f"Transcripción completada. Total de caracteres: {len(transcription)}")
     
     return transcription
 
+def iter_segments(audio, model_size='base', window_seconds=STREAM_WINDOW_SECONDS, start_offset=0.0, backend=None):
+    """
+    Transcribe el audio ventana a ventana y entrega cada segmento en cuanto se decodifica.
+    El último segmento de cada ventana puede estar cortado, así que se descarta y la
+    siguiente ventana empieza en su inicio. Los tiempos son globales (segundos).
+    audio: array float32 mono a 16 kHz, o LiveAudio mientras se sube el archivo
+    start_offset: segundo desde el que empezar (para reanudar)
+    backend: motor de transcripción (por defecto el configurado)
+    """
+    engine = get_backend(backend)
+    window = int(window_seconds * SAMPLE_RATE)
+    total = len(audio)
+    position = int(start_offset * SAMPLE_RATE)
+    prompt = None
+    # Audio que aún se está decodificando (streaming_pipeline.LiveAudio): se espera a que
+    # llegue cada ventana completa
+    live = hasattr(audio, 'wait_for')
+    
+    while True:
+        more = False
+        if live:
+            audio.wait_for(position + window)
+            more = not audio.finished
+            total = len(audio)
+        if position >= total and not more:
+            break
+        end = min(position + window, total)
+        offset = position / SAMPLE_RATE
+        segments = engine.transcribe(np.asarray(audio[position:end]), model_size=model_size, language='es',
+                                     initial_prompt=prompt)
+        
+        next_position = end
+        if (end < total or more) and len(segments) > 1 and segments[-1]['start'] > 0:
+            next_position = position + int(segments[-1]['start'] * SAMPLE_RATE)
+            segments = segments[:-1]
+        
+        for seg in segments:
+            yield offset_segment(seg, offset)
+        
+        # El texto reciente sirve de contexto para la siguiente ventana
+        if segments:
+            prompt = ''.join(seg['text'] for seg in segments)[-200:]
+        position = next_position
+
 def generate_summary(text, max_sentences=10):
     """
     Genera un resumen del texto transcrito
     Nota: Esta es una versión simple. Para mejores resultados, considera usar
     modelos de lenguaje como GPT o BERT para resumir.
     """
-    sentences = text.split('.')
-    sentences = [s.strip() for s in sentences if s.strip()]
+    # Las oraciones salen del análisis compartido con el resumidor (se reutiliza si luego
+    # se pide /summarize sobre la misma transcripción), con el corte original en '.'
+    sentences = analyze(text).period_sentences
     
     # Toma las primeras frases como resumen simple
     # En producción, usarías un modelo de IA para resumir
@@ -66,30 +218,10 @@ def save_to_file(content, output_path):
         f.write(content)
     print(f"Contenido guardado en {output_path}")
 
-def process_video(video_path, generate_summary_flag=True, model_size='base'):
+def format_output(video_path, transcription, summary):
     """
-    Procesa un video completo: extrae audio, transcribe y genera resumen
+    Construye el contenido del archivo de salida con resumen y transcripción
     """
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    base_filename = os.path.splitext(os.path.basename(video_path))[0]
-    
-    # Rutas de salida
-    audio_path = f"outputs/{base_filename}_{timestamp}_audio.mp3"
-    output_text_file = f"outputs/{base_filename}_{timestamp}_transcription.txt"
-    
-    # Paso 1: Extraer audio
-    extract_audio(video_path, audio_path)
-    
-    # Paso 2: Transcribir audio
-    transcription = transcribe_audio(audio_path, model_size)
-    
-    # Paso 3: Generar resumen (opcional)
-    summary = ""
-    if generate_summary_flag:
-        print("Generando resumen...")
-        summary = generate_summary(transcription)
-    
-    # Paso 4: Guardar todo en un archivo
     content = f"TRANSCRIPCIÓN DE LA CLASE\n"
     content += f"{'=' * 80}\n\n"
     content += f"Archivo: {os.path.basename(video_path)}\n"
@@ -103,34 +235,338 @@ def process_video(video_path, generate_summary_flag=True, model_size='base'):
     content += f"TRANSCRIPCIÓN COMPLETA\n"
     content += f"{'-' * 80}\n"
     content += f"{transcription}\n"
+    return content
+
+def index_transcript(output_file, segments=None):
+    """
+    Añade la transcripción al índice de búsqueda sin interrumpir el proceso si falla
+    """
+    try:
+        search_index.add_transcript(output_file, segments)
+    except Exception as e:
+        print(f"No se pudo indexar {output_file}: {e}")
+
+def _cached_result(entry, video_path, generate_summary_flag):
+    """
+    Construye el resultado a partir de una entrada de la caché de transcripciones.
+    Si el archivo de salida original ya no existe se vuelve a escribir.
+    """
+    transcription = entry['transcription']
+    summary = entry.get('summary', '') if generate_summary_flag else ''
+    if generate_summary_flag and not summary:
+        summary = generate_summary(transcription)
+    
+    output_file = entry.get('output_file')
+    if not output_file or not os.path.exists(os.path.join('outputs', output_file)) or \
+            bool(summary) != bool(entry.get('summary')):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        base_filename = os.path.splitext(os.path.basename(video_path))[0]
+        output_file = f"{base_filename}_{timestamp}_transcription.txt"
+        save_to_file(format_output(video_path, transcription, summary), os.path.join('outputs', output_file))
+        index_transcript(output_file)
+    
+    segments_file = entry.get('segments_file')
+    if segments_file and not os.path.exists(os.path.join('outputs', segments_file)):
+        segments_file = None
+    
+    print(f"Transcripción recuperada de la caché ({output_file})")
+    return {
+        'transcription': transcription,
+        'summary': summary,
+        'output_file': output_file,
+        'segments_file': segments_file,
+        'cached': True,
+        'timings': {}
+    }
+
+def process_video(video_path, generate_summary_flag=True, model_size='base', audio_mode='pcm',
+                  workers=1, chunk_seconds=DEFAULT_CHUNK_SECONDS, overlap_seconds=DEFAULT_OVERLAP_SECONDS,
+                  progress_callback=None, content_hash=None, use_cache=True, on_segment=None, resume=True,
+                  refine_model=None, backend=None, live_audio=None):
+    """
+    Procesa un video completo: extrae audio, transcribe y genera resumen
+    audio_mode: 'pcm' (FFmpeg directo a memoria, por defecto) o 'mp3' (MoviePy + MP3 temporal)
+    workers: con más de 1, transcribe por fragmentos solapados en un pool de procesos
+    progress_callback: función opcional llamada con (etapa, porcentaje) al avanzar
+    content_hash: SHA-256 del archivo si ya se conoce (se calcula si falta)
+    use_cache: reutilizar la transcripción si el mismo contenido ya se procesó
+    on_segment: función opcional llamada con cada segmento en cuanto se decodifica
+    resume: continuar desde el checkpoint si una ejecución anterior se interrumpió
+    refine_model: modo adaptativo; los segmentos de baja confianza del modelo rápido
+    (model_size) se vuelven a decodificar con este modelo mayor
+    backend: motor de transcripción ('whisper', 'faster-whisper', ...; por defecto el configurado)
+    live_audio: PCM que se está decodificando mientras se sube el archivo (streaming_pipeline).
+    Se transcribe a medida que llega; el hash del contenido se conoce al terminar la subida.
+    
+    Con audio_mode='pcm' y un solo proceso la transcripción avanza por segmentos: el texto
+    se va añadiendo a un archivo .partial y cada segmento se guarda en un checkpoint.
+    """
+    if workers > 1 and audio_mode != 'pcm':
+        raise ValueError("El modo por fragmentos requiere audio_mode='pcm'")
+    if on_segment is not None and (workers > 1 or audio_mode != 'pcm'):
+        raise ValueError("El modo streaming requiere audio_mode='pcm' y un solo proceso")
+    if refine_model and audio_mode != 'pcm':
+        raise ValueError("El modo adaptativo requiere audio_mode='pcm'")
+    if live_audio is not None and (workers > 1 or audio_mode != 'pcm'):
+        raise ValueError("La transcripción en tubería requiere audio_mode='pcm' y un solo proceso")
+    backend = backend or DEFAULT_BACKEND
+    engine = get_backend(backend)
+    if refine_model and not engine.capabilities['confidence']:
+        raise ValueError(f"El modo adaptativo requiere un motor con confianza por segmento ({backend} no la da)")
+    
+    def report(stage, progress=None):
+        if progress_callback:
+            progress_callback(stage, progress)
+    
+    # Paso 0: Consultar la caché por contenido (el mismo video con otro nombre).
+    # En tubería el archivo aún no está completo: se consulta solo para guardar al final
+    model_key = f"{model_size}+{refine_model}" if refine_model else model_size
+    if backend != 'whisper':
+        model_key = f"{backend}:{model_key}"
+    # Un resultado int8 no debe reutilizarse (caché ni checkpoint) en una ejecución fp32
+    model_key = f"{model_key}/{default_precision(engine.default_device())}"
+    cache_key = None
+    if live_audio is None:
+        content_hash = content_hash or get_content_hash(video_path)
+        cache_key = transcription_cache.make_key(content_hash, model_key, language='es')
+    checkpoint_key = cache_key or f"stream_{live_audio.id}"
+    if use_cache and cache_key:
+        entry = transcription_cache.get(cache_key)
+        if entry is not None:
+            return _cached_result(entry, video_path, generate_summary_flag)
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base_filename = os.path.splitext(os.path.basename(video_path))[0]
+    timings = {}
+    
+    # Rutas de salida
+    output_text_file = f"outputs/{base_filename}_{timestamp}_transcription.txt"
+    segments_file = f"outputs/{base_filename}_{timestamp}_segments.npz"
+    partial_text_file = f"{output_text_file}.partial"
+    if audio_mode == 'mp3':
+        audio_path = f"outputs/{base_filename}_{timestamp}_audio.mp3"
+    else:
+        audio_path = f"outputs/{base_filename}_{timestamp}_audio.f32"
+    
+    # Los temporales (audio extraído y .partial) se borran también si el proceso falla: el
+    # checkpoint basta para reanudar y la siguiente ejecución usa otra marca de tiempo
+    checkpoint = None
+    try:
+        # Paso 1: Extraer audio
+        report('extracting')
+        start = time.perf_counter()
+        if live_audio is not None:
+            # FFmpeg ya está decodificando la subida
+            audio = live_audio
+        elif audio_mode == 'mp3':
+            audio = extract_audio(video_path, audio_path)
+        else:
+            duration = probe_duration(video_path)
+            # Los procesos trabajadores leen sus ventanas directamente del archivo mapeado
+            use_mmap = workers > 1 or (duration is not None and duration > MMAP_THRESHOLD_SECONDS)
+            audio = extract_audio_pcm(video_path, mmap_path=audio_path if use_mmap else None)
+        timings['extract_audio'] = time.perf_counter() - start
+        
+        # Paso 2: Transcribir audio
+        report('transcribing')
+        start = time.perf_counter()
+        segments = None
+        if workers > 1:
+            def chunk_progress(done, total):
+                report('transcribing', 10 + 75 * done / total)
+            result = transcribe_chunked(audio, model_size, workers=workers, chunk_seconds=chunk_seconds,
+                                        overlap_seconds=overlap_seconds, on_progress=chunk_progress, backend=backend)
+            transcription = result['text']
+            segments = result['segments']
+        elif audio_mode == 'pcm':
+            # Cada segmento se guarda en disco al llegar: si el proceso cae se conserva lo
+            # transcrito y la siguiente ejecución continúa desde el último segmento completado
+            checkpoint = Checkpoint(checkpoint_key)
+            if not checkpoint.acquire():
+                # Otro trabajo está transcribiendo el mismo contenido y usa este checkpoint
+                print("El checkpoint está en uso por otro trabajo; se transcribe sin checkpoint")
+            done_segments = checkpoint.load() if resume and live_audio is None else []
+            start_offset = checkpoint.resume_offset(done_segments)
+            if start_offset:
+                print(f"Reanudando transcripción desde {start_offset:.1f}s ({len(done_segments)} segmentos)")
+            
+            if live_audio is not None:
+                # La duración total aún no se conoce: se estima con lo subido hasta ahora
+                expected_seconds = live_audio.expected_seconds
+            else:
+                duration = len(audio) / SAMPLE_RATE or 1
+                expected_seconds = lambda: duration
+            segments = []
+            checkpoint.open(done_segments)
+            with open(partial_text_file, 'w', encoding='utf-8') as partial:
+                def emit(seg):
+                    segments.append(seg)
+                    partial.write(seg['text'])
+                    partial.flush()
+                    if on_segment is not None:
+                        on_segment(seg)
+                    report('transcribing', 10 + 75 * min(1.0, seg['end'] / expected_seconds()))
+                
+                for seg in done_segments:
+                    emit(seg)
+                for seg in iter_segments(audio, model_size, start_offset=start_offset, backend=backend):
+                    checkpoint.append(seg)
+                    emit(seg)
+            transcription = ''.join(seg['text'] for seg in segments)
+        else:
+            transcription = transcribe_audio(audio, model_size, backend=backend)
+        timings['transcribe'] = time.perf_counter() - start
+        if live_audio is not None:
+            # El tiempo esperando a que llegaran bytes no es tiempo de transcripción
+            timings['wait_upload'] = live_audio.waited
+            timings['transcribe'] -= live_audio.waited
+            audio = live_audio.to_array()
+            content_hash = live_audio.content_hash
+            if content_hash:
+                cache_key = transcription_cache.make_key(content_hash, model_key, language='es')
+        
+        # Paso 2b (opcional): repetir con un modelo mayor solo las zonas de baja confianza
+        adaptive = None
+        if refine_model and segments is not None:
+            report('transcribing', 85)
+            start = time.perf_counter()
+            segments, adaptive = refine_segments(audio, segments, model_size, refine_model, backend=backend)
+            transcription = ''.join(seg['text'] for seg in segments)
+            timings['refine'] = time.perf_counter() - start
+        audio_seconds = len(audio) / SAMPLE_RATE if audio_mode == 'pcm' else probe_duration(video_path)
+        del audio
+        
+        # Paso 3: Generar resumen (opcional)
+        start = time.perf_counter()
+        summary = ""
+        if generate_summary_flag:
+            report('summarizing')
+            print("Generando resumen...")
+            summary = generate_summary(transcription)
+        timings['summary'] = time.perf_counter() - start
+        
+        # Paso 4: Guardar todo en un archivo
+        report('writing')
+        start = time.perf_counter()
+        save_to_file(format_output(video_path, transcription, summary), output_text_file)
+        # Registro canónico de segmentos: SRT/VTT/JSON se generan a partir de él bajo demanda
+        if segments:
+            save_segments(segments_file, segments, metadata={
+                'source': os.path.basename(video_path),
+                'model': model_key,
+                'backend': backend,
+                'language': 'es',
+            })
+        else:
+            segments_file = None
+        index_transcript(os.path.basename(output_text_file), segments)
+        timings['write'] = time.perf_counter() - start
+        if checkpoint is not None:
+            checkpoint.remove()
+    finally:
+        if checkpoint is not None:
+            # Si falló se conserva para reanudar; solo se libera
+            checkpoint.close()
+        if os.path.exists(partial_text_file):
+            os.remove(partial_text_file)
+        
+        # Limpiar archivo de audio temporal
+        if os.path.exists(audio_path):
+            os.remove(audio_path)
+            print(f"Archivo de audio temporal eliminado")
     
-    save_to_file(content, output_text_file)
+    if use_cache and cache_key:
+        transcription_cache.put(cache_key, {
+            'transcription': transcription,
+            'summary': summary,
+            'output_file': os.path.basename(output_text_file),
+            'segments_file': os.path.basename(segments_file) if segments_file else None
+        })
     
-    # Limpiar archivo de audio temporal
-    if os.path.exists(audio_path):
-        os.remove(audio_path)
-        print(f"Archivo de audio temporal eliminado")
+    observe_stages(timings)
+    if audio_seconds:
+        TRANSCRIPTION_RTF.observe((timings['transcribe'] + timings.get('refine', 0.0)) / audio_seconds,
+                                  model=model_key)
+        AUDIO_SECONDS.inc(audio_seconds, model=model_key)
+    
+    timings = {stage: round(seconds, 3) for stage, seconds in timings.items()}
+    print(f"Tiempos por etapa ({audio_mode}): " + ', '.join(f"{k}={v:.2f}s" for k, v in timings.items()))
     
     return {
         'transcription': transcription,
         'summary': summary,
-        'output_file': os.path.basename(output_text_file)
+        'output_file': os.path.basename(output_text_file),
+        'segments_file': os.path.basename(segments_file) if segments_file else None,
+        'audio_mode': audio_mode,
+        'cached': False,
+        'segments': segments,
+        'adaptive': adaptive,
+        'timings': timings
     }
 
 if __name__ == "__main__":
     # Ejemplo de uso directo
     import sys
+    import argparse
     
-    if len(sys.argv) < 2:
-        print("Uso: python transcriber.py <ruta_al_video.mp4>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Transcribe una clase en video")
+    parser.add_argument('video', help="ruta al video (mp4, avi, mov, mkv), o un directorio/patrón glob para procesar un lote")
+    parser.add_argument('--model', default='base', help="tamaño del modelo Whisper")
+    parser.add_argument('--audio-mode', choices=['pcm', 'mp3'], default='pcm',
+                        help="extracción de audio: PCM directo (por defecto) o MP3 temporal")
+    parser.add_argument('--compare-audio', action='store_true',
+                        help="solo compara el tiempo de extracción PCM frente a MP3")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="procesos para transcribir por fragmentos en paralelo (1 = sin fragmentar)")
+    parser.add_argument('--chunk-length', type=float, default=DEFAULT_CHUNK_SECONDS,
+                        help="duración de cada fragmento en segundos")
+    parser.add_argument('--overlap', type=float, default=DEFAULT_OVERLAP_SECONDS,
+                        help="solapamiento entre fragmentos en segundos")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="vuelve a transcribir aunque el mismo contenido ya esté en caché")
+    parser.add_argument('--no-resume', action='store_true',
+                        help="ignora el checkpoint de una ejecución interrumpida y empieza desde cero")
+    parser.add_argument('--refine-model', default=None,
+                        help="modo adaptativo: repite con este modelo (p. ej. medium) solo los segmentos de baja confianza")
+    parser.add_argument('--jobs', type=int, default=2,
+                        help="modo lote: archivos procesados a la vez (cada proceso carga el modelo una vez)")
+    parser.add_argument('--force', action='store_true',
+                        help="modo lote: procesa también los archivos que ya tienen transcripción")
+    parser.add_argument('--backend', default=None,
+                        help="motor de transcripción: whisper, faster-whisper, whisper.cpp u onnx (ver backends.py list)")
+    parser.add_argument('--precision', choices=['fp32', 'int8'], default=None,
+                        help="precisión del modelo en CPU (int8 = cuantizado, más rápido)")
+    args = parser.parse_args()
     
-    video_file = sys.argv[1]
+    video_file = args.video
+    
+    if args.precision:
+        import cpu_engine
+        # También en el entorno para los procesos trabajadores
+        os.environ['WHISPER_CPU_PRECISION'] = cpu_engine.CPU_PRECISION = args.precision
+    
+    # Un archivo que existe se procesa tal cual aunque su nombre tenga corchetes o asteriscos
+    if os.path.isdir(video_file) or (not os.path.isfile(video_file) and any(c in video_file for c in '*?[')):
+        from batch_transcriber import run_batch
+        report = run_batch(video_file, jobs=args.jobs, model_size=args.model, skip_existing=not args.force,
+                           backend=args.backend)
+        sys.exit(1 if report is None or report['failures'] else 0)
     
     if not os.path.exists(video_file):
         print(f"Error: El archivo {video_file} no existe")
         sys.exit(1)
     
-    result = process_video(video_file, generate_summary_flag=True, model_size='base')
+    if args.compare_audio:
+        compare_audio_modes(video_file)
+        sys.exit(0)
+    
+    if args.workers <= 1:
+        from cpu_engine import configure_threads
+        configure_threads(1)
+    
+    result = process_video(video_file, generate_summary_flag=True, model_size=args.model, audio_mode=args.audio_mode,
+                           workers=args.workers, chunk_seconds=args.chunk_length, overlap_seconds=args.overlap,
+                           use_cache=not args.no_cache, resume=not args.no_resume, refine_model=args.refine_model,
+                           backend=args.backend)
     print(f"\n✓ Proceso completado!")
     print(f"Archivo de salida: {result['output_file']}")
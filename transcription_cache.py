@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Cambiar cuando el pipeline produzca resultados distintos para el mismo audio
+PIPELINE_VERSION = '1'
+
+CACHE_DIR = os.path.join('outputs', '.cache')
+DEFAULT_MAX_MB = int(os.environ.get('TRANSCRIPTION_CACHE_MB', 512))
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def hash_file(path):
+    """
+    Calcula el SHA-256 de un archivo leyéndolo por bloques
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def save_upload_hashed(file_storage, dest_path):
+    """
+    Guarda un archivo subido calculando su hash mientras se escribe en disco.
+    El hash se deja en un archivo .sha256 junto al archivo para reutilizarlo después.
+    """
+    digest = hashlib.sha256()
+    stream = file_storage.stream
+    with open(dest_path, 'wb') as f:
+        for block in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+            f.write(block)
+    content_hash = digest.hexdigest()
+    write_upload_hash(dest_path, content_hash)
+    return content_hash
+
+def write_upload_hash(path, content_hash):
+    with open(path + '.sha256', 'w') as f:
+        f.write(content_hash)
+
+def read_upload_hash(path):
+    """
+    Devuelve el hash guardado al subir el archivo, o None si falta o está desactualizado
+    """
+    sidecar = path + '.sha256'
+    try:
+        if os.path.getmtime(sidecar) < os.path.getmtime(path):
+            return None
+        with open(sidecar) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def get_content_hash(path):
+    return read_upload_hash(path) or hash_file(path)
+
+class TranscriptionCache:
+    """
+    Caché en disco de transcripciones indexada por contenido del archivo y
+    configuración del modelo, con expulsión por tamaño (menos usado recientemente)
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, content_hash, model_size, language='es'):
+        raw = f"{content_hash}:{model_size}:{language}:{PIPELINE_VERSION}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        # Marcar como usado recientemente para la expulsión LRU
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(entry, cached_at=time.time()), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            while entries and total > self.max_bytes:
+                _, size, path = entries.pop(0)
+                try:
+                    os.remove(path)
+                    self.evictions += 1
+                except OSError:
+                    pass
+                total -= size
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'evictions': self.evictions,
+                'entries': len(entries),
+                'size_mb': round(sum(size for _, size, _ in entries) / (1024 * 1024), 2),
+                'max_mb': round(self.max_bytes / (1024 * 1024), 2),
+            }
+
+# Caché global compartida por la aplicación y la línea de comandos
+cache = TranscriptionCache()